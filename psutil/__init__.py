@@ -12,18 +12,25 @@ in Python.
 from __future__ import division
 
 import collections
+import contextlib
 import errno
 import functools
 import os
 import signal
+import socket
 import subprocess
 import sys
+import threading
 import time
 import traceback
 try:
     import pwd
 except ImportError:
     pwd = None
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # py2
 
 from . import _common
 from ._common import deprecated_method
@@ -173,10 +180,11 @@ __all__ = [
     "WINDOWS",
 
     # classes
-    "Process", "Popen",
+    "Process", "Popen", "CPUSampler",
 
     # functions
     "pid_exists", "pids", "process_iter", "wait_procs",             # proc
+    "ppid_map", "proc_tree", "scan", "cpu_percent_many", "memory_usage_by",
     "virtual_memory", "swap_memory",                                # memory
     "cpu_times", "cpu_percent", "cpu_times_percent", "cpu_count",   # cpu
     "cpu_stats",
@@ -315,6 +323,52 @@ _psplatform.TimeoutExpired = TimeoutExpired
 # =====================================================================
 
 
+def _cpu_percent_timer(num_cpus):
+    """Return a function returning the system CPU time elapsed so far,
+    used as the denominator of process CPU percentages.
+    """
+    if POSIX:
+        def timer():
+            return _timer() * num_cpus
+    else:
+        def timer():
+            return sum(cpu_times())
+    return timer
+
+
+def _cpu_percent_delta(delta_proc, delta_time, num_cpus):
+    """Turn 'delta_proc' seconds of process CPU time consumed over
+    'delta_time' seconds of system CPU time (as returned by
+    _cpu_percent_timer()) into a CPU percentage.
+    """
+    try:
+        # This is the utilization split evenly between all CPUs.
+        # E.g. a busy loop process on a 2-CPU-cores system at this
+        # point is reported as 50% instead of 100%.
+        overall_cpus_percent = ((delta_proc / delta_time) * 100)
+    except ZeroDivisionError:
+        # interval was too low
+        return 0.0
+    else:
+        # Note 1.
+        # in order to emulate "top" we multiply the value for the num
+        # of CPU cores. This way the busy process will be reported as
+        # having 100% (or more) usage.
+        #
+        # Note 2:
+        # taskmgr.exe on Windows differs in that it will show 50%
+        # instead.
+        #
+        # Note #3:
+        # a percentage > 100 is legitimate as it can result from a
+        # process with multiple threads running on different CPU
+        # cores (top does the same), see:
+        # http://stackoverflow.com/questions/1032357
+        # https://github.com/giampaolo/psutil/issues/474
+        single_cpu_percent = overall_cpus_percent * num_cpus
+        return round(single_cpu_percent, 1)
+
+
 def _assert_pid_not_reused(fun):
     """Decorator which raises NoSuchProcess in case a process is no
     longer running or its PID has been reused.
@@ -385,6 +439,8 @@ class Process(object):
         self._proc = _psplatform.Process(pid)
         self._last_sys_cpu_times = None
         self._last_proc_cpu_times = None
+        self._last_threads_cpu_times = None
+        self._oneshot_inctx = False
         # cache creation time for later use in is_running() method
         try:
             self.create_time()
@@ -445,6 +501,53 @@ class Process(object):
 
     # --- utility methods
 
+    @contextlib.contextmanager
+    def oneshot(self):
+        """Utility context manager which considerably speeds up the
+        retrieval of multiple process information at the same time.
+
+        Internally different process info (e.g. name, ppid, uids,
+        gids, ...) may be fetched by using the same routine, but
+        only one information is returned and the others are discarded.
+        When using this context manager the internal routine is
+        executed once (in the example below on name()) and the
+        other info are cached.
+
+        The cache is cleared when exiting the context manager block.
+        The advice is to use this every time you retrieve more than
+        one information about the process. If you're lucky, you'll
+        get a hell of a speedup.
+
+        >>> import psutil
+        >>> p = psutil.Process()
+        >>> with p.oneshot():
+        ...     p.name()  # collect multiple info
+        ...     p.cpu_times()  # return cached value
+        ...     p.cpu_percent()  # return cached value
+        ...     p.create_time()  # return cached value
+        ...
+        >>>
+        """
+        if self._oneshot_inctx:
+            # NOOP: this covers the use case where the user enters the
+            # context twice. Since as_dict() internally uses oneshot()
+            # I expect that the code below will be a pretty common
+            # "mistake" that the user will make, so let's guard
+            # against that:
+            #
+            # >>> with p.oneshot():
+            # ...    p.as_dict()
+            # ...
+            yield
+        else:
+            self._oneshot_inctx = True
+            try:
+                self._proc.oneshot_enter()
+                yield
+            finally:
+                self._proc.oneshot_exit()
+                self._oneshot_inctx = False
+
     def as_dict(self, attrs=None, ad_value=None):
         """Utility method returning process information as a
         hashable dictionary.
@@ -460,30 +563,32 @@ class Process(object):
         """
         excluded_names = set(
             ['send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
-             'is_running', 'as_dict', 'parent', 'children', 'rlimit'])
+             'is_running', 'as_dict', 'parent', 'children', 'rlimit',
+             'oneshot'])
         retdict = dict()
         ls = set(attrs or [x for x in dir(self)])
-        for name in ls:
-            if name.startswith('_'):
-                continue
-            if name in excluded_names:
-                continue
-            try:
-                attr = getattr(self, name)
-                if callable(attr):
-                    ret = attr()
-                else:
-                    ret = attr
-            except (AccessDenied, ZombieProcess):
-                ret = ad_value
-            except NotImplementedError:
-                # in case of not implemented functionality (may happen
-                # on old or exotic systems) we want to crash only if
-                # the user explicitly asked for that particular attr
-                if attrs:
-                    raise
-                continue
-            retdict[name] = ret
+        with self.oneshot():
+            for name in ls:
+                if name.startswith('_'):
+                    continue
+                if name in excluded_names:
+                    continue
+                try:
+                    attr = getattr(self, name)
+                    if callable(attr):
+                        ret = attr()
+                    else:
+                        ret = attr
+                except (AccessDenied, ZombieProcess):
+                    ret = ad_value
+                except NotImplementedError:
+                    # in case of not implemented functionality (may happen
+                    # on old or exotic systems) we want to crash only if
+                    # the user explicitly asked for that particular attr
+                    if attrs:
+                        raise
+                    continue
+                retdict[name] = ret
         return retdict
 
     def parent(self):
@@ -515,6 +620,10 @@ class Process(object):
             # verify process identity.
             # Process identity / uniqueness over time is guaranteed by
             # (PID + creation time) and that is verified in __eq__.
+            if hasattr(self._proc, 'is_same_process'):
+                # Linux only: only compare the raw start time, without
+                # creating a new Process instance (faster).
+                return self._proc.is_same_process()
             return self == Process(self.pid)
         except ZombieProcess:
             # We should never get here as it's already handled in
@@ -793,6 +902,70 @@ class Process(object):
         """
         return self._proc.threads()
 
+    if hasattr(_psplatform.Process, "status_fields"):
+
+        def status_fields(self):
+            """Return process fields found in /proc/{pid}/status and
+            not exposed elsewhere as a (peak_rss, swap, sigq, sigq_limit,
+            cpus_allowed) namedtuple. All of them are gathered with a
+            single read of the status file.
+            """
+            return self._proc.status_fields()
+
+    if hasattr(_psplatform.Process, "threads_full"):
+
+        def threads_full(self):
+            """Same as threads() but also return thread name, status,
+            the CPU number the thread last ran on and its nice value,
+            all collected with a single read per thread.
+            """
+            return self._proc.threads_full()
+
+    def threads_cpu_percent(self, interval=None):
+        """Return a {thread_id: percentage, ...} dict representing the
+        CPU utilization of each thread of the process.
+        Same as cpu_percent(), when interval is 0.0 or None (default)
+        the comparison is made against the thread times of the
+        previous call (non-blocking), else the function sleeps for
+        'interval' seconds. Threads which were started after the
+        previous call (or during the interval) are reported as 0.0.
+        """
+        blocking = interval is not None and interval > 0.0
+        num_cpus = cpu_count() or 1
+        timer = _cpu_percent_timer(num_cpus)
+
+        def read():
+            return dict((t.id, t.user_time + t.system_time)
+                        for t in self._proc.threads())
+
+        if blocking:
+            st1 = timer()
+            pt1 = read()
+            time.sleep(interval)
+            st2 = timer()
+            pt2 = read()
+        else:
+            st2 = timer()
+            pt2 = read()
+            if self._last_threads_cpu_times is None:
+                self._last_threads_cpu_times = (st2, pt2)
+                return dict((tid, 0.0) for tid in pt2)
+            st1, pt1 = self._last_threads_cpu_times
+        # reset values for next call in case of interval == None
+        self._last_threads_cpu_times = (st2, pt2)
+
+        delta_time = st2 - st1
+        ret = {}
+        for tid, cpu2 in pt2.items():
+            if tid not in pt1:
+                # thread started in the meantime; as for cpu_percent()
+                # the first sample is meaningless
+                ret[tid] = 0.0
+            else:
+                ret[tid] = _cpu_percent_delta(
+                    cpu2 - pt1[tid], delta_time, num_cpus)
+        return ret
+
     @_assert_pid_not_reused
     def children(self, recursive=False):
         """Return the children of this process as a list of Process
@@ -820,55 +993,58 @@ class Process(object):
         process Y won't be listed as the reference to process A
         is lost.
         """
-        if hasattr(_psplatform, 'ppid_map'):
-            # Windows only: obtain a {pid:ppid, ...} dict for all running
-            # processes in one shot (faster).
-            ppid_map = _psplatform.ppid_map()
-        else:
-            ppid_map = None
-
         ret = []
-        if not recursive:
-            if ppid_map is None:
-                # 'slow' version, common to all platforms except Windows
-                for p in process_iter():
+        tree = None
+        if not recursive and hasattr(self._proc, 'children_pids'):
+            # Linux only: read direct children from
+            # /proc/{pid}/task/{tid}/children; this is proportional
+            # to the number of threads of this process instead of the
+            # number of processes running on the system.
+            try:
+                tree = {self.pid: self._proc.children_pids()}
+            except AccessDenied:
+                pass
+        if tree is None and hasattr(_psplatform, 'ppid_map'):
+            # Windows and Linux only: obtain a {ppid: [pid, ...]} tree of
+            # all running processes in one shot (faster).
+            tree = proc_tree()
+        if tree is not None:
+            # only create the Process instances we are interested in
+            checkpids = [self.pid]
+            for pid in checkpids:
+                for child_pid in tree.get(pid, []):
                     try:
-                        if p.ppid() == self.pid:
-                            # if child happens to be older than its parent
-                            # (self) it means child's PID has been reused
-                            if self.create_time() <= p.create_time():
-                                ret.append(p)
+                        child = Process(child_pid)
+                        # if child happens to be older than its parent
+                        # (self) it means child's PID has been reused
+                        intime = self.create_time() <= child.create_time()
                     except (NoSuchProcess, ZombieProcess):
                         pass
-            else:  # pragma: no cover
-                # Windows only (faster)
-                for pid, ppid in ppid_map.items():
-                    if ppid == self.pid:
-                        try:
-                            child = Process(pid)
-                            # if child happens to be older than its parent
-                            # (self) it means child's PID has been reused
-                            if self.create_time() <= child.create_time():
-                                ret.append(child)
-                        except (NoSuchProcess, ZombieProcess):
-                            pass
+                    else:
+                        if intime:
+                            ret.append(child)
+                            if recursive and child_pid not in checkpids:
+                                checkpids.append(child_pid)
+        elif not recursive:
+            # 'slow' version, common to all other platforms
+            for p in process_iter():
+                try:
+                    if p.ppid() == self.pid:
+                        # if child happens to be older than its parent
+                        # (self) it means child's PID has been reused
+                        if self.create_time() <= p.create_time():
+                            ret.append(p)
+                except (NoSuchProcess, ZombieProcess):
+                    pass
         else:
             # construct a dict where 'values' are all the processes
             # having 'key' as their parent
             table = collections.defaultdict(list)
-            if ppid_map is None:
-                for p in process_iter():
-                    try:
-                        table[p.ppid()].append(p)
-                    except (NoSuchProcess, ZombieProcess):
-                        pass
-            else:  # pragma: no cover
-                for pid, ppid in ppid_map.items():
-                    try:
-                        p = Process(pid)
-                        table[ppid].append(p)
-                    except (NoSuchProcess, ZombieProcess):
-                        pass
+            for p in process_iter():
+                try:
+                    table[p.ppid()].append(p)
+                except (NoSuchProcess, ZombieProcess):
+                    pass
             # At this point we have a mapping table where table[self.pid]
             # are the current process' children.
             # Below, we look for all descendants recursively, similarly
@@ -918,12 +1094,7 @@ class Process(object):
         """
         blocking = interval is not None and interval > 0.0
         num_cpus = cpu_count() or 1
-        if POSIX:
-            def timer():
-                return _timer() * num_cpus
-        else:
-            def timer():
-                return sum(cpu_times())
+        timer = _cpu_percent_timer(num_cpus)
         if blocking:
             st1 = timer()
             pt1 = self._proc.cpu_times()
@@ -946,32 +1117,7 @@ class Process(object):
         self._last_sys_cpu_times = st2
         self._last_proc_cpu_times = pt2
 
-        try:
-            # This is the utilization split evenly between all CPUs.
-            # E.g. a busy loop process on a 2-CPU-cores system at this
-            # point is reported as 50% instead of 100%.
-            overall_cpus_percent = ((delta_proc / delta_time) * 100)
-        except ZeroDivisionError:
-            # interval was too low
-            return 0.0
-        else:
-            # Note 1.
-            # in order to emulate "top" we multiply the value for the num
-            # of CPU cores. This way the busy process will be reported as
-            # having 100% (or more) usage.
-            #
-            # Note 2:
-            # taskmgr.exe on Windows differs in that it will show 50%
-            # instead.
-            #
-            # Note #3:
-            # a percentage > 100 is legitimate as it can result from a
-            # process with multiple threads running on different CPU
-            # cores (top does the same), see:
-            # http://stackoverflow.com/questions/1032357
-            # https://github.com/giampaolo/psutil/issues/474
-            single_cpu_percent = overall_cpus_percent * num_cpus
-            return round(single_cpu_percent, 1)
+        return _cpu_percent_delta(delta_proc, delta_time, num_cpus)
 
     def cpu_times(self):
         """Return a (user, system, children_user, children_system)
@@ -1047,7 +1193,7 @@ class Process(object):
     if hasattr(_psplatform.Process, "memory_maps"):
         # Available everywhere except OpenBSD and NetBSD.
 
-        def memory_maps(self, grouped=True):
+        def memory_maps(self, grouped=True, fast=False):
             """Return process' mapped memory regions as a list of namedtuples
             whose fields are variable depending on the platform.
 
@@ -1057,22 +1203,52 @@ class Process(object):
             If 'grouped' is False every mapped region is shown as a single
             entity and the namedtuple will also include the mapped region's
             address space ('addr') and permission set ('perms').
+
+            If 'fast' is True (Linux only) only address ranges,
+            permissions, offset, device, inode, path and size of the
+            mapped regions are returned, which is considerably faster.
             """
-            it = self._proc.memory_maps()
+            if fast:
+                if not hasattr(self._proc, "memory_maps_fast"):
+                    raise NotImplementedError(
+                        "fast=True is not supported on this platform")
+                maps = self._proc.memory_maps_fast()
+                if grouped:
+                    d = {}
+                    for tupl in maps:
+                        d[tupl[5]] = d.get(tupl[5], 0) + tupl[6]
+                    nt = _psplatform.pmmap_fast_grouped
+                    return [nt(path, d[path]) for path in d]
+                nt = _psplatform.pmmap_fast
+                return [nt(*x) for x in maps]
             if grouped:
+                nt = _psplatform.pmmap_grouped
+                if hasattr(self._proc, "memory_maps_grouped"):
+                    # Linux: grouping is done in C
+                    return [nt(*x) for x in self._proc.memory_maps_grouped()]
                 d = {}
-                for tupl in it:
+                for tupl in self._proc.memory_maps():
                     path = tupl[2]
                     nums = tupl[3:]
                     try:
-                        d[path] = map(lambda x, y: x + y, d[path], nums)
+                        d[path] = [x + y for x, y in zip(d[path], nums)]
                     except KeyError:
                         d[path] = nums
-                nt = _psplatform.pmmap_grouped
                 return [nt(path, *d[path]) for path in d]  # NOQA
             else:
                 nt = _psplatform.pmmap_ext
-                return [nt(*x) for x in it]
+                return [nt(*x) for x in self._proc.memory_maps()]
+
+    if hasattr(_psplatform.Process, "memory_maps_iter"):
+
+        def memory_maps_iter(self):
+            """Same as memory_maps(grouped=False) but return a generator
+            which parses mapped regions incrementally instead of a list,
+            keeping memory usage constant for processes having a lot of
+            mapped regions.
+            """
+            nt = _psplatform.pmmap_ext
+            return (nt(*x) for x in self._proc.memory_maps_iter())
 
     def open_files(self):
         """Return files opened by process as a list of
@@ -1305,7 +1481,7 @@ def pid_exists(pid):
 _pmap = {}
 
 
-def process_iter():
+def process_iter(attrs=None, ad_value=None):
     """Return a generator yielding a Process instance for all
     running processes.
 
@@ -1318,9 +1494,20 @@ def process_iter():
 
     The sorting order in which processes are yielded is based on
     their PIDs.
+
+    "attrs" and "ad_value" have the same meaning as in
+    Process.as_dict(). If "attrs" is specified as_dict() is called
+    and the resulting dict is stored as a "info" attribute attached
+    to returned Process instance.
+    If "attrs" is an empty list it will retrieve all process info
+    (slow).
+    Processes disappearing while their info is being collected are
+    skipped.
     """
     def add(pid):
         proc = Process(pid)
+        if attrs is not None:
+            proc.info = proc.as_dict(attrs=attrs, ad_value=ad_value)
         _pmap[proc.pid] = proc
         return proc
 
@@ -1343,6 +1530,9 @@ def process_iter():
                 # use is_running() to check whether PID has been reused by
                 # another process in which case yield a new Process instance
                 if proc.is_running():
+                    if attrs is not None:
+                        proc.info = proc.as_dict(
+                            attrs=attrs, ad_value=ad_value)
                     yield proc
                 else:
                     yield add(pid)
@@ -1363,6 +1553,219 @@ def process_iter():
                 raise
 
 
+def scan(attrs, ad_value=None, workers=4, ordered=False):
+    """Same as process_iter(attrs=attrs, ad_value=ad_value) but
+    process info is collected in parallel by a pool of 'workers'
+    threads, and Process instances are yielded as soon as their info
+    is ready. This is faster when retrieving process info blocks in
+    the kernel (e.g. memory_full_info() reading /proc/{pid}/smaps on
+    Linux) as the GIL is released meanwhile.
+
+    If 'ordered' is True processes are yielded sorted by PID as
+    process_iter() does.
+    Processes disappearing while their info is being collected are
+    skipped; any other exception is re-raised in the caller.
+    """
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+    pidlist = sorted(pids())
+    for pid in set(_pmap.keys()) - set(pidlist):
+        _pmap.pop(pid, None)
+    for proc, info in _scan(pidlist,
+                            lambda proc: proc.as_dict(attrs, ad_value),
+                            workers, ordered):
+        proc.info = info
+        yield proc
+
+
+def _scan(pidlist, collect, workers, ordered):
+    """Implementation of scan(): call collect(proc) for all the PIDs
+    in 'pidlist' using a pool of worker threads and yield
+    (proc, result) tuples. Process instances are not modified.
+    """
+    inqueue = queue.Queue()
+    outqueue = queue.Queue()
+    for pid in pidlist:
+        inqueue.put(pid)
+    stop = threading.Event()
+
+    def get_proc(pid):
+        # Like process_iter() reuse the cached Process instance unless
+        # its PID has been reused.
+        proc = _pmap.get(pid)
+        try:
+            if proc is None or not proc.is_running():
+                proc = Process(pid)
+                _pmap[pid] = proc
+        except AccessDenied:
+            if proc is None:
+                raise
+        return proc, collect(proc)
+
+    def worker():
+        while not stop.is_set():
+            try:
+                pid = inqueue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                outqueue.put((pid, get_proc(pid), None))
+            except NoSuchProcess:
+                _pmap.pop(pid, None)
+                outqueue.put((pid, None, None))
+            except Exception as err:
+                outqueue.put((pid, None, err))
+
+    threads = [threading.Thread(target=worker)
+               for x in range(min(workers, len(pidlist)))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    try:
+        pending = {}
+        idx = 0
+        for x in range(len(pidlist)):
+            pid, item, err = outqueue.get()
+            if err is not None:
+                raise err
+            if not ordered:
+                if item is not None:
+                    yield item
+                continue
+            # hold results until all the ones with a lower PID are ready
+            pending[pid] = item
+            while idx < len(pidlist) and pidlist[idx] in pending:
+                item = pending.pop(pidlist[idx])
+                idx += 1
+                if item is not None:
+                    yield item
+    finally:
+        # tell the workers to stop in case the caller stopped consuming
+        # the generator or an exception occurred
+        stop.set()
+
+
+def memory_usage_by(key='username', workers=4):
+    """Collect USS, PSS and swap memory of all processes and return
+    their sums grouped by 'key' as a {value: (uss, pss, swap,
+    num_procs), ...} dict.
+    'key' can be "username", "name", "cmdline" or "cgroup" (Linux
+    only). PSS and swap are only available on Linux (0 elsewhere).
+    Process info is collected in parallel by a pool of 'workers'
+    threads (see scan()). Processes which can't be accessed are
+    skipped, and so are kernel threads on Linux.
+    """
+    if key not in ('username', 'name', 'cmdline', 'cgroup'):
+        raise ValueError("invalid key %r" % key)
+    if key == 'cgroup' and not hasattr(_psplatform.Process, "cgroup"):
+        raise NotImplementedError("key='cgroup' is not supported on this "
+                                  "platform")
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+    pidlist = pids()
+    if LINUX:
+        # Skip kernel threads up front: they have no user space memory
+        # and they are all children of kthreadd (PID 2, unless we're
+        # in a PID namespace).
+        try:
+            has_kthreadd = Process(2).name() == 'kthreadd'
+        except (NoSuchProcess, AccessDenied):
+            has_kthreadd = False
+        if has_kthreadd:
+            pidlist = [pid for pid, ppid in ppid_map().items()
+                       if pid != 2 and ppid != 2]
+    pidlist.sort()
+
+    def collect(proc):
+        try:
+            if key == 'username' and POSIX:
+                # usernames are resolved later, once per uid
+                value = proc.uids().real
+            elif key == 'cmdline':
+                value = " ".join(proc.cmdline())
+            elif key == 'cgroup':
+                value = proc._proc.cgroup()
+            else:
+                value = getattr(proc, key)()
+            return (value, proc.memory_full_info())
+        except AccessDenied:
+            return None
+
+    totals = {}
+    for proc, info in _scan(pidlist, collect, workers, False):
+        if info is None:
+            continue
+        value, mem = info
+        uss, pss, swap, num_procs = totals.get(value, (0, 0, 0, 0))
+        totals[value] = (uss + mem.uss, pss + getattr(mem, 'pss', 0),
+                         swap + getattr(mem, 'swap', 0), num_procs + 1)
+    ret = {}
+    for value, sums in totals.items():
+        if key == 'username' and POSIX:
+            # resolve each uid only once
+            uid = value
+            value = str(uid)
+            if pwd is not None:
+                try:
+                    value = pwd.getpwuid(uid).pw_name
+                except KeyError:
+                    # the uid can't be resolved by the system
+                    pass
+            if value in ret:
+                # two uids mapping to the same name
+                sums = [x + y for x, y in zip(ret[value], sums)]
+        ret[value] = _common.smemusage(*sums)
+    return ret
+
+
+if hasattr(_psplatform, "shared_memory_analysis"):
+
+    def shared_memory_analysis(pids, sample=None):
+        """Analyze how the physical memory pages mapped by the given
+        group of processes (e.g. the workers of a pre-fork server) are
+        shared among them and return a (rss, total, private, shared,
+        external) namedtuple expressed in bytes (Linux only, requires
+        root).
+        If 'sample' is > 1 only one page every 'sample' physical pages
+        is considered, which is faster, and values are estimated.
+        """
+        return _psplatform.shared_memory_analysis(pids, sample)
+
+    __all__.append("shared_memory_analysis")
+
+
+def ppid_map():
+    """Return a {pid: ppid, ...} dict for all running processes.
+    On Windows and Linux this is obtained in one shot, without
+    creating a Process instance per PID.
+    Processes which disappear in the meantime are skipped.
+    """
+    if hasattr(_psplatform, 'ppid_map'):
+        return _psplatform.ppid_map()
+    ret = {}
+    for p in process_iter():
+        try:
+            ret[p.pid] = p.ppid()
+        except (NoSuchProcess, ZombieProcess):
+            pass
+    return ret
+
+
+def proc_tree():
+    """Return a {ppid: [pid, ...], ...} dict mapping each process
+    to the sorted list of its direct children.
+    It is built on top of ppid_map().
+    """
+    tree = collections.defaultdict(list)
+    for pid, ppid in ppid_map().items():
+        # on systems supporting PID 0, PID 0's parent is usually 0
+        if pid != ppid:
+            tree[ppid].append(pid)
+    for children in tree.values():
+        children.sort()
+    return dict(tree)
+
+
 def wait_procs(procs, timeout=None, callback=None):
     """Convenience function which waits for a list of processes to
     terminate.
@@ -1416,6 +1819,47 @@ def wait_procs(procs, timeout=None, callback=None):
     alive = set(procs)
     if callback is not None and not callable(callback):
         raise TypeError("callback %r is not a callable" % callable)
+
+    if hasattr(_psplatform, 'wait_pids'):
+        # Linux only: wait for all processes at once and get notified
+        # as soon as each one of them terminates (via epoll + pidfds).
+        pidmap = collections.defaultdict(list)
+        for proc in alive:
+            pidmap[proc.pid].append(proc)
+
+        def check(pid):
+            # Called once the pidfd is open: processes whose PID has
+            # been reused are gone (same as check_gone()).
+            for proc in pidmap[pid][:]:
+                if not proc.is_running():
+                    pidmap[pid].remove(proc)
+                    proc.returncode = None
+                    gone.add(proc)
+                    if callback is not None:
+                        callback(proc)
+            return bool(pidmap[pid])
+
+        def on_terminate(pid):
+            for proc in pidmap[pid]:
+                try:
+                    returncode = proc.wait(timeout=0)
+                except TimeoutExpired:
+                    # not our children: it's terminated but it hasn't
+                    # been reaped by its parent yet
+                    returncode = None
+                proc.returncode = returncode
+                gone.add(proc)
+                if callback is not None:
+                    callback(proc)
+
+        try:
+            _psplatform.wait_pids(list(pidmap.keys()), timeout, on_terminate,
+                                  check)
+        except NotImplementedError:
+            pass
+        else:
+            return (list(gone), list(alive - gone))
+
     if timeout is not None:
         deadline = _timer() + timeout
 
@@ -1449,6 +1893,103 @@ def wait_procs(procs, timeout=None, callback=None):
     return (list(gone), list(alive))
 
 
+def cpu_percent_many(procs, interval):
+    """Return the CPU utilization of multiple processes (a list of
+    Process instances) as a {pid: percentage, ...} dict. Values have
+    the same meaning as in Process.cpu_percent(interval=interval)
+    but this blocks for 'interval' seconds only once for all
+    processes instead of once per process.
+    Processes which disappear, can't be accessed or whose PID gets
+    reused by another process in the meantime are skipped.
+    """
+    if interval is None or not interval > 0.0:
+        raise ValueError("interval must be a positive number")
+    procs = list(procs)
+    num_cpus = cpu_count() or 1
+    timer = _cpu_percent_timer(num_cpus)
+
+    def read():
+        # return a {pid: (cpu_time, starttime)} dict; starttime is
+        # used to detect PIDs which were reused between the two reads
+        if hasattr(_psplatform, 'cpu_times_map'):
+            # Linux only: read all processes in one shot (faster)
+            return dict(
+                (pid, (user + system, starttime))
+                for pid, (user, system, starttime) in
+                _psplatform.cpu_times_map([p.pid for p in procs]).items())
+        ret = {}
+        for proc in procs:
+            try:
+                times = proc.cpu_times()
+                if not proc.is_running():
+                    continue
+            except (NoSuchProcess, AccessDenied):
+                pass
+            else:
+                ret[proc.pid] = (times.user + times.system, None)
+        return ret
+
+    # start times of the processes as they were when the Process
+    # instances were created (the same value is_running() relies on)
+    idents = collections.defaultdict(set)
+    for proc in procs:
+        idents[proc.pid].add(getattr(proc._proc, '_starttime', None))
+
+    st1 = timer()
+    pt1 = read()
+    time.sleep(interval)
+    st2 = timer()
+    pt2 = read()
+    delta_time = st2 - st1
+    ret = {}
+    for pid, (cpu2, starttime2) in pt2.items():
+        if pid not in pt1:
+            continue
+        cpu1, starttime1 = pt1[pid]
+        if starttime1 != starttime2:
+            # PID has been reused by another process
+            continue
+        if starttime1 is not None and None not in idents[pid] and \
+                starttime1 not in idents[pid]:
+            # PID was reused before we were called
+            continue
+        ret[pid] = _cpu_percent_delta(cpu2 - cpu1, delta_time, num_cpus)
+    return ret
+
+
+if hasattr(_psplatform, "proc_table"):
+
+    def proc_table(fields=None, as_numpy=False):
+        """Return a columnar snapshot of all running processes as a
+        {field: array} dict where each value is an array.array (one
+        item per process, sorted by PID) of the same length.
+        No Process instance is created, making this considerably
+        faster and lighter than process_iter() when only aggregates
+        are needed.
+
+        'fields' is a list of field names (default: all of them):
+        see _psplatform.PROC_TABLE_FIELDS.
+        "status" column is a list of STATUS_* constants; on
+        Python < 3.3 "rss" is a list too.
+        If 'as_numpy' is True numpy arrays are returned instead
+        (requires numpy).
+        """
+        valid_fields = [x[0] for x in _psplatform.PROC_TABLE_FIELDS]
+        if fields is None:
+            fields = valid_fields
+        else:
+            for name in fields:
+                if name not in valid_fields:
+                    raise ValueError("invalid field name %r" % name)
+        table = _psplatform.proc_table(fields)
+        if as_numpy:
+            import numpy
+            table = dict((k, numpy.asarray(v)) for k, v in table.items())
+        return table
+
+    __all__.append("proc_table")
+
+
 # =====================================================================
 # --- CPU related functions
 # =====================================================================
@@ -1516,6 +2057,23 @@ except Exception:
     traceback.print_exc()
 
 
+def _cpu_busy_percent(t1, t2):
+    t1_all = sum(t1)
+    t1_busy = t1_all - t1.idle
+
+    t2_all = sum(t2)
+    t2_busy = t2_all - t2.idle
+
+    # this usually indicates a float precision issue
+    if t2_busy <= t1_busy:
+        return 0.0
+
+    busy_delta = t2_busy - t1_busy
+    all_delta = t2_all - t1_all
+    busy_perc = (busy_delta / all_delta) * 100
+    return round(busy_perc, 1)
+
+
 def cpu_percent(interval=None, percpu=False):
     """Return a float representing the current system-wide CPU
     utilization as a percentage.
@@ -1555,22 +2113,6 @@ def cpu_percent(interval=None, percpu=False):
     global _last_per_cpu_times
     blocking = interval is not None and interval > 0.0
 
-    def calculate(t1, t2):
-        t1_all = sum(t1)
-        t1_busy = t1_all - t1.idle
-
-        t2_all = sum(t2)
-        t2_busy = t2_all - t2.idle
-
-        # this usually indicates a float precision issue
-        if t2_busy <= t1_busy:
-            return 0.0
-
-        busy_delta = t2_busy - t1_busy
-        all_delta = t2_all - t1_all
-        busy_perc = (busy_delta / all_delta) * 100
-        return round(busy_perc, 1)
-
     # system-wide usage
     if not percpu:
         if blocking:
@@ -1584,7 +2126,7 @@ def cpu_percent(interval=None, percpu=False):
                 # https://github.com/giampaolo/psutil/pull/715
                 t1 = cpu_times()
         _last_cpu_times = cpu_times()
-        return calculate(t1, _last_cpu_times)
+        return _cpu_busy_percent(t1, _last_cpu_times)
     # per-cpu usage
     else:
         ret = []
@@ -1600,7 +2142,7 @@ def cpu_percent(interval=None, percpu=False):
                 tot1 = cpu_times(percpu=True)
         _last_per_cpu_times = cpu_times(percpu=True)
         for t1, t2 in zip(tot1, _last_per_cpu_times):
-            ret.append(calculate(t1, t2))
+            ret.append(_cpu_busy_percent(t1, t2))
         return ret
 
 
@@ -1611,6 +2153,34 @@ _last_cpu_times_2 = _last_cpu_times
 _last_per_cpu_times_2 = _last_per_cpu_times
 
 
+def _cpu_times_percent_calc(t1, t2):
+    nums = []
+    all_delta = sum(t2) - sum(t1)
+    for field in t1._fields:
+        field_delta = getattr(t2, field) - getattr(t1, field)
+        try:
+            field_perc = (100 * field_delta) / all_delta
+        except ZeroDivisionError:
+            field_perc = 0.0
+        field_perc = round(field_perc, 1)
+        # CPU times are always supposed to increase over time
+        # or at least remain the same and that's because time
+        # cannot go backwards.
+        # Surprisingly sometimes this might not be the case (at
+        # least on Windows and Linux), see:
+        # https://github.com/giampaolo/psutil/issues/392
+        # https://github.com/giampaolo/psutil/issues/645
+        # I really don't know what to do about that except
+        # forcing the value to 0 or 100.
+        if field_perc > 100.0:
+            field_perc = 100.0
+        # `<=` because `-0.0 == 0.0` evaluates to True
+        elif field_perc <= 0.0:
+            field_perc = 0.0
+        nums.append(field_perc)
+    return _psplatform.scputimes(*nums)
+
+
 def cpu_times_percent(interval=None, percpu=False):
     """Same as cpu_percent() but provides utilization percentages
     for each specific CPU time as is returned by cpu_times().
@@ -1628,33 +2198,6 @@ def cpu_times_percent(interval=None, percpu=False):
     global _last_per_cpu_times_2
     blocking = interval is not None and interval > 0.0
 
-    def calculate(t1, t2):
-        nums = []
-        all_delta = sum(t2) - sum(t1)
-        for field in t1._fields:
-            field_delta = getattr(t2, field) - getattr(t1, field)
-            try:
-                field_perc = (100 * field_delta) / all_delta
-            except ZeroDivisionError:
-                field_perc = 0.0
-            field_perc = round(field_perc, 1)
-            # CPU times are always supposed to increase over time
-            # or at least remain the same and that's because time
-            # cannot go backwards.
-            # Surprisingly sometimes this might not be the case (at
-            # least on Windows and Linux), see:
-            # https://github.com/giampaolo/psutil/issues/392
-            # https://github.com/giampaolo/psutil/issues/645
-            # I really don't know what to do about that except
-            # forcing the value to 0 or 100.
-            if field_perc > 100.0:
-                field_perc = 100.0
-            # `<=` because `-0.0 == 0.0` evaluates to True
-            elif field_perc <= 0.0:
-                field_perc = 0.0
-            nums.append(field_perc)
-        return _psplatform.scputimes(*nums)
-
     # system-wide usage
     if not percpu:
         if blocking:
@@ -1668,7 +2211,7 @@ def cpu_times_percent(interval=None, percpu=False):
                 # https://github.com/giampaolo/psutil/pull/715
                 t1 = cpu_times()
         _last_cpu_times_2 = cpu_times()
-        return calculate(t1, _last_cpu_times_2)
+        return _cpu_times_percent_calc(t1, _last_cpu_times_2)
     # per-cpu usage
     else:
         ret = []
@@ -1684,7 +2227,7 @@ def cpu_times_percent(interval=None, percpu=False):
                 tot1 = cpu_times(percpu=True)
         _last_per_cpu_times_2 = cpu_times(percpu=True)
         for t1, t2 in zip(tot1, _last_per_cpu_times_2):
-            ret.append(calculate(t1, t2))
+            ret.append(_cpu_times_percent_calc(t1, t2))
         return ret
 
 
@@ -1693,6 +2236,170 @@ def cpu_stats():
     return _psplatform.cpu_stats()
 
 
+class CPUSampler(object):
+    """Sample the CPU times of a set of processes (default: all of
+    them) every 'interval' seconds in a background thread, keeping
+    the last 'history' seconds worth of samples for each process in
+    a ring buffer, so that the CPU utilization of any process over
+    any window up to 'history' can be retrieved at any time in O(1):
+
+      >>> sampler = psutil.CPUSampler(interval=1, history=60)
+      >>> sampler.start()
+      >>> ...
+      >>> sampler.cpu_percent(pid, window=10)
+      2.0
+      >>> sampler.stop()
+
+    On Linux the CPU times of all processes are read in one shot.
+    """
+
+    def __init__(self, pids=None, interval=1.0, history=60.0):
+        if not interval > 0:
+            raise ValueError("interval must be a positive number")
+        if not history >= interval:
+            raise ValueError("history must be >= interval")
+        self._pids = None if pids is None else list(pids)
+        self._interval = interval
+        self._history = history
+        self._maxlen = int(round(history / interval)) + 1
+        # {pid: ident}
+        self._idents = {}
+        # {pid: deque([(timestamp, cputime), ...])}
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._stopev = threading.Event()
+        self._thread = None
+        # last exception raised in the background thread, if any
+        self._exc = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def history(self):
+        return self._history
+
+    def _read(self):
+        """Return a {pid: (user, system, ident), ...} dict where ident
+        is a value which changes in case the PID is reused.
+        """
+        pidlist = pids() if self._pids is None else self._pids
+        if hasattr(_psplatform, 'cpu_times_map'):
+            # Linux only (faster)
+            return _psplatform.cpu_times_map(pidlist)
+        ret = {}
+        for pid in pidlist:
+            try:
+                proc = _psplatform.Process(pid)
+                times = proc.cpu_times()
+                ret[pid] = (times.user, times.system, proc.create_time())
+            except (NoSuchProcess, AccessDenied):
+                pass
+        return ret
+
+    def sample(self):
+        """Take one sample of all processes. This is what the
+        background thread does every 'interval' seconds.
+        """
+        data = self._read()
+        now = _timer()
+        with self._lock:
+            for pid in set(self._samples) - set(data):
+                del self._samples[pid]
+                del self._idents[pid]
+            for pid, (user, system, ident) in data.items():
+                if self._idents.get(pid) != ident:
+                    # new process or PID reused
+                    self._idents[pid] = ident
+                    self._samples[pid] = collections.deque(
+                        maxlen=self._maxlen)
+                self._samples[pid].append((now, user + system))
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as err:
+                # Keep sampling; the error is re-raised by the next
+                # cpu_percent() or stop() call.
+                with self._lock:
+                    self._exc = err
+            self._stopev.wait(self._interval)
+            if self._stopev.is_set():
+                break
+
+    def start(self):
+        """Start the background sampling thread."""
+        if self._thread is not None:
+            raise ValueError("already started")
+        self._stopev.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _raise_pending(self):
+        # must be called with the lock held
+        exc, self._exc = self._exc, None
+        if exc is not None:
+            raise exc
+
+    def stop(self):
+        """Stop the background sampling thread.
+        If the last sample taken by the background thread failed
+        and the error was not already reported, re-raise it.
+        """
+        if self._thread is not None:
+            self._stopev.set()
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._raise_pending()
+
+    def pids(self):
+        """Return the list of sampled PIDs."""
+        with self._lock:
+            return sorted(self._samples)
+
+    def cpu_percent(self, pid, window=None):
+        """Return the CPU utilization of process 'pid' as a percentage
+        over the last 'window' seconds (default: 'interval'), with the
+        same meaning as Process.cpu_percent().
+        If less than 'window' seconds have been sampled so far use all
+        the available samples; if there's only one return 0.0.
+        Raise NoSuchProcess if pid is not being sampled.
+        If the background thread failed to take a sample since the
+        last call the error is re-raised (once).
+        """
+        if window is None:
+            window = self._interval
+        if not 0 < window <= self._history:
+            raise ValueError("window must be > 0 and <= history")
+        nsamples = max(1, int(round(window / self._interval)))
+        with self._lock:
+            self._raise_pending()
+            try:
+                buf = self._samples[pid]
+            except KeyError:
+                raise NoSuchProcess(pid)
+            if len(buf) < 2:
+                return 0.0
+            nsamples = min(nsamples, len(buf) - 1)
+            t1, cpu1 = buf[-1 - nsamples]
+            t2, cpu2 = buf[-1]
+        try:
+            return round(((cpu2 - cpu1) / (t2 - t1)) * 100, 1)
+        except ZeroDivisionError:
+            return 0.0
+
+
 # =====================================================================
 # --- system memory related functions
 # =====================================================================
@@ -1865,7 +2572,8 @@ def net_io_counters(pernic=False):
         return _common.snetio(*[sum(x) for x in zip(*rawdict.values())])
 
 
-def net_connections(kind='inet'):
+def net_connections(kind='inet', resolve_pids=True, status=None, lport=None,
+                    rport=None):
     """Return system-wide connections as a list of
     (fd, family, type, laddr, raddr, status, pid) namedtuples.
     In case of limited privileges 'fd' and 'pid' may be set to -1
@@ -1886,9 +2594,58 @@ def net_connections(kind='inet'):
     unix            UNIX socket (both UDP and TCP protocols)
     all             the sum of all the possible families and protocols
 
+    If 'status' (a CONN_* constant or a collection of them), 'lport'
+    or 'rport' are specified only the connections with that status,
+    local port or remote port are returned.
+    If 'resolve_pids' is False 'fd' and 'pid' are always set to -1
+    and None and connections are not de-duplicated. On Linux this
+    avoids reading the file descriptors of all processes, and
+    filtering happens before addresses are decoded, which is a lot
+    faster when only counting connections.
+
     On OSX this function requires root privileges.
     """
-    return _psplatform.net_connections(kind)
+    if status is None:
+        states = None
+    elif isinstance(status, str):
+        states = frozenset([status])
+    else:
+        states = frozenset(status)
+    if LINUX:
+        return _psplatform.net_connections(
+            kind, states=states, lport=lport, rport=rport,
+            resolve_pids=resolve_pids)
+
+    def port(addr):
+        return addr[1] if addr else 0
+
+    ret = _psplatform.net_connections(kind)
+    if states is not None:
+        ret = [x for x in ret if x.status in states]
+    if lport is not None or rport is not None:
+        ret = [x for x in ret
+               if x.family in (socket.AF_INET, socket.AF_INET6)]
+        if lport is not None:
+            ret = [x for x in ret if port(x.laddr) == lport]
+        if rport is not None:
+            ret = [x for x in ret if port(x.raddr) == rport]
+    if not resolve_pids:
+        ret = [x._replace(fd=-1, pid=None) for x in ret]
+    return ret
+
+
+if hasattr(_psplatform, "net_unix_peers"):
+
+    def net_unix_peers():
+        """Return connected UNIX sockets as a list of
+        (pid, fd, laddr, peer_pid, peer_fd, raddr) namedtuples, telling
+        which process is talking to which (Linux only).
+        In case of limited privileges 'pid'/'peer_pid' and 'fd'/'peer_fd'
+        may be set to None and -1 respectively.
+        """
+        return _psplatform.net_unix_peers()
+
+    __all__.append("net_unix_peers")
 
 
 def net_if_addrs():
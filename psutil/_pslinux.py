@@ -6,14 +6,17 @@
 
 from __future__ import division
 
+import array
 import base64
 import errno
 import functools
 import os
 import re
+import select
 import socket
 import struct
 import sys
+import time
 import traceback
 import warnings
 from collections import defaultdict
@@ -25,6 +28,7 @@ from . import _psutil_linux as cext
 from . import _psutil_posix as cext_posix
 from ._common import isfile_strict
 from ._common import memoize
+from ._common import memoize_when_activated
 from ._common import parse_environ_block
 from ._common import NIC_DUPLEX_FULL
 from ._common import NIC_DUPLEX_HALF
@@ -35,6 +39,7 @@ from ._common import usage_percent
 from ._compat import b
 from ._compat import basestring
 from ._compat import long
+from ._compat import lru_cache
 from ._compat import PY3
 
 if sys.version_info >= (3, 4):
@@ -57,7 +62,14 @@ __extra__all__ = [
 # --- constants
 
 HAS_SMAPS = os.path.exists('/proc/%s/smaps' % os.getpid())
+# Linux >= 4.14
+HAS_SMAPS_ROLLUP = os.path.exists('/proc/%s/smaps_rollup' % os.getpid())
 HAS_PRLIMIT = hasattr(cext, "linux_prlimit")
+HAS_INET_DIAG = hasattr(cext, "net_inet_diag")
+HAS_UNIX_DIAG = hasattr(cext, "net_unix_diag")
+# Linux >= 3.5 compiled with CONFIG_PROC_CHILDREN
+HAS_PROC_CHILDREN = os.path.exists(
+    '/proc/%s/task/%s/children' % (os.getpid(), os.getpid()))
 
 # RLIMIT_* constants, not guaranteed to be present on all kernels
 if HAS_PRLIMIT:
@@ -127,6 +139,11 @@ TCP_STATUSES = {
     "0A": _common.CONN_LISTEN,
     "0B": _common.CONN_CLOSING
 }
+# same as above, keyed by the kernel TCP state number (inet_diag)
+TCP_STATUSES_NUM = dict((int(k, 16), v) for k, v in TCP_STATUSES.items())
+# inet_diag states bitmask matching the sockets listed in /proc/net/*;
+# e.g. TCP_BOUND_INACTIVE sockets (Linux >= 6.5) are not listed there
+TCP_STATES_MASK = sum(1 << num for num in TCP_STATUSES_NUM)
 
 # set later from __init__.py
 NoSuchProcess = None
@@ -250,6 +267,8 @@ popenfile = namedtuple('popenfile',
                        ['path', 'fd', 'position', 'mode', 'flags'])
 pmem = namedtuple('pmem', 'rss vms shared text lib data dirty')
 pfullmem = namedtuple('pfullmem', pmem._fields + ('uss', 'pss', 'swap'))
+pthread_full = namedtuple('pthread_full', _common.pthread._fields +
+                          ('name', 'status', 'cpu_num', 'nice'))
 pmmap_grouped = namedtuple(
     'pmmap_grouped', ['path', 'rss', 'size', 'pss', 'shared_clean',
                       'shared_dirty', 'private_clean', 'private_dirty',
@@ -257,6 +276,16 @@ pmmap_grouped = namedtuple(
 
 pmmap_ext = namedtuple(
     'pmmap_ext', 'addr perms ' + ' '.join(pmmap_grouped._fields))
+pmmap_fast = namedtuple(
+    'pmmap_fast', ['addr', 'perms', 'offset', 'dev', 'inode', 'path', 'size'])
+pmmap_fast_grouped = namedtuple('pmmap_fast_grouped', ['path', 'size'])
+ssharedmem = namedtuple(
+    'ssharedmem', ['rss', 'total', 'private', 'shared', 'external'])
+sunixpeer = namedtuple(
+    'sunixpeer', ['pid', 'fd', 'laddr', 'peer_pid', 'peer_fd', 'raddr'])
+pstatusfields = namedtuple(
+    'pstatusfields', ['peak_rss', 'swap', 'sigq', 'sigq_limit',
+                      'cpus_allowed'])
 
 
 # --- system memory
@@ -493,20 +522,337 @@ def pid_exists(pid):
     return _psposix.pid_exists(pid)
 
 
+def wait_pid(pid, timeout=None):
+    """Same as _psposix.wait_pid() but on Linux >= 5.3 wait for
+    process termination by polling a pidfd instead of sleeping in a
+    loop, so that we're notified immediately and use no CPU while
+    waiting. Fall back on _psposix.wait_pid() if pidfds are not
+    supported.
+    """
+    try:
+        pidfd = cext.proc_pidfd_open(pid)
+    except (AttributeError, OSError):
+        # AttributeError: not compiled in; OSError: ENOSYS (kernel
+        # < 5.3), EPERM (seccomp) or ESRCH (process is gone)
+        return _psposix.wait_pid(pid, timeout)
+    timer = getattr(time, 'monotonic', time.time)
+    if timeout is not None:
+        stop_at = timer() + timeout
+    try:
+        poller = select.poll()
+        poller.register(pidfd, select.POLLIN)
+        while True:
+            if timeout is None:
+                ms = -1
+            else:
+                remaining = stop_at - timer()
+                ms = int(remaining * 1000) + 1 if remaining > 0 else 0
+            try:
+                if poller.poll(ms):
+                    break
+            except select.error as err:
+                if err.args[0] != errno.EINTR:
+                    raise
+                continue
+            if ms == 0:
+                raise _psposix.TimeoutExpired()
+    finally:
+        os.close(pidfd)
+    # The process has terminated: if it's our children reap it and
+    # return its exit code, else wait for its parent to reap it.
+    if timeout is not None:
+        timeout = max(0, stop_at - timer())
+    return _psposix.wait_pid(pid, timeout)
+
+
+def wait_pids(pids, timeout, callback, check=None):
+    """Wait for multiple processes to terminate by registering one
+    pidfd per process in a single epoll set (Linux >= 5.3) and call
+    callback(pid) as soon as each one of them terminates.
+    If 'check' is given, check(pid) is called once the pidfd of each
+    PID has been opened (so that it refers to the same process for
+    the rest of the wait): if it returns False the PID is not waited
+    for and callback is not called for it.
+    Return the set of PIDs which are still alive when timeout
+    expires.
+    Raise NotImplementedError if pidfds are not supported or can't
+    be opened for all PIDs (e.g. too many open files), in which case
+    neither check nor callback are ever called.
+    """
+    timer = getattr(time, 'monotonic', time.time)
+    if timeout is not None:
+        stop_at = timer() + timeout
+    fds = {}
+    gone = []
+    ep = None
+    try:
+        for pid in pids:
+            try:
+                fd = cext.proc_pidfd_open(pid)
+            except AttributeError:
+                raise NotImplementedError("pidfd_open() not supported")
+            except OSError as err:
+                if err.errno == errno.ESRCH:
+                    gone.append(pid)
+                    continue
+                elif err.errno in (errno.ENOSYS, errno.EPERM):
+                    raise NotImplementedError("pidfd_open() not supported")
+                elif err.errno in (errno.EMFILE, errno.ENFILE):
+                    # one fd per process is needed; let the caller
+                    # fall back on polling
+                    raise NotImplementedError(
+                        "can't open a pidfd for each process (%s)" % err)
+                raise
+            fds[fd] = pid
+        if check is not None:
+            for fd, pid in list(fds.items()):
+                if not check(pid):
+                    del fds[fd]
+                    os.close(fd)
+        ep = select.epoll()
+        for fd in fds:
+            ep.register(fd, select.EPOLLIN)
+        for pid in gone:
+            callback(pid)
+        while fds:
+            if timeout is None:
+                remaining = -1
+            else:
+                remaining = max(0, stop_at - timer())
+            try:
+                events = ep.poll(remaining)
+            except (IOError, OSError) as err:
+                if err.errno == errno.EINTR:
+                    continue
+                raise
+            for fd, event in events:
+                pid = fds.pop(fd)
+                ep.unregister(fd)
+                os.close(fd)
+                callback(pid)
+            if not events and remaining == 0:
+                break
+        return set(fds.values())
+    finally:
+        for fd in fds:
+            os.close(fd)
+        if ep is not None:
+            ep.close()
+
+
+def proc_stat_bulk(pidlist=None):
+    """Read /proc/{pid}/stat for all the given PIDs (default: all
+    running processes) in one shot and return a
+    {pid: (ppid, state, utime, stime, starttime, rss, num_threads,
+    nice, processor)} dict.
+    Times are expressed in clock ticks and rss in pages.
+    PIDs which have disappeared in the meantime are skipped.
+    """
+    if pidlist is None:
+        pidlist = pids()
+    return cext.proc_stat_bulk(get_procfs_path(), pidlist)
+
+
+def ppid_map():
+    """Obtain a {pid: ppid, ...} dict for all running processes in
+    one shot. Used to speed up Process.children().
+    """
+    return dict((pid, x[0]) for pid, x in proc_stat_bulk().items())
+
+
+def cpu_times_map(pidlist=None):
+    """Return a {pid: (user, system, starttime), ...} dict for all the
+    given PIDs (default: all running processes) in one shot, where
+    starttime is expressed in clock ticks and can be used to detect
+    PID reuse.
+    """
+    return dict((pid, (float(x[2]) / CLOCK_TICKS,
+                       float(x[3]) / CLOCK_TICKS,
+                       x[4]))
+                for pid, x in proc_stat_bulk(pidlist).items())
+
+
+try:
+    array.array('Q')
+except ValueError:
+    # Python < 3.3
+    _UINT64_TYPECODE = None
+else:
+    _UINT64_TYPECODE = 'Q'
+
+# proc_table() field name -> array.array typecode (None == list)
+PROC_TABLE_FIELDS = (
+    ('pid', 'l'),
+    ('ppid', 'l'),
+    ('status', None),
+    ('user_time', 'd'),
+    ('system_time', 'd'),
+    ('create_time', 'd'),
+    # in bytes, may not fit an unsigned long on 32 bit platforms
+    ('rss', _UINT64_TYPECODE),
+    ('num_threads', 'l'),
+    ('nice', 'l'),
+    ('cpu_num', 'l'),
+    ('uid', 'L'),
+)
+
+
+def proc_table(fields):
+    """Return a {field: array} dict for all running processes, one
+    column per field, rows sorted by PID. Built on top of
+    proc_stat_bulk() so that no Process instance is created.
+    "uid" requires reading /proc/{pid}/status of each process hence
+    it's slower.
+    """
+    bt = BOOT_TIME or boot_time()
+    table = dict((name, [] if code is None else array.array(code))
+                 for name, code in PROC_TABLE_FIELDS if name in fields)
+    stats = proc_stat_bulk()
+    if 'uid' in table:
+        uids = cext.proc_uid_bulk(get_procfs_path(), list(stats))
+    for pid, x in sorted(stats.items()):
+        ppid, state, utime, stime, starttime, rss, num_threads, nice, \
+            cpu_num = x
+        if 'uid' in table:
+            if pid not in uids:
+                # process is gone or unreadable; skip the whole row so
+                # that columns stay aligned
+                continue
+            table['uid'].append(uids[pid])
+        row = (
+            ('pid', pid),
+            ('ppid', ppid),
+            ('status', PROC_STATUSES.get(state, '?')),
+            ('user_time', float(utime) / CLOCK_TICKS),
+            ('system_time', float(stime) / CLOCK_TICKS),
+            ('create_time', (float(starttime) / CLOCK_TICKS) + bt),
+            ('rss', rss * PAGESIZE),
+            ('num_threads', num_threads),
+            ('nice', nice),
+            ('cpu_num', cpu_num),
+        )
+        for name, value in row:
+            if name in table:
+                table[name].append(value)
+    return table
+
+
+def shared_memory_analysis(pids, sample=None):
+    """Analyze how the physical pages mapped by a group of processes
+    are shared among them by reading /proc/{pid}/pagemap and
+    /proc/kpagecount (requires root). Return a
+    (rss, total, private, shared, external) namedtuple expressed in
+    bytes where:
+     - rss: the sum of the resident memory of all processes
+     - total: the physical memory actually used by the group
+     - private: memory used by one process only
+     - shared: memory used by more than one process of the group
+     - external: memory also used by processes outside of the group
+    A page is attributed to processes, not mappings: a page mapped
+    more than once by the same process (and by no other) is private.
+    If 'sample' is > 1 only one physical page every 'sample' pages
+    is looked up and values are scaled accordingly.
+    Processes which disappear in the meantime are skipped.
+    """
+    if sample is not None and not sample >= 1:
+        raise ValueError("sample must be a positive integer")
+    sample = int(sample or 1)
+    # {pfn: number of processes of the group mapping it}
+    group_counts = {}
+    # {pfn: number of times it's mapped by processes of the group}
+    group_maps = {}
+    rss = 0
+    for pid in pids:
+        try:
+            pfns = Process(pid).pagemap_pfns(sample)
+        except NoSuchProcess:
+            continue
+        if pfns and not any(pfns):
+            # PFNs are zeroed unless we have CAP_SYS_ADMIN
+            raise AccessDenied(pid, msg="PFNs are not available")
+        rss += len(pfns)
+        for pfn in pfns:
+            group_maps[pfn] = group_maps.get(pfn, 0) + 1
+        for pfn in set(pfns):
+            group_counts[pfn] = group_counts.get(pfn, 0) + 1
+    pfns = sorted(group_counts)
+    try:
+        mapcounts = cext.kpagecount(
+            "%s/kpagecount" % get_procfs_path(), pfns)
+    except EnvironmentError as err:
+        if err.errno in (errno.EPERM, errno.EACCES):
+            raise AccessDenied(msg=str(err))
+        raise
+    private = shared = external = 0
+    for pfn, mapcount in zip(pfns, mapcounts):
+        # kpagecount is the number of mappings, not of processes:
+        # compare it with the mappings found within the group
+        is_external = mapcount > group_maps[pfn]
+        if group_counts[pfn] > 1:
+            shared += 1
+        elif not is_external:
+            private += 1
+        if is_external:
+            external += 1
+    return ssharedmem(*[x * PAGESIZE * sample for x in
+                        (rss, len(pfns), private, shared, external)])
+
+
 # --- network
 
 class _Ipv6UnsupportedError(Exception):
     pass
 
 
+@lru_cache(maxsize=1024)
+def _decode_ip(ip, family):
+    """Convert the hexadecimal IP portion of an address as displayed
+    in /proc/net/* into a human readable IP address (see
+    Connections.decode_address()).
+    The same addresses (e.g. the local address of a server) usually
+    occur on many lines, hence the cache.
+    """
+    if PY3:
+        ip = ip.encode('ascii')
+    if family == socket.AF_INET:
+        # see: https://github.com/giampaolo/psutil/issues/201
+        if LITTLE_ENDIAN:
+            return socket.inet_ntop(family, base64.b16decode(ip)[::-1])
+        else:
+            return socket.inet_ntop(family, base64.b16decode(ip))
+    else:  # IPv6
+        # old version - let's keep it, just in case...
+        # ip = ip.decode('hex')
+        # return socket.inet_ntop(socket.AF_INET6,
+        #          ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
+        ip = base64.b16decode(ip)
+        try:
+            # see: https://github.com/giampaolo/psutil/issues/201
+            if LITTLE_ENDIAN:
+                return socket.inet_ntop(
+                    socket.AF_INET6,
+                    struct.pack('>4I', *struct.unpack('<4I', ip)))
+            else:
+                return socket.inet_ntop(
+                    socket.AF_INET6,
+                    struct.pack('<4I', *struct.unpack('<4I', ip)))
+        except ValueError:
+            # see: https://github.com/giampaolo/psutil/issues/623
+            if not supports_ipv6():
+                raise _Ipv6UnsupportedError
+            else:
+                raise
+
+
 class Connections:
     """A wrapper on top of /proc/net/* files, retrieving per-process
     and system-wide open connections (TCP, UDP, UNIX) similarly to
     "netstat -an".
 
-    Note: in case of UNIX sockets we're only able to determine the
-    local endpoint/path, not the one it's connected to.
-    According to [1] it would be possible but not easily.
+    Note: in case of UNIX sockets the endpoint they're connected to
+    can only be determined via NETLINK_SOCK_DIAG (unix_diag), which
+    reports the peer's inode [1]. /proc/net/unix doesn't, so when
+    falling back on it 'raddr' is always None.
 
     [1] http://serverfault.com/a/417946
     """
@@ -585,6 +931,7 @@ class Connections:
         first, so we need to reverse the order of the bytes to convert it
         to an IP address.
         The port is represented as a two-byte hexadecimal number.
+        Decoded IP addresses are cached (see _decode_ip()).
 
         Reference:
         http://linuxdevcenter.com/pub/a/linux/2000/11/16/LinuxAdmin.html
@@ -595,40 +942,14 @@ class Connections:
         # no end-points connected
         if not port:
             return ()
-        if PY3:
-            ip = ip.encode('ascii')
-        if family == socket.AF_INET:
-            # see: https://github.com/giampaolo/psutil/issues/201
-            if LITTLE_ENDIAN:
-                ip = socket.inet_ntop(family, base64.b16decode(ip)[::-1])
-            else:
-                ip = socket.inet_ntop(family, base64.b16decode(ip))
-        else:  # IPv6
-            # old version - let's keep it, just in case...
-            # ip = ip.decode('hex')
-            # return socket.inet_ntop(socket.AF_INET6,
-            #          ''.join(ip[i:i+4][::-1] for i in xrange(0, 16, 4)))
-            ip = base64.b16decode(ip)
-            try:
-                # see: https://github.com/giampaolo/psutil/issues/201
-                if LITTLE_ENDIAN:
-                    ip = socket.inet_ntop(
-                        socket.AF_INET6,
-                        struct.pack('>4I', *struct.unpack('<4I', ip)))
-                else:
-                    ip = socket.inet_ntop(
-                        socket.AF_INET6,
-                        struct.pack('<4I', *struct.unpack('<4I', ip)))
-            except ValueError:
-                # see: https://github.com/giampaolo/psutil/issues/623
-                if not supports_ipv6():
-                    raise _Ipv6UnsupportedError
-                else:
-                    raise
-        return (ip, port)
+        return (_decode_ip(ip, family), port)
 
-    def process_inet(self, file, family, type_, inodes, filter_pid=None):
-        """Parse /proc/net/tcp* and /proc/net/udp* files."""
+    def process_inet(self, file, family, type_, inodes, filter_pid=None,
+                     states=None, lport=None, rport=None):
+        """Parse /proc/net/tcp* and /proc/net/udp* files.
+        Lines not matching 'states' (a set of CONN_* constants), 'lport'
+        or 'rport' are skipped before addresses are decoded.
+        """
         if file.endswith('6') and not os.path.exists(file):
             # IPv6 not supported
             return
@@ -642,6 +963,18 @@ class Connections:
                     raise RuntimeError(
                         "error while parsing %s; malformed line %s %r" % (
                             file, lineno, line))
+                if type_ == socket.SOCK_STREAM:
+                    status = TCP_STATUSES[status]
+                else:
+                    status = _common.CONN_NONE
+                if states is not None and status not in states:
+                    continue
+                if lport is not None and \
+                        int(laddr.split(':')[1], 16) != lport:
+                    continue
+                if rport is not None and \
+                        int(raddr.split(':')[1], 16) != rport:
+                    continue
                 if inode in inodes:
                     # # We assume inet sockets are unique, so we error
                     # # out if there are multiple references to the
@@ -655,10 +988,6 @@ class Connections:
                 if filter_pid is not None and filter_pid != pid:
                     continue
                 else:
-                    if type_ == socket.SOCK_STREAM:
-                        status = TCP_STATUSES[status]
-                    else:
-                        status = _common.CONN_NONE
                     try:
                         laddr = self.decode_address(laddr, family)
                         raddr = self.decode_address(raddr, family)
@@ -666,6 +995,93 @@ class Connections:
                         continue
                     yield (fd, family, type_, laddr, raddr, status, pid)
 
+    def process_inet_diag(self, family, type_, inodes, filter_pid=None,
+                          states=None, lport=None, rport=None):
+        """Same as process_inet() but sockets are dumped in binary form
+        via NETLINK_SOCK_DIAG. If 'states' is a set of CONN_* constants
+        only the TCP sockets in those states are dumped by the kernel.
+        Raises OSError if netlink is not available.
+        """
+        if type_ == socket.SOCK_STREAM:
+            proto = socket.IPPROTO_TCP
+            if states is None:
+                mask = TCP_STATES_MASK
+            else:
+                mask = 0
+                for num, status in TCP_STATUSES_NUM.items():
+                    if status in states:
+                        mask |= 1 << num
+                if not mask:
+                    return []
+        else:
+            proto = socket.IPPROTO_UDP
+            if states is not None and _common.CONN_NONE not in states:
+                return []
+            mask = TCP_STATES_MASK
+        ls = []
+        for laddr, raddr, state, inode in cext.net_inet_diag(
+                family, proto, mask):
+            if lport is not None and (laddr[1] if laddr else 0) != lport:
+                continue
+            if rport is not None and (raddr[1] if raddr else 0) != rport:
+                continue
+            inode = str(inode)
+            if inode in inodes:
+                pid, fd = inodes[inode][0]
+            else:
+                pid, fd = None, -1
+            if filter_pid is not None and filter_pid != pid:
+                continue
+            if type_ == socket.SOCK_STREAM:
+                status = TCP_STATUSES_NUM.get(state, _common.CONN_NONE)
+            else:
+                status = _common.CONN_NONE
+            ls.append((fd, family, type_, laddr, raddr, status, pid))
+        return ls
+
+    def process_unix_diag(self, family, inodes, filter_pid=None):
+        """Same as process_unix() but sockets are dumped in binary
+        form via NETLINK_SOCK_DIAG, which also reports the inode of
+        the peer socket. 'raddr' is set to the path of the peer or
+        None if the socket is not connected.
+        Raises OSError if netlink is not available.
+        """
+        socks = cext.net_unix_diag()
+        paths = dict((inode, path) for path, _, inode, _ in socks)
+        ls = []
+        for path, type_, inode, peer in socks:
+            raddr = paths.get(peer, "") if peer else None
+            inode = str(inode)
+            if inode in inodes:
+                pairs = inodes[inode]
+            else:
+                pairs = [(None, -1)]
+            for pid, fd in pairs:
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                ls.append((fd, family, type_, path, raddr,
+                           _common.CONN_NONE, pid))
+        return ls
+
+    def unix_peers(self):
+        """Return a list of sunixpeer namedtuples, one for each
+        connected UNIX socket, pairing the process which owns it with
+        the process owning the socket at the other end.
+        """
+        self._procfs_path = get_procfs_path()
+        inodes = self.get_all_inodes()
+        socks = cext.net_unix_diag()
+        paths = dict((inode, path) for path, _, inode, _ in socks)
+        ret = []
+        for path, _, inode, peer in socks:
+            if not peer:
+                continue
+            pid, fd = inodes.get(str(inode), [(None, -1)])[0]
+            peer_pid, peer_fd = inodes.get(str(peer), [(None, -1)])[0]
+            ret.append(sunixpeer(pid, fd, path, peer_pid, peer_fd,
+                                 paths.get(peer, "")))
+        return ret
+
     def process_unix(self, file, family, inodes, filter_pid=None):
         """Parse /proc/net/unix files."""
         with open_text(file, buffering=BIGGER_FILE_BUFFERING) as f:
@@ -696,49 +1112,107 @@ class Connections:
                         else:
                             path = ""
                         type_ = int(type_)
+                        # /proc/net/unix doesn't tell the peer: unlike
+                        # process_unix_diag() this is always None
                         raddr = None
                         status = _common.CONN_NONE
                         yield (fd, family, type_, path, raddr, status, pid)
 
-    def retrieve(self, kind, pid=None):
+    def retrieve(self, kind, pid=None, states=None, lport=None, rport=None,
+                 resolve_pids=True):
+        """Return connections of the given 'kind'. 'states' (a set of
+        CONN_* constants), 'lport' and 'rport' only return connections
+        matching them.
+        If 'resolve_pids' is False the fds of processes are not read
+        at all: 'fd' and 'pid' fields are set to -1 and None and, as
+        such, connections are not de-duplicated.
+        """
         if kind not in self.tmap:
             raise ValueError("invalid %r kind argument; choose between %s"
                              % (kind, ', '.join([repr(x) for x in self.tmap])))
         self._procfs_path = get_procfs_path()
-        if pid is not None:
-            inodes = self.get_proc_inodes(pid)
-            if not inodes:
-                # no connections for this process
-                return []
-        else:
-            inodes = self.get_all_inodes()
-        ret = set()
+        filters = dict(states=states, lport=lport, rport=rport)
+        if pid is None:
+            if not resolve_pids:
+                return self._retrieve(kind, {}, unique=False, **filters)
+            return self._retrieve(kind, self.get_all_inodes(), **filters)
+        inodes = self.get_proc_inodes(pid)
+        if not inodes:
+            # no connections for this process
+            return []
+        return self._retrieve(kind, inodes, pid=pid, **filters)
+
+    def _retrieve(self, kind, inodes, pid=None, states=None, lport=None,
+                  rport=None, unique=True):
+        ret = set() if unique else []
         for f, family, type_ in self.tmap[kind]:
+            if states is not None and type_ != socket.SOCK_STREAM and \
+                    _common.CONN_NONE not in states:
+                # UDP and UNIX sockets have no status
+                continue
+            if family == socket.AF_UNIX and \
+                    (lport is not None or rport is not None):
+                continue
+            ls = None
             if family in (socket.AF_INET, socket.AF_INET6):
-                ls = self.process_inet(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, type_, inodes, filter_pid=pid)
+                if HAS_INET_DIAG and self._procfs_path == '/proc':
+                    try:
+                        ls = self.process_inet_diag(
+                            family, type_, inodes, filter_pid=pid,
+                            states=states, lport=lport, rport=rport)
+                    except EnvironmentError:
+                        # netlink not available (e.g. inet_diag module
+                        # not loaded, IPv6 disabled or seccomp); fall
+                        # back on parsing /proc/net/*
+                        pass
+                if ls is None:
+                    ls = self.process_inet(
+                        "%s/net/%s" % (self._procfs_path, f),
+                        family, type_, inodes, filter_pid=pid,
+                        states=states, lport=lport, rport=rport)
             else:
-                ls = self.process_unix(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, inodes, filter_pid=pid)
+                if HAS_UNIX_DIAG and self._procfs_path == '/proc':
+                    try:
+                        ls = self.process_unix_diag(
+                            family, inodes, filter_pid=pid)
+                    except EnvironmentError:
+                        # unix_diag module not loaded or netlink not
+                        # permitted; fall back on /proc/net/unix
+                        pass
+                if ls is None:
+                    ls = self.process_unix(
+                        "%s/net/%s" % (self._procfs_path, f),
+                        family, inodes, filter_pid=pid)
             for fd, family, type_, laddr, raddr, status, bound_pid in ls:
+                if states is not None and status not in states:
+                    continue
                 if pid:
                     conn = _common.pconn(fd, family, type_, laddr, raddr,
                                          status)
                 else:
                     conn = _common.sconn(fd, family, type_, laddr, raddr,
                                          status, bound_pid)
-                ret.add(conn)
+                if unique:
+                    ret.add(conn)
+                else:
+                    ret.append(conn)
         return list(ret)
 
 
 _connections = Connections()
 
 
-def net_connections(kind='inet'):
+def net_connections(kind='inet', states=None, lport=None, rport=None,
+                    resolve_pids=True):
     """Return system-wide open connections."""
-    return _connections.retrieve(kind)
+    return _connections.retrieve(kind, states=states, lport=lport,
+                                 rport=rport, resolve_pids=resolve_pids)
+
+
+if HAS_UNIX_DIAG:
+    def net_unix_peers():
+        """Return connected UNIX sockets paired with their peers."""
+        return _connections.unix_peers()
 
 
 def net_io_counters():
@@ -909,23 +1383,135 @@ def wrap_exceptions(fun):
     return wrapper
 
 
+def wrap_exceptions_iter(fun):
+    """Same as wrap_exceptions() but for generator methods: exceptions
+    are translated while the generator is consumed.
+    """
+    @functools.wraps(fun)
+    def wrapper(self, *args, **kwargs):
+        try:
+            for item in fun(self, *args, **kwargs):
+                yield item
+        except EnvironmentError as err:
+            if err.errno in (errno.ENOENT, errno.ESRCH):
+                raise NoSuchProcess(self.pid, self._name)
+            if err.errno in (errno.EPERM, errno.EACCES):
+                raise AccessDenied(self.pid, self._name)
+            raise
+    return wrapper
+
+
+def _iter_smaps(f, chunksize, _hexdigits=b"0123456789abcdef"):
+    """Parse the content of a /proc/{pid}/smaps file object 'chunksize'
+    bytes at a time and yield one tuple per mapped region.
+    Only complete blocks (a header line followed by its fields) are
+    passed to the C parser; the incomplete trailing block is carried
+    over to the next iteration.
+    """
+    pending = b""
+    while True:
+        chunk = f.read(chunksize)
+        if not chunk:
+            break
+        data = pending + chunk
+        # Look for the last header line, i.e. a line starting with
+        # an hex address (field names start with an upper case
+        # letter).
+        pos = len(data)
+        while True:
+            pos = data.rfind(b"\n", 0, pos)
+            if pos == -1:
+                break
+            c = data[pos + 1:pos + 2]
+            if c and c in _hexdigits:
+                break
+        if pos == -1:
+            pending = data
+            continue
+        pending = data[pos + 1:]
+        for tupl in cext.parse_smaps(data[:pos + 1], False):
+            yield tupl
+    if pending:
+        for tupl in cext.parse_smaps(pending, False):
+            yield tupl
+
+
 class Process(object):
     """Linux process implementation."""
 
-    __slots__ = ["pid", "_name", "_ppid", "_procfs_path"]
+    __slots__ = ["pid", "_name", "_ppid", "_procfs_path", "_cache",
+                 "_starttime"]
 
     def __init__(self, pid):
         self.pid = pid
         self._name = None
         self._ppid = None
         self._procfs_path = get_procfs_path()
+        self._starttime = None
+
+    @memoize_when_activated
+    def _parse_stat_file(self):
+        """Parse /proc/{pid}/stat file. Return a list of fields where
+        process name is in position 0.
+        Using "man proc" as a reference: where "man proc" refers to
+        position N, always substract 2 (e.g starttime pos 22 in
+        "man proc" == pos 20 in the list returned here).
+        The return value is cached in case oneshot() ctx manager is
+        in use.
+        """
+        with open_binary("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
+            data = f.read()
+        # Process name is between parentheses. It can contain spaces and
+        # other parentheses. This is taken into account by looking for
+        # the first occurrence of "(" and the last occurence of ")".
+        rpar = data.rfind(b')')
+        name = data[data.find(b'(') + 1:rpar]
+        fields_after_name = data[rpar + 2:].split()
+        return [name] + fields_after_name
+
+    @memoize_when_activated
+    def _parse_status_file(self):
+        """Parse /proc/{pid}/status file in a single pass and return a
+        {field: value} dict where both keys and values are bytes, e.g.
+        {b"PPid": b"1", b"Uid": b"1000\t1000\t1000\t1000", ...}.
+        Values are stripped but otherwise left untouched so that the
+        conversion cost is paid only for the fields actually used.
+        The return value is cached in case oneshot() ctx manager is
+        in use.
+        """
+        with open_binary("%s/%s/status" % (self._procfs_path, self.pid)) as f:
+            data = f.read()
+        ret = {}
+        for line in data.splitlines():
+            key, _, value = line.partition(b':')
+            ret[key] = value.strip()
+        return ret
+
+    def _status_field(self, name):
+        """Return the raw value of field 'name' of /proc/{pid}/status
+        or raise NotImplementedError if it's not there (old kernel).
+        """
+        try:
+            return self._parse_status_file()[name]
+        except KeyError:
+            raise NotImplementedError(
+                "line %r not found in %s/%s/status" % (
+                    name.decode(), self._procfs_path, self.pid))
+
+    def oneshot_enter(self):
+        self._parse_stat_file.cache_activate(self)
+        self._parse_status_file.cache_activate(self)
+
+    def oneshot_exit(self):
+        self._parse_stat_file.cache_deactivate(self)
+        self._parse_status_file.cache_deactivate(self)
 
     @wrap_exceptions
     def name(self):
-        with open_text("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
-            data = f.read()
-        # XXX - gets changed later and probably needs refactoring
-        return data[data.find('(') + 1:data.rfind(')')]
+        name = self._parse_stat_file()[0]
+        if PY3:
+            name = name.decode(FS_ENCODING, ENCODING_ERRORS_HANDLER)
+        return name
 
     def exe(self):
         try:
@@ -966,8 +1552,7 @@ class Process(object):
     @wrap_exceptions
     def terminal(self):
         tmap = _psposix._get_terminal_map()
-        with open_binary("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
-            tty_nr = int(f.read().split(b' ')[6])
+        tty_nr = int(self._parse_stat_file()[5])
         try:
             return tmap[tty_nr]
         except KeyError:
@@ -1000,38 +1585,44 @@ class Process(object):
 
     @wrap_exceptions
     def cpu_times(self):
-        with open_binary("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
-            st = f.read().strip()
-        # ignore the first two values ("pid (exe)")
-        st = st[st.find(b')') + 2:]
-        values = st.split(b' ')
-        utime = float(values[11]) / CLOCK_TICKS
-        stime = float(values[12]) / CLOCK_TICKS
-        children_utime = float(values[13]) / CLOCK_TICKS
-        children_stime = float(values[14]) / CLOCK_TICKS
+        values = self._parse_stat_file()
+        utime = float(values[12]) / CLOCK_TICKS
+        stime = float(values[13]) / CLOCK_TICKS
+        children_utime = float(values[14]) / CLOCK_TICKS
+        children_stime = float(values[15]) / CLOCK_TICKS
         return _common.pcputimes(utime, stime, children_utime, children_stime)
 
     @wrap_exceptions
     def wait(self, timeout=None):
         try:
-            return _psposix.wait_pid(self.pid, timeout)
+            return wait_pid(self.pid, timeout)
         except _psposix.TimeoutExpired:
             raise TimeoutExpired(timeout, self.pid, self._name)
 
     @wrap_exceptions
     def create_time(self):
-        with open_binary("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
-            st = f.read().strip()
-        # ignore the first two values ("pid (exe)")
-        st = st[st.rfind(b')') + 2:]
-        values = st.split(b' ')
+        values = self._parse_stat_file()
         # According to documentation, starttime is in field 21 and the
         # unit is jiffies (clock ticks).
         # We first divide it for clock ticks and then add uptime returning
         # seconds since the epoch, in UTC.
         # Also use cached value if available.
+        # Remember raw start time for is_same_process().
+        self._starttime = int(values[20])
         bt = BOOT_TIME or boot_time()
-        return (float(values[19]) / CLOCK_TICKS) + bt
+        return (float(values[20]) / CLOCK_TICKS) + bt
+
+    @wrap_exceptions
+    def is_same_process(self):
+        """Return whether the process start time is still the one
+        read by create_time() (meaning the PID has not been reused).
+        Only the raw starttime field of /proc/{pid}/stat is read.
+        """
+        if self._starttime is None:
+            self.create_time()
+            return True
+        return cext.proc_starttime(
+            self._procfs_path, self.pid) == self._starttime
 
     @wrap_exceptions
     def memory_info(self):
@@ -1059,9 +1650,12 @@ class Process(object):
         def memory_full_info(
                 self,
                 _private_re=re.compile(b"Private.*:\s+(\d+)"),
-                _pss_re=re.compile(b"Pss.*:\s+(\d+)"),
-                _swap_re=re.compile(b"Swap.*:\s+(\d+)")):
+                _pss_re=re.compile(b"\nPss:\s+(\d+)"),
+                _swap_re=re.compile(b"\nSwap:\s+(\d+)")):
             basic_mem = self.memory_info()
+            if HAS_SMAPS_ROLLUP:
+                uss, pss, swap = self._read_smaps_rollup()
+                return pfullmem(*basic_mem + (uss, pss, swap))
             # Note: using 3 regexes is faster than reading the file
             # line by line.
             # XXX: on Python 3 the 2 regexes are 30% slower than on
@@ -1084,69 +1678,133 @@ class Process(object):
     else:
         memory_full_info = memory_info
 
+    if HAS_SMAPS_ROLLUP:
+
+        def _read_smaps_rollup(self):
+            """Return (uss, pss, swap) from /proc/{pid}/smaps_rollup,
+            which contains the same fields as /proc/{pid}/smaps
+            already summed up over all mappings. This is a lot faster
+            for processes having many mappings.
+            """
+            with open_binary(
+                    "%s/%s/smaps_rollup" % (self._procfs_path, self.pid)) \
+                    as f:
+                data = f.read()
+            fields = {}
+            # skip the first line, e.g.:
+            # "00400000-ff600000 ---p 00000000 00:00 0   [rollup]"
+            for line in data.split(b'\n')[1:]:
+                parts = line.split()
+                if len(parts) >= 2:
+                    fields[parts[0]] = int(parts[1]) * 1024
+            get = fields.get
+            uss = get(b'Private_Clean:', 0) + get(b'Private_Dirty:', 0) + \
+                get(b'Private_Hugetlb:', 0)
+            return (uss, get(b'Pss:', 0), get(b'Swap:', 0))
+
+    @wrap_exceptions
+    def pagemap_pfns(self, sample=1):
+        """Return the physical page frame numbers of the pages of the
+        process which are present in RAM (see shared_memory_analysis()).
+        """
+        ranges = []
+        for tupl in self.memory_maps_fast():
+            start, end = tupl[0].split('-')
+            ranges.append((int(start, 16), int(end, 16)))
+        return cext.proc_pagemap_pfns(
+            "%s/%s/pagemap" % (self._procfs_path, self.pid), ranges, sample)
+
+    @wrap_exceptions
+    def cgroup(self):
+        """Return the path of the cgroup the process belongs to, as
+        read from /proc/{pid}/cgroup. On hybrid cgroup v1/v2 systems
+        the one of the v1 "memory" controller is preferred, as that's
+        where memory is accounted.
+        """
+        unified = memory = first = None
+        with open_text("%s/%s/cgroup" % (self._procfs_path, self.pid)) as f:
+            for line in f:
+                # "hierarchy-ID:controller-list:cgroup-path"
+                fields = line.rstrip('\n').split(':', 2)
+                if len(fields) != 3:
+                    continue
+                hid, controllers, path = fields
+                if first is None:
+                    first = path
+                if hid == '0' and not controllers:
+                    unified = path
+                elif 'memory' in controllers.split(','):
+                    memory = path
+        for path in (memory, unified, first):
+            if path is not None:
+                return path
+        return ''
+
+    @wrap_exceptions
+    def memory_maps_fast(self):
+        """Return process's mapped memory regions as a list of
+        (addr, perms, offset, dev, inode, path, size) tuples by reading
+        /proc/{pid}/maps. Differently from smaps, this does not require
+        the kernel to walk the process page tables.
+        """
+        retlist = []
+        with open_text("%s/%s/maps" % (self._procfs_path, self.pid),
+                       buffering=BIGGER_FILE_BUFFERING) as f:
+            for line in f:
+                fields = line.split(None, 5)
+                try:
+                    addr, perms, offset, dev, inode, path = fields
+                except ValueError:
+                    addr, perms, offset, dev, inode = fields
+                    path = ''
+                if not path:
+                    path = '[anon]'
+                else:
+                    path = path.strip()
+                    if (path.endswith(' (deleted)') and not
+                            path_exists_strict(path)):
+                        path = path[:-10]
+                start, end = addr.split('-')
+                retlist.append((
+                    addr, perms, int(offset, 16), dev, int(inode), path,
+                    int(end, 16) - int(start, 16)))
+        return retlist
+
     if HAS_SMAPS:
 
         @wrap_exceptions
         def memory_maps(self):
-            """Return process's mapped memory regions as a list of named tuples.
+            """Return process's mapped memory regions as a list of tuples.
             Fields are explained in 'man proc'; here is an updated (Apr 2012)
             version: http://goo.gl/fmebo
             """
-            with open_text("%s/%s/smaps" % (self._procfs_path, self.pid),
-                           buffering=BIGGER_FILE_BUFFERING) as f:
-                first_line = f.readline()
-                current_block = [first_line]
-
-                def get_blocks():
-                    data = {}
-                    for line in f:
-                        fields = line.split(None, 5)
-                        if not fields[0].endswith(':'):
-                            # new block section
-                            yield (current_block.pop(), data)
-                            current_block.append(line)
-                        else:
-                            try:
-                                data[fields[0]] = int(fields[1]) * 1024
-                            except ValueError:
-                                if fields[0].startswith('VmFlags:'):
-                                    # see issue #369
-                                    continue
-                                else:
-                                    raise ValueError("don't know how to inte"
-                                                     "rpret line %r" % line)
-                    yield (current_block.pop(), data)
-
-                ls = []
-                if first_line:  # smaps file can be empty
-                    for header, data in get_blocks():
-                        hfields = header.split(None, 5)
-                        try:
-                            addr, perms, offset, dev, inode, path = hfields
-                        except ValueError:
-                            addr, perms, offset, dev, inode, path = \
-                                hfields + ['']
-                        if not path:
-                            path = '[anon]'
-                        else:
-                            path = path.strip()
-                            if (path.endswith(' (deleted)') and not
-                                    path_exists_strict(path)):
-                                path = path[:-10]
-                        ls.append((
-                            addr, perms, path,
-                            data['Rss:'],
-                            data.get('Size:', 0),
-                            data.get('Pss:', 0),
-                            data.get('Shared_Clean:', 0),
-                            data.get('Shared_Dirty:', 0),
-                            data.get('Private_Clean:', 0),
-                            data.get('Private_Dirty:', 0),
-                            data.get('Referenced:', 0),
-                            data.get('Anonymous:', 0),
-                            data.get('Swap:', 0)
-                        ))
-            return ls
+            return cext.parse_smaps(self._read_smaps_file(), False)
+
+        @wrap_exceptions
+        def memory_maps_grouped(self):
+            """Same as memory_maps() but mapped regions with the same
+            path are grouped together (summed) in C.
+            """
+            return cext.parse_smaps(self._read_smaps_file(), True)
+
+        @wrap_exceptions_iter
+        def memory_maps_iter(self, chunksize=65536):
+            """Same as memory_maps() but return a generator which
+            reads and parses /proc/{pid}/smaps 'chunksize' bytes at
+            a time, so that the whole file content and the whole list
+            of mapped regions are never held in memory.
+            The file is opened on first iteration and closed when the
+            generator is exhausted or closed.
+            """
+            with open_binary("%s/%s/smaps" % (self._procfs_path,
+                                              self.pid)) as f:
+                for tupl in _iter_smaps(f, chunksize):
+                    yield tupl
+
+        def _read_smaps_file(self):
+            with open_binary("%s/%s/smaps" % (self._procfs_path, self.pid),
+                             buffering=BIGGER_FILE_BUFFERING) as f:
+                return f.read()
 
     @wrap_exceptions
     def cwd(self):
@@ -1154,30 +1812,43 @@ class Process(object):
 
     @wrap_exceptions
     def num_ctx_switches(self):
-        vol = unvol = None
-        with open_binary("%s/%s/status" % (self._procfs_path, self.pid)) as f:
-            for line in f:
-                if line.startswith(b"voluntary_ctxt_switches"):
-                    vol = int(line.split()[1])
-                elif line.startswith(b"nonvoluntary_ctxt_switches"):
-                    unvol = int(line.split()[1])
-                if vol is not None and unvol is not None:
-                    return _common.pctxsw(vol, unvol)
+        fields = self._parse_status_file()
+        try:
+            vol = int(fields[b"voluntary_ctxt_switches"])
+            unvol = int(fields[b"nonvoluntary_ctxt_switches"])
+        except KeyError:
             raise NotImplementedError(
                 "'voluntary_ctxt_switches' and 'nonvoluntary_ctxt_switches'"
                 "fields were not found in /proc/%s/status; the kernel is "
                 "probably older than 2.6.23" % self.pid)
+        return _common.pctxsw(vol, unvol)
 
     @wrap_exceptions
     def num_threads(self):
-        with open_binary("%s/%s/status" % (self._procfs_path, self.pid)) as f:
-            for line in f:
-                if line.startswith(b"Threads:"):
-                    return int(line.split()[1])
-            raise NotImplementedError("line not found")
+        return int(self._status_field(b"Threads"))
 
     @wrap_exceptions
-    def threads(self):
+    def status_fields(self):
+        fields = self._parse_status_file()
+        # Vm* lines are missing for kernel threads; values are in kB.
+        peak_rss = int(fields.get(b"VmHWM", b"0").split()[0]) * 1024
+        swap = int(fields.get(b"VmSwap", b"0").split()[0]) * 1024
+        sigq, _, sigq_limit = fields.get(b"SigQ", b"0/0").partition(b"/")
+        cpus_allowed = []
+        for chunk in fields.get(b"Cpus_allowed_list", b"").split(b","):
+            if not chunk:
+                continue
+            start, _, end = chunk.partition(b"-")
+            cpus_allowed.extend(range(int(start), int(end or start) + 1))
+        return pstatusfields(peak_rss, swap, int(sigq), int(sigq_limit),
+                             cpus_allowed)
+
+    def _read_threads_stat(self):
+        """Read /proc/{pid}/task/{tid}/stat for every thread and return
+        a list of (tid, fields) tuples where fields has the same layout
+        as the list returned by _parse_stat_file() (thread name is in
+        position 0). Threads disappearing in the meantime are skipped.
+        """
         thread_ids = os.listdir("%s/%s/task" % (self._procfs_path, self.pid))
         thread_ids.sort()
         retlist = []
@@ -1195,18 +1866,73 @@ class Process(object):
                     hit_enoent = True
                     continue
                 raise
-            # ignore the first two values ("pid (exe)")
-            st = st[st.find(b')') + 2:]
-            values = st.split(b' ')
-            utime = float(values[11]) / CLOCK_TICKS
-            stime = float(values[12]) / CLOCK_TICKS
-            ntuple = _common.pthread(int(thread_id), utime, stime)
-            retlist.append(ntuple)
+            # thread name is between parentheses, see _parse_stat_file()
+            rpar = st.rfind(b')')
+            name = st[st.find(b'(') + 1:rpar]
+            retlist.append((int(thread_id), [name] + st[rpar + 2:].split()))
         if hit_enoent:
             # raise NSP if the process disappeared on us
             os.stat('%s/%s' % (self._procfs_path, self.pid))
         return retlist
 
+    @wrap_exceptions
+    def threads(self):
+        retlist = []
+        for thread_id, values in self._read_threads_stat():
+            utime = float(values[12]) / CLOCK_TICKS
+            stime = float(values[13]) / CLOCK_TICKS
+            ntuple = _common.pthread(thread_id, utime, stime)
+            retlist.append(ntuple)
+        return retlist
+
+    @wrap_exceptions
+    def threads_full(self):
+        retlist = []
+        for thread_id, values in self._read_threads_stat():
+            name = values[0]
+            if PY3:
+                name = name.decode(FS_ENCODING, ENCODING_ERRORS_HANDLER)
+            letter = values[1]
+            if PY3:
+                letter = letter.decode()
+            utime = float(values[12]) / CLOCK_TICKS
+            stime = float(values[13]) / CLOCK_TICKS
+            ntuple = pthread_full(
+                thread_id, utime, stime, name,
+                PROC_STATUSES.get(letter, '?'), int(values[37]),
+                int(values[17]))
+            retlist.append(ntuple)
+        return retlist
+
+    if HAS_PROC_CHILDREN:
+        @wrap_exceptions
+        def children_pids(self):
+            """Return the sorted list of PIDs of the direct children
+            of this process, as listed in /proc/{pid}/task/{tid}/children
+            for each thread.
+            """
+            thread_ids = os.listdir(
+                "%s/%s/task" % (self._procfs_path, self.pid))
+            pids = set()
+            hit_enoent = False
+            for thread_id in thread_ids:
+                fname = "%s/%s/task/%s/children" % (
+                    self._procfs_path, self.pid, thread_id)
+                try:
+                    with open_binary(fname) as f:
+                        data = f.read()
+                except IOError as err:
+                    if err.errno == errno.ENOENT:
+                        # thread disappeared on us
+                        hit_enoent = True
+                        continue
+                    raise
+                pids.update(int(x) for x in data.split())
+            if hit_enoent:
+                # raise NSP if the process disappeared on us
+                os.stat('%s/%s' % (self._procfs_path, self.pid))
+            return sorted(pids)
+
     @wrap_exceptions
     def nice_get(self):
         # with open_text('%s/%s/stat' % (self._procfs_path, self.pid)) as f:
@@ -1310,15 +2036,13 @@ class Process(object):
 
     @wrap_exceptions
     def status(self):
-        with open_binary("%s/%s/status" % (self._procfs_path, self.pid)) as f:
-            for line in f:
-                if line.startswith(b"State:"):
-                    letter = line.split()[1]
-                    if PY3:
-                        letter = letter.decode()
-                    # XXX is '?' legit? (we're not supposed to return
-                    # it anyway)
-                    return PROC_STATUSES.get(letter, '?')
+        # "State:  S (sleeping)"
+        letter = self._status_field(b"State")[:1]
+        if PY3:
+            letter = letter.decode()
+        # XXX is '?' legit? (we're not supposed to return
+        # it anyway)
+        return PROC_STATUSES.get(letter, '?')
 
     @wrap_exceptions
     def open_files(self):
@@ -1372,30 +2096,15 @@ class Process(object):
 
     @wrap_exceptions
     def ppid(self):
-        fpath = "%s/%s/status" % (self._procfs_path, self.pid)
-        with open_binary(fpath) as f:
-            for line in f:
-                if line.startswith(b"PPid:"):
-                    # PPid: nnnn
-                    return int(line.split()[1])
-            raise NotImplementedError("line 'PPid' not found in %s" % fpath)
+        # PPid: nnnn
+        return int(self._status_field(b"PPid"))
 
     @wrap_exceptions
     def uids(self):
-        fpath = "%s/%s/status" % (self._procfs_path, self.pid)
-        with open_binary(fpath) as f:
-            for line in f:
-                if line.startswith(b'Uid:'):
-                    _, real, effective, saved, fs = line.split()
-                    return _common.puids(int(real), int(effective), int(saved))
-            raise NotImplementedError("line 'Uid' not found in %s" % fpath)
+        real, effective, saved, fs = self._status_field(b"Uid").split()
+        return _common.puids(int(real), int(effective), int(saved))
 
     @wrap_exceptions
     def gids(self):
-        fpath = "%s/%s/status" % (self._procfs_path, self.pid)
-        with open_binary(fpath) as f:
-            for line in f:
-                if line.startswith(b'Gid:'):
-                    _, real, effective, saved, fs = line.split()
-                    return _common.pgids(int(real), int(effective), int(saved))
-            raise NotImplementedError("line 'Gid' not found in %s" % fpath)
+        real, effective, saved, fs = self._status_field(b"Gid").split()
+        return _common.pgids(int(real), int(effective), int(saved))
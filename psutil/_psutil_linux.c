@@ -12,6 +12,13 @@
 #include <Python.h>
 #include <errno.h>
 #include <stdlib.h>
+#include <stdio.h>
+#include <string.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <limits.h>
+#include <ctype.h>
+#include <sys/stat.h>
 #include <mntent.h>
 #include <features.h>
 #include <utmp.h>
@@ -23,6 +30,20 @@
 #include <sys/socket.h>
 #include <linux/sockios.h>
 #include <linux/if.h>
+#include <linux/netlink.h>
+// NETLINK_SOCK_DIAG headers (Linux >= 3.3), detected by setup.py
+#if defined(PSUTIL_HAVE_INET_DIAG) || defined(PSUTIL_HAVE_UNIX_DIAG)
+    #include <linux/sock_diag.h>
+#endif
+#ifdef PSUTIL_HAVE_INET_DIAG
+    #include <linux/inet_diag.h>
+#endif
+#ifdef PSUTIL_HAVE_UNIX_DIAG
+    #include <linux/unix_diag.h>
+    #include <linux/rtnetlink.h>
+#endif
+#include <netinet/in.h>
+#include <arpa/inet.h>
 
 // see: https://github.com/giampaolo/psutil/issues/659
 #ifdef PSUTIL_ETHTOOL_MISSING_TYPES
@@ -34,6 +55,19 @@
 #endif
 #include <linux/ethtool.h>
 
+// Linux >= 5.3. In case headers are too old define the syscall number
+// for the architectures known to use it as is; others (alpha, ia64,
+// MIPS, x32, ARM OABI) add an offset to it, so pidfd is left
+// unavailable there.
+#ifndef __NR_pidfd_open
+    #if (defined(__x86_64__) && !defined(__ILP32__)) || \
+            defined(__i386__) || defined(__aarch64__) || \
+            (defined(__arm__) && defined(__ARM_EABI__)) || \
+            defined(__powerpc__) || defined(__s390__) || defined(__riscv)
+        #define __NR_pidfd_open 434
+    #endif
+#endif
+
 #include "_psutil_linux.h"
 
 /* The minimum number of CPUs allocated in a cpu_set_t */
@@ -551,6 +585,1213 @@ error:
 }
 
 
+#ifdef __NR_pidfd_open
+/*
+ * Return a file descriptor referring to the process, which becomes
+ * readable when the process terminates (Linux >= 5.3).
+ */
+static PyObject *
+psutil_proc_pidfd_open(PyObject *self, PyObject *args) {
+    long pid;
+    int fd;
+
+    if (! PyArg_ParseTuple(args, "l", &pid))
+        return NULL;
+    fd = syscall(__NR_pidfd_open, (pid_t)pid, 0);
+    if (fd == -1)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    return Py_BuildValue("i", fd);
+}
+#endif
+
+
+/*
+ * Fields of /proc/{pid}/stat we care about when reading it in bulk.
+ * Times are expressed in clock ticks and rss in pages.
+ */
+typedef struct {
+    long pid;
+    int ok;
+    char state;
+    long ppid;
+    unsigned long long utime;
+    unsigned long long stime;
+    long nice;
+    long num_threads;
+    unsigned long long starttime;
+    long rss;
+    int processor;
+} psutil_stat_entry;
+
+
+/*
+ * Read and parse a single /proc/{pid}/stat file into 'entry'.
+ * Return 0 on success, -1 if the file can't be read or parsed (e.g.
+ * the process is gone). Does not touch any Python object hence it's
+ * safe to call it with the GIL released.
+ */
+static int
+psutil_read_stat_file(const char *procfs_path, psutil_stat_entry *entry) {
+    char path[PATH_MAX];
+    char buf[4096];
+    char *p;
+    char *end;
+    ssize_t nread;
+    int fd;
+    int i;
+
+    snprintf(path, sizeof(path), "%s/%li/stat", procfs_path, entry->pid);
+    fd = open(path, O_RDONLY);
+    if (fd == -1)
+        return -1;
+    nread = read(fd, buf, sizeof(buf) - 1);
+    close(fd);
+    if (nread <= 0)
+        return -1;
+    buf[nread] = '\0';
+
+    // The process name is between parentheses and it may contain
+    // spaces and parentheses itself, hence we look for the last ")".
+    p = strrchr(buf, ')');
+    if (p == NULL || p[1] == '\0')
+        return -1;
+    p += 2;
+
+    // Fields are counted starting from "state", which is field 3 in
+    // "man proc".
+    for (i = 0; i <= 36 && *p != '\0'; i++) {
+        switch (i) {
+            case 0:
+                entry->state = *p;
+                break;
+            case 1:
+                entry->ppid = strtol(p, NULL, 10);
+                break;
+            case 11:
+                entry->utime = strtoull(p, NULL, 10);
+                break;
+            case 12:
+                entry->stime = strtoull(p, NULL, 10);
+                break;
+            case 16:
+                entry->nice = strtol(p, NULL, 10);
+                break;
+            case 17:
+                entry->num_threads = strtol(p, NULL, 10);
+                break;
+            case 19:
+                entry->starttime = strtoull(p, NULL, 10);
+                break;
+            case 21:
+                entry->rss = strtol(p, NULL, 10);
+                break;
+            case 36:
+                entry->processor = (int)strtol(p, NULL, 10);
+                break;
+        }
+        end = strchr(p, ' ');
+        if (end == NULL)
+            break;
+        p = end + 1;
+    }
+    // we want at least everything up to rss
+    if (i < 21)
+        return -1;
+    return 0;
+}
+
+
+/*
+ * Return the start time of a process expressed in clock ticks after
+ * system boot (field 22 of /proc/{pid}/stat) as an integer. This is
+ * meant to be a cheap way to verify process identity.
+ */
+static PyObject *
+psutil_proc_starttime(PyObject *self, PyObject *args) {
+    char *procfs_path;
+    long pid;
+    psutil_stat_entry entry;
+
+    if (! PyArg_ParseTuple(args, "sl", &procfs_path, &pid))
+        return NULL;
+    entry.pid = pid;
+    errno = 0;
+    if (psutil_read_stat_file(procfs_path, &entry) != 0) {
+        if (errno != 0)
+            return PyErr_SetFromErrno(PyExc_OSError);
+        PyErr_Format(PyExc_RuntimeError,
+                     "unable to parse %s/%li/stat", procfs_path, pid);
+        return NULL;
+    }
+    return Py_BuildValue("K", entry.starttime);
+}
+
+
+/*
+ * Read /proc/{pid}/stat for all the given PIDs in one shot and
+ * return a {pid: (ppid, state, utime, stime, starttime, rss,
+ * num_threads, nice, processor)} dict. Times are expressed in clock
+ * ticks and rss in pages. PIDs whose file can't be read (typically
+ * because the process is gone) are omitted.
+ * File reading and parsing happens with the GIL released.
+ */
+static PyObject *
+psutil_proc_stat_bulk(PyObject *self, PyObject *args) {
+    char *procfs_path;
+    Py_ssize_t i;
+    Py_ssize_t num_pids;
+    psutil_stat_entry *entries = NULL;
+    PyObject *py_pids = NULL;
+    PyObject *py_pids_seq = NULL;
+    PyObject *py_retdict = NULL;
+    PyObject *py_pid = NULL;
+    PyObject *py_tuple = NULL;
+
+    if (! PyArg_ParseTuple(args, "sO", &procfs_path, &py_pids))
+        return NULL;
+    py_pids_seq = PySequence_Fast(py_pids, "expected a sequence of PIDs");
+    if (py_pids_seq == NULL)
+        return NULL;
+    num_pids = PySequence_Fast_GET_SIZE(py_pids_seq);
+
+    entries = calloc(num_pids > 0 ? num_pids : 1, sizeof(psutil_stat_entry));
+    if (entries == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+    for (i = 0; i < num_pids; i++) {
+        entries[i].pid = PyLong_AsLong(
+            PySequence_Fast_GET_ITEM(py_pids_seq, i));
+        if (entries[i].pid == -1 && PyErr_Occurred())
+            goto error;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < num_pids; i++) {
+        entries[i].ok = psutil_read_stat_file(procfs_path, &entries[i]) == 0;
+    }
+    Py_END_ALLOW_THREADS
+
+    py_retdict = PyDict_New();
+    if (py_retdict == NULL)
+        goto error;
+    for (i = 0; i < num_pids; i++) {
+        if (! entries[i].ok)
+            continue;
+        py_tuple = Py_BuildValue(
+#if PY_MAJOR_VERSION >= 3
+            "(lCKKKllli)",
+#else
+            "(lcKKKllli)",
+#endif
+            entries[i].ppid,
+#if PY_MAJOR_VERSION >= 3
+            (int)entries[i].state,
+#else
+            entries[i].state,
+#endif
+            entries[i].utime,
+            entries[i].stime,
+            entries[i].starttime,
+            entries[i].rss,
+            entries[i].num_threads,
+            entries[i].nice,
+            entries[i].processor);
+        if (py_tuple == NULL)
+            goto error;
+        py_pid = PyLong_FromLong(entries[i].pid);
+        if (py_pid == NULL)
+            goto error;
+        if (PyDict_SetItem(py_retdict, py_pid, py_tuple))
+            goto error;
+        Py_DECREF(py_pid);
+        Py_DECREF(py_tuple);
+        py_pid = NULL;
+        py_tuple = NULL;
+    }
+
+    free(entries);
+    Py_DECREF(py_pids_seq);
+    return py_retdict;
+
+error:
+    if (entries != NULL)
+        free(entries);
+    Py_XDECREF(py_pid);
+    Py_XDECREF(py_tuple);
+    Py_XDECREF(py_retdict);
+    Py_DECREF(py_pids_seq);
+    return NULL;
+}
+
+
+/*
+ * Read the real UID of a process (first value of the "Uid:" line of
+ * /proc/{pid}/status) into 'uid'. Return 0 on success, -1 if the file
+ * can't be read or parsed. Safe to call with the GIL released.
+ */
+static int
+psutil_read_status_uid(const char *procfs_path, long pid,
+                       unsigned long *uid) {
+    char path[PATH_MAX];
+    char buf[4096];
+    char *p;
+    ssize_t nread;
+    int fd;
+
+    snprintf(path, sizeof(path), "%s/%li/status", procfs_path, pid);
+    fd = open(path, O_RDONLY);
+    if (fd == -1)
+        return -1;
+    // "Uid:" is within the first few lines, way before 4096 bytes
+    nread = read(fd, buf, sizeof(buf) - 1);
+    close(fd);
+    if (nread <= 0)
+        return -1;
+    buf[nread] = '\0';
+    p = strstr(buf, "\nUid:");
+    if (p == NULL)
+        return -1;
+    *uid = strtoul(p + 5, NULL, 10);
+    return 0;
+}
+
+
+/*
+ * Read the real UID of all the given PIDs in one shot and return a
+ * {pid: uid} dict. PIDs whose /proc/{pid}/status file can't be read
+ * are omitted. File reading and parsing happens with the GIL released.
+ */
+static PyObject *
+psutil_proc_uid_bulk(PyObject *self, PyObject *args) {
+    char *procfs_path;
+    Py_ssize_t i;
+    Py_ssize_t num_pids;
+    long *pids = NULL;
+    unsigned long *uids = NULL;
+    char *oks = NULL;
+    PyObject *py_pids = NULL;
+    PyObject *py_pids_seq = NULL;
+    PyObject *py_retdict = NULL;
+    PyObject *py_pid = NULL;
+    PyObject *py_uid = NULL;
+
+    if (! PyArg_ParseTuple(args, "sO", &procfs_path, &py_pids))
+        return NULL;
+    py_pids_seq = PySequence_Fast(py_pids, "expected a sequence of PIDs");
+    if (py_pids_seq == NULL)
+        return NULL;
+    num_pids = PySequence_Fast_GET_SIZE(py_pids_seq);
+
+    pids = calloc(num_pids > 0 ? num_pids : 1, sizeof(long));
+    uids = calloc(num_pids > 0 ? num_pids : 1, sizeof(unsigned long));
+    oks = calloc(num_pids > 0 ? num_pids : 1, sizeof(char));
+    if (pids == NULL || uids == NULL || oks == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+    for (i = 0; i < num_pids; i++) {
+        pids[i] = PyLong_AsLong(PySequence_Fast_GET_ITEM(py_pids_seq, i));
+        if (pids[i] == -1 && PyErr_Occurred())
+            goto error;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < num_pids; i++) {
+        oks[i] = psutil_read_status_uid(procfs_path, pids[i], &uids[i]) == 0;
+    }
+    Py_END_ALLOW_THREADS
+
+    py_retdict = PyDict_New();
+    if (py_retdict == NULL)
+        goto error;
+    for (i = 0; i < num_pids; i++) {
+        if (! oks[i])
+            continue;
+        py_pid = PyLong_FromLong(pids[i]);
+        if (py_pid == NULL)
+            goto error;
+        py_uid = PyLong_FromUnsignedLong(uids[i]);
+        if (py_uid == NULL)
+            goto error;
+        if (PyDict_SetItem(py_retdict, py_pid, py_uid))
+            goto error;
+        Py_DECREF(py_pid);
+        Py_DECREF(py_uid);
+        py_pid = NULL;
+        py_uid = NULL;
+    }
+
+    free(pids);
+    free(uids);
+    free(oks);
+    Py_DECREF(py_pids_seq);
+    return py_retdict;
+
+error:
+    free(pids);
+    free(uids);
+    free(oks);
+    Py_XDECREF(py_pid);
+    Py_XDECREF(py_uid);
+    Py_XDECREF(py_retdict);
+    Py_DECREF(py_pids_seq);
+    return NULL;
+}
+
+/*
+ * Fields of /proc/{pid}/smaps we're interested in, in the same order
+ * as they appear in the tuples returned by psutil_parse_smaps().
+ */
+static const char *psutil_smaps_fields[] = {
+    "Rss:", "Size:", "Pss:", "Shared_Clean:", "Shared_Dirty:",
+    "Private_Clean:", "Private_Dirty:", "Referenced:", "Anonymous:",
+    "Swap:"
+};
+#define PSUTIL_SMAPS_NFIELDS \
+    (sizeof(psutil_smaps_fields) / sizeof(psutil_smaps_fields[0]))
+
+typedef struct {
+    const char *addr;
+    Py_ssize_t addr_len;
+    const char *perms;
+    Py_ssize_t perms_len;
+    const char *path;
+    Py_ssize_t path_len;
+    unsigned long long values[PSUTIL_SMAPS_NFIELDS];
+} psutil_smaps_block;
+
+
+#if PY_MAJOR_VERSION >= 3
+#define psutil_smaps_str PyUnicode_DecodeFSDefaultAndSize
+#else
+#define psutil_smaps_str PyString_FromStringAndSize
+#endif
+
+
+/*
+ * Return the first whitespace separated token of [p, end) and store
+ * its length in 'len'; 'p' is moved past the token.
+ */
+static const char *
+psutil_next_token(const char **p, const char *end, Py_ssize_t *len) {
+    const char *start = *p;
+    const char *q;
+
+    while (start < end && isspace((unsigned char)*start))
+        start++;
+    q = start;
+    while (q < end && ! isspace((unsigned char)*q))
+        q++;
+    *len = q - start;
+    *p = q;
+    return start;
+}
+
+
+/*
+ * Return the mapped path of a smaps block as a Python string.
+ * Mimics what the pure python implementation did: anonymous mappings
+ * are reported as "[anon]" and the " (deleted)" suffix is stripped
+ * unless a file with such a name really exists.
+ */
+static PyObject *
+psutil_smaps_path(psutil_smaps_block *block) {
+    static const char deleted[] = " (deleted)";
+    const Py_ssize_t deleted_len = sizeof(deleted) - 1;
+    char cpath[PATH_MAX];
+    struct stat st;
+    Py_ssize_t len = block->path_len;
+
+    if (len == 0)
+        return psutil_smaps_str("[anon]", 6);
+    if (len > deleted_len &&
+            memcmp(block->path + len - deleted_len, deleted,
+                   deleted_len) == 0) {
+        if (len >= PATH_MAX) {
+            len -= deleted_len;
+        }
+        else {
+            memcpy(cpath, block->path, len);
+            cpath[len] = '\0';
+            if (stat(cpath, &st) != 0) {
+                if (errno == EPERM || errno == EACCES)
+                    return PyErr_SetFromErrnoWithFilename(
+                        PyExc_OSError, cpath);
+                len -= deleted_len;
+            }
+        }
+    }
+    return psutil_smaps_str(block->path, len);
+}
+
+
+/*
+ * Return a (addr, perms, path, rss, size, pss, shared_clean,
+ * shared_dirty, private_clean, private_dirty, referenced, anonymous,
+ * swap) tuple out of a parsed smaps block.
+ */
+static PyObject *
+psutil_smaps_tuple(psutil_smaps_block *block, PyObject *py_path) {
+    size_t i;
+    PyObject *py_tuple = NULL;
+    PyObject *py_value = NULL;
+
+    py_tuple = PyTuple_New(3 + PSUTIL_SMAPS_NFIELDS);
+    if (py_tuple == NULL)
+        return NULL;
+    Py_INCREF(py_path);
+    PyTuple_SET_ITEM(py_tuple, 2, py_path);
+    py_value = psutil_smaps_str(block->addr, block->addr_len);
+    if (py_value == NULL)
+        goto error;
+    PyTuple_SET_ITEM(py_tuple, 0, py_value);
+    py_value = psutil_smaps_str(block->perms, block->perms_len);
+    if (py_value == NULL)
+        goto error;
+    PyTuple_SET_ITEM(py_tuple, 1, py_value);
+    for (i = 0; i < PSUTIL_SMAPS_NFIELDS; i++) {
+        py_value = PyLong_FromUnsignedLongLong(block->values[i]);
+        if (py_value == NULL)
+            goto error;
+        PyTuple_SET_ITEM(py_tuple, 3 + i, py_value);
+    }
+    return py_tuple;
+
+error:
+    Py_DECREF(py_tuple);
+    return NULL;
+}
+
+
+/*
+ * Parse the content of /proc/{pid}/smaps (a bytes string which must
+ * end with a complete mapping) in one pass.
+ * Return a list of (addr, perms, path, rss, size, pss, shared_clean,
+ * shared_dirty, private_clean, private_dirty, referenced, anonymous,
+ * swap) tuples, one per mapping, or, if 'grouped' is true, a list of
+ * (path, rss, size, ...) tuples where the values of the mappings with
+ * the same path are summed up. Values are expressed in bytes.
+ */
+static PyObject *
+psutil_parse_smaps(PyObject *self, PyObject *args) {
+    PyObject *py_data;
+    int grouped;
+    char *data;
+    Py_ssize_t data_len;
+    const char *p;
+    const char *end;
+    const char *line_end;
+    const char *tok;
+    Py_ssize_t tok_len;
+    Py_ssize_t dummy_len;
+    Py_ssize_t idx;
+    size_t i;
+    int have_block = 0;
+    int done = 0;
+    char line[256];
+    psutil_smaps_block block;
+    // grouped values, one entry per path in 'py_paths'
+    unsigned long long (*groups)[PSUTIL_SMAPS_NFIELDS] = NULL;
+    unsigned long long (*tmp)[PSUTIL_SMAPS_NFIELDS];
+    size_t groups_size = 0;
+    PyObject *py_retlist = NULL;
+    PyObject *py_paths = NULL;
+    PyObject *py_path_idx = NULL;
+    PyObject *py_path = NULL;
+    PyObject *py_idx = NULL;
+    PyObject *py_tuple = NULL;
+    PyObject *py_value = NULL;
+
+    if (! PyArg_ParseTuple(args, "Oi", &py_data, &grouped))
+        return NULL;
+    if (PyBytes_AsStringAndSize(py_data, &data, &data_len) == -1)
+        return NULL;
+
+    py_retlist = PyList_New(0);
+    if (py_retlist == NULL)
+        return NULL;
+    if (grouped) {
+        py_paths = PyList_New(0);
+        if (py_paths == NULL)
+            goto error;
+        py_path_idx = PyDict_New();
+        if (py_path_idx == NULL)
+            goto error;
+    }
+
+    p = data;
+    end = data + data_len;
+    while (! done) {
+        if (p < end) {
+            line_end = memchr(p, '\n', end - p);
+            if (line_end == NULL)
+                line_end = end;
+            tok = psutil_next_token(&p, line_end, &tok_len);
+        }
+        else {
+            // EOF: flush the last block
+            line_end = end;
+            tok = NULL;
+            tok_len = 0;
+            done = 1;
+        }
+
+        if (tok_len > 0 && tok[tok_len - 1] == ':') {
+            // "Rss:    4 kB"
+            if (! have_block)
+                goto parse_error;
+            for (i = 0; i < PSUTIL_SMAPS_NFIELDS; i++) {
+                if ((size_t)tok_len == strlen(psutil_smaps_fields[i]) &&
+                        memcmp(tok, psutil_smaps_fields[i], tok_len) == 0) {
+                    block.values[i] = strtoull(p, NULL, 10) * 1024;
+                    break;
+                }
+            }
+        }
+        else if (tok_len > 0 || done) {
+            // A new block begins (or EOF): add the previous one.
+            if (have_block) {
+                py_path = psutil_smaps_path(&block);
+                if (py_path == NULL)
+                    goto error;
+                if (! grouped) {
+                    py_tuple = psutil_smaps_tuple(&block, py_path);
+                    if (py_tuple == NULL)
+                        goto error;
+                    if (PyList_Append(py_retlist, py_tuple))
+                        goto error;
+                    Py_CLEAR(py_tuple);
+                }
+                else {
+                    py_idx = PyDict_GetItem(py_path_idx, py_path);
+                    if (py_idx != NULL) {
+                        idx = PyLong_AsSsize_t(py_idx);
+                        py_idx = NULL;  // borrowed
+                    }
+                    else {
+                        idx = PyList_GET_SIZE(py_paths);
+                        if ((size_t)idx == groups_size) {
+                            groups_size = groups_size ? groups_size * 2 : 64;
+                            tmp = realloc(groups,
+                                          groups_size * sizeof(*groups));
+                            if (tmp == NULL) {
+                                PyErr_NoMemory();
+                                goto error;
+                            }
+                            groups = tmp;
+                        }
+                        memset(groups[idx], 0, sizeof(*groups));
+                        py_idx = PyLong_FromSsize_t(idx);
+                        if (py_idx == NULL)
+                            goto error;
+                        if (PyDict_SetItem(py_path_idx, py_path, py_idx))
+                            goto error;
+                        Py_CLEAR(py_idx);
+                        if (PyList_Append(py_paths, py_path))
+                            goto error;
+                    }
+                    for (i = 0; i < PSUTIL_SMAPS_NFIELDS; i++)
+                        groups[idx][i] += block.values[i];
+                }
+                Py_CLEAR(py_path);
+            }
+            if (done)
+                break;
+            // "00400000-0040b000 r-xp 00000000 fc:00 1234   /bin/cat"
+            memset(&block, 0, sizeof(block));
+            block.addr = tok;
+            block.addr_len = tok_len;
+            block.perms = psutil_next_token(&p, line_end, &block.perms_len);
+            psutil_next_token(&p, line_end, &dummy_len);  // offset
+            psutil_next_token(&p, line_end, &dummy_len);  // dev
+            psutil_next_token(&p, line_end, &dummy_len);  // inode
+            if (dummy_len == 0)
+                goto parse_error;
+            // the path is whatever is left, possibly containing spaces
+            while (p < line_end && isspace((unsigned char)*p))
+                p++;
+            block.path = p;
+            block.path_len = line_end - p;
+            while (block.path_len > 0 &&
+                    isspace((unsigned char)block.path[block.path_len - 1]))
+                block.path_len--;
+            have_block = 1;
+        }
+        p = line_end + 1;
+    }
+
+    if (grouped) {
+        for (idx = 0; idx < PyList_GET_SIZE(py_paths); idx++) {
+            py_tuple = PyTuple_New(1 + PSUTIL_SMAPS_NFIELDS);
+            if (py_tuple == NULL)
+                goto error;
+            py_path = PyList_GET_ITEM(py_paths, idx);
+            Py_INCREF(py_path);
+            PyTuple_SET_ITEM(py_tuple, 0, py_path);
+            py_path = NULL;
+            for (i = 0; i < PSUTIL_SMAPS_NFIELDS; i++) {
+                py_value = PyLong_FromUnsignedLongLong(groups[idx][i]);
+                if (py_value == NULL)
+                    goto error;
+                PyTuple_SET_ITEM(py_tuple, 1 + i, py_value);
+            }
+            if (PyList_Append(py_retlist, py_tuple))
+                goto error;
+            Py_CLEAR(py_tuple);
+        }
+        free(groups);
+        Py_DECREF(py_paths);
+        Py_DECREF(py_path_idx);
+    }
+    return py_retlist;
+
+parse_error:
+    i = line_end - tok;
+    if (i >= sizeof(line))
+        i = sizeof(line) - 1;
+    memcpy(line, tok, i);
+    line[i] = '\0';
+    PyErr_Format(PyExc_ValueError,
+                 "don't know how to interpret smaps line '%s'", line);
+error:
+    free(groups);
+    Py_XDECREF(py_tuple);
+    Py_XDECREF(py_idx);
+    Py_XDECREF(py_path);
+    Py_XDECREF(py_paths);
+    Py_XDECREF(py_path_idx);
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+
+
+#define PSUTIL_PAGEMAP_PRESENT (1ULL << 63)
+#define PSUTIL_PAGEMAP_PFN_MASK ((1ULL << 55) - 1)
+// number of 64-bit entries read at once from pagemap and kpagecount
+#define PSUTIL_PAGEMAP_BUFSIZE 65536
+
+
+/*
+ * Read /proc/{pid}/pagemap for a list of (start, end) virtual address
+ * ranges (e.g. the ones of the process memory mappings) and return
+ * the list of page frame numbers (PFNs) of the pages which are
+ * present in RAM. If 'sample' is > 1 only PFNs which are a multiple
+ * of it are returned, so that the same physical pages are sampled
+ * across processes. Entries are read in bulk into a single buffer
+ * with the GIL released.
+ * Note: PFNs are reported as 0 unless the caller has CAP_SYS_ADMIN.
+ */
+static PyObject *
+psutil_proc_pagemap_pfns(PyObject *self, PyObject *args) {
+    char *path;
+    PyObject *py_ranges;
+    PyObject *py_ranges_seq = NULL;
+    PyObject *py_retlist = NULL;
+    PyObject *py_pfn = NULL;
+    unsigned long long sample;
+    unsigned long long *ranges = NULL;
+    unsigned long long *buf = NULL;
+    unsigned long long *pfns = NULL;
+    unsigned long long *tmp;
+    unsigned long long page;
+    unsigned long long end_page;
+    unsigned long long pfn;
+    size_t num_pfns = 0;
+    size_t pfns_size = 0;
+    size_t count;
+    size_t i;
+    Py_ssize_t r;
+    Py_ssize_t num_ranges;
+    ssize_t nread;
+    long pagesize = sysconf(_SC_PAGESIZE);
+    int fd = -1;
+    int err = 0;
+
+    if (! PyArg_ParseTuple(args, "sOK", &path, &py_ranges, &sample))
+        return NULL;
+    if (sample < 1)
+        sample = 1;
+    py_ranges_seq = PySequence_Fast(py_ranges, "expected a sequence");
+    if (py_ranges_seq == NULL)
+        return NULL;
+    num_ranges = PySequence_Fast_GET_SIZE(py_ranges_seq);
+    ranges = malloc((num_ranges > 0 ? num_ranges : 1) * 2 * sizeof(*ranges));
+    if (ranges == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+    for (r = 0; r < num_ranges; r++) {
+        if (! PyArg_ParseTuple(PySequence_Fast_GET_ITEM(py_ranges_seq, r),
+                               "KK", &ranges[r * 2], &ranges[r * 2 + 1]))
+            goto error;
+    }
+    buf = malloc(PSUTIL_PAGEMAP_BUFSIZE * sizeof(*buf));
+    if (buf == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    fd = open(path, O_RDONLY);
+    if (fd == -1)
+        err = errno;
+    for (r = 0; r < num_ranges && err == 0; r++) {
+        page = ranges[r * 2] / pagesize;
+        end_page = ranges[r * 2 + 1] / pagesize;
+        while (page < end_page && err == 0) {
+            count = end_page - page;
+            if (count > PSUTIL_PAGEMAP_BUFSIZE)
+                count = PSUTIL_PAGEMAP_BUFSIZE;
+            nread = pread(fd, buf, count * sizeof(*buf),
+                          (off_t)(page * sizeof(*buf)));
+            if (nread == -1) {
+                err = errno;
+                break;
+            }
+            if (nread == 0)
+                break;
+            count = nread / sizeof(*buf);
+            for (i = 0; i < count; i++) {
+                if (! (buf[i] & PSUTIL_PAGEMAP_PRESENT))
+                    continue;
+                pfn = buf[i] & PSUTIL_PAGEMAP_PFN_MASK;
+                if (pfn % sample != 0)
+                    continue;
+                if (num_pfns == pfns_size) {
+                    pfns_size = pfns_size ? pfns_size * 2 : 4096;
+                    tmp = realloc(pfns, pfns_size * sizeof(*pfns));
+                    if (tmp == NULL) {
+                        err = ENOMEM;
+                        break;
+                    }
+                    pfns = tmp;
+                }
+                pfns[num_pfns++] = pfn;
+            }
+            page += count;
+        }
+    }
+    if (fd != -1)
+        close(fd);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        if (err == ENOMEM)
+            PyErr_NoMemory();
+        else
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+        goto error;
+    }
+
+    py_retlist = PyList_New(num_pfns);
+    if (py_retlist == NULL)
+        goto error;
+    for (i = 0; i < num_pfns; i++) {
+        py_pfn = PyLong_FromUnsignedLongLong(pfns[i]);
+        if (py_pfn == NULL)
+            goto error;
+        PyList_SET_ITEM(py_retlist, i, py_pfn);
+    }
+    free(ranges);
+    free(buf);
+    free(pfns);
+    Py_DECREF(py_ranges_seq);
+    return py_retlist;
+
+error:
+    free(ranges);
+    free(buf);
+    free(pfns);
+    Py_XDECREF(py_retlist);
+    Py_DECREF(py_ranges_seq);
+    return NULL;
+}
+
+
+/*
+ * Given a sorted sequence of page frame numbers return a list with
+ * the number of times each page is mapped, as read from
+ * /proc/kpagecount. Close PFNs are read with a single pread() call.
+ */
+static PyObject *
+psutil_kpagecount(PyObject *self, PyObject *args) {
+    char *path;
+    PyObject *py_pfns;
+    PyObject *py_pfns_seq = NULL;
+    PyObject *py_retlist = NULL;
+    PyObject *py_count = NULL;
+    unsigned long long *pfns = NULL;
+    unsigned long long *counts = NULL;
+    unsigned long long *buf = NULL;
+    unsigned long long first;
+    Py_ssize_t num_pfns;
+    Py_ssize_t i;
+    Py_ssize_t j;
+    ssize_t nread;
+    size_t nentries;
+    int fd = -1;
+    int err = 0;
+
+    if (! PyArg_ParseTuple(args, "sO", &path, &py_pfns))
+        return NULL;
+    py_pfns_seq = PySequence_Fast(py_pfns, "expected a sequence");
+    if (py_pfns_seq == NULL)
+        return NULL;
+    num_pfns = PySequence_Fast_GET_SIZE(py_pfns_seq);
+    pfns = malloc((num_pfns > 0 ? num_pfns : 1) * sizeof(*pfns));
+    counts = calloc(num_pfns > 0 ? num_pfns : 1, sizeof(*counts));
+    buf = malloc(PSUTIL_PAGEMAP_BUFSIZE * sizeof(*buf));
+    if (pfns == NULL || counts == NULL || buf == NULL) {
+        PyErr_NoMemory();
+        goto error;
+    }
+    for (i = 0; i < num_pfns; i++) {
+        pfns[i] = PyLong_AsUnsignedLongLong(
+            PySequence_Fast_GET_ITEM(py_pfns_seq, i));
+        if (pfns[i] == (unsigned long long)-1 && PyErr_Occurred())
+            goto error;
+        if (i > 0 && pfns[i] < pfns[i - 1]) {
+            PyErr_SetString(PyExc_ValueError, "PFNs must be sorted");
+            goto error;
+        }
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    fd = open(path, O_RDONLY);
+    if (fd == -1)
+        err = errno;
+    i = 0;
+    while (i < num_pfns && err == 0) {
+        // read all the PFNs fitting in the buffer with one call
+        first = pfns[i];
+        j = i;
+        while (j < num_pfns && pfns[j] - first < PSUTIL_PAGEMAP_BUFSIZE)
+            j++;
+        nentries = pfns[j - 1] - first + 1;
+        nread = pread(fd, buf, nentries * sizeof(*buf),
+                      (off_t)(first * sizeof(*buf)));
+        if (nread == -1) {
+            err = errno;
+            break;
+        }
+        nentries = nread / sizeof(*buf);
+        for (; i < j; i++) {
+            if (pfns[i] - first < nentries)
+                counts[i] = buf[pfns[i] - first];
+        }
+    }
+    if (fd != -1)
+        close(fd);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+        goto error;
+    }
+
+    py_retlist = PyList_New(num_pfns);
+    if (py_retlist == NULL)
+        goto error;
+    for (i = 0; i < num_pfns; i++) {
+        py_count = PyLong_FromUnsignedLongLong(counts[i]);
+        if (py_count == NULL)
+            goto error;
+        PyList_SET_ITEM(py_retlist, i, py_count);
+    }
+    free(pfns);
+    free(counts);
+    free(buf);
+    Py_DECREF(py_pfns_seq);
+    return py_retlist;
+
+error:
+    free(pfns);
+    free(counts);
+    free(buf);
+    Py_XDECREF(py_retlist);
+    Py_DECREF(py_pfns_seq);
+    return NULL;
+}
+
+
+#ifdef PSUTIL_HAVE_INET_DIAG
+/*
+ * Return an (ip, port) tuple out of an inet_diag socket address or an
+ * empty tuple if port is 0 (e.g. remote address of a listening socket).
+ */
+static PyObject *
+psutil_inet_diag_addr(int family, __be32 *addr, __be16 port) {
+    char ip[INET6_ADDRSTRLEN];
+
+    if (port == 0)
+        return PyTuple_New(0);
+    if (inet_ntop(family, addr, ip, sizeof(ip)) == NULL)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    return Py_BuildValue("(si)", ip, ntohs(port));
+}
+
+
+/*
+ * Dump the sockets of the given family (AF_INET or AF_INET6) and
+ * protocol (IPPROTO_TCP or IPPROTO_UDP) via NETLINK_SOCK_DIAG and
+ * return a list of (laddr, raddr, state, inode) tuples, where state
+ * is the kernel TCP state number. 'states' is a bitmask of the TCP
+ * states to dump (1 << state) so that filtering happens in kernel.
+ * This is a lot faster than parsing /proc/net/{tcp,udp}*.
+ */
+static PyObject *
+psutil_net_inet_diag(PyObject *self, PyObject *args) {
+    int family;
+    int protocol;
+    unsigned int states;
+    int sock = -1;
+    int done = 0;
+    ssize_t len;
+    char *buf = NULL;
+    const size_t bufsize = 65536;
+    struct sockaddr_nl nladdr;
+    struct nlmsghdr *nlh;
+    struct inet_diag_msg *diag;
+    struct {
+        struct nlmsghdr nlh;
+        struct inet_diag_req_v2 req;
+    } request;
+    PyObject *py_retlist = NULL;
+    PyObject *py_tuple = NULL;
+    PyObject *py_laddr = NULL;
+    PyObject *py_raddr = NULL;
+
+    if (! PyArg_ParseTuple(args, "iiI", &family, &protocol, &states))
+        return NULL;
+
+    buf = malloc(bufsize);
+    if (buf == NULL)
+        return PyErr_NoMemory();
+    py_retlist = PyList_New(0);
+    if (py_retlist == NULL)
+        goto error;
+
+    sock = socket(AF_NETLINK, SOCK_DGRAM, NETLINK_SOCK_DIAG);
+    if (sock == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    memset(&nladdr, 0, sizeof(nladdr));
+    nladdr.nl_family = AF_NETLINK;
+    memset(&request, 0, sizeof(request));
+    request.nlh.nlmsg_len = sizeof(request);
+    request.nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+    request.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    request.req.sdiag_family = family;
+    request.req.sdiag_protocol = protocol;
+    request.req.idiag_states = states;
+    if (sendto(sock, &request, sizeof(request), 0,
+               (struct sockaddr *)&nladdr, sizeof(nladdr)) == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    while (! done) {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(sock, buf, bufsize, 0);
+        Py_END_ALLOW_THREADS
+        if (len == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrno(PyExc_OSError);
+            goto error;
+        }
+        if (len == 0)
+            break;
+        nlh = (struct nlmsghdr *)buf;
+        for (; NLMSG_OK(nlh, len); nlh = NLMSG_NEXT(nlh, len)) {
+            if (nlh->nlmsg_type == NLMSG_DONE) {
+                done = 1;
+                break;
+            }
+            if (nlh->nlmsg_type == NLMSG_ERROR) {
+                errno = -((struct nlmsgerr *)NLMSG_DATA(nlh))->error;
+                PyErr_SetFromErrno(PyExc_OSError);
+                goto error;
+            }
+            if (nlh->nlmsg_type != SOCK_DIAG_BY_FAMILY)
+                continue;
+            diag = (struct inet_diag_msg *)NLMSG_DATA(nlh);
+            py_laddr = psutil_inet_diag_addr(
+                diag->idiag_family, diag->id.idiag_src, diag->id.idiag_sport);
+            if (py_laddr == NULL)
+                goto error;
+            py_raddr = psutil_inet_diag_addr(
+                diag->idiag_family, diag->id.idiag_dst, diag->id.idiag_dport);
+            if (py_raddr == NULL)
+                goto error;
+            py_tuple = Py_BuildValue(
+                "(OOik)", py_laddr, py_raddr, (int)diag->idiag_state,
+                (unsigned long)diag->idiag_inode);
+            if (py_tuple == NULL)
+                goto error;
+            if (PyList_Append(py_retlist, py_tuple))
+                goto error;
+            Py_CLEAR(py_laddr);
+            Py_CLEAR(py_raddr);
+            Py_CLEAR(py_tuple);
+        }
+    }
+
+    close(sock);
+    free(buf);
+    return py_retlist;
+
+error:
+    if (sock != -1)
+        close(sock);
+    free(buf);
+    Py_XDECREF(py_laddr);
+    Py_XDECREF(py_raddr);
+    Py_XDECREF(py_tuple);
+    Py_XDECREF(py_retlist);
+    return NULL;
+}
+#endif
+
+
+#ifdef PSUTIL_HAVE_UNIX_DIAG
+/*
+ * Dump all UNIX sockets via NETLINK_SOCK_DIAG and return a list of
+ * (path, type, inode, peer_inode) tuples. Abstract socket names are
+ * prefixed with "@" as in /proc/net/unix; peer_inode is 0 if the
+ * socket is not connected.
+ */
+static PyObject *
+psutil_net_unix_diag(PyObject *self, PyObject *args) {
+    int sock = -1;
+    int done = 0;
+    int attrlen;
+    ssize_t len;
+    char *buf = NULL;
+    char *name;
+    Py_ssize_t namelen;
+    unsigned int peer;
+    const size_t bufsize = 65536;
+    struct sockaddr_nl nladdr;
+    struct nlmsghdr *nlh;
+    struct unix_diag_msg *diag;
+    struct rtattr *attr;
+    struct {
+        struct nlmsghdr nlh;
+        struct unix_diag_req req;
+    } request;
+    PyObject *py_retlist = NULL;
+    PyObject *py_tuple = NULL;
+    PyObject *py_path = NULL;
+
+    buf = malloc(bufsize);
+    if (buf == NULL)
+        return PyErr_NoMemory();
+    py_retlist = PyList_New(0);
+    if (py_retlist == NULL)
+        goto error;
+
+    sock = socket(AF_NETLINK, SOCK_DGRAM, NETLINK_SOCK_DIAG);
+    if (sock == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    memset(&nladdr, 0, sizeof(nladdr));
+    nladdr.nl_family = AF_NETLINK;
+    memset(&request, 0, sizeof(request));
+    request.nlh.nlmsg_len = sizeof(request);
+    request.nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+    request.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    request.req.sdiag_family = AF_UNIX;
+    request.req.udiag_states = (unsigned int)-1;
+    request.req.udiag_show = UDIAG_SHOW_NAME | UDIAG_SHOW_PEER;
+    if (sendto(sock, &request, sizeof(request), 0,
+               (struct sockaddr *)&nladdr, sizeof(nladdr)) == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    while (! done) {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(sock, buf, bufsize, 0);
+        Py_END_ALLOW_THREADS
+        if (len == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrno(PyExc_OSError);
+            goto error;
+        }
+        if (len == 0)
+            break;
+        nlh = (struct nlmsghdr *)buf;
+        for (; NLMSG_OK(nlh, len); nlh = NLMSG_NEXT(nlh, len)) {
+            if (nlh->nlmsg_type == NLMSG_DONE) {
+                done = 1;
+                break;
+            }
+            if (nlh->nlmsg_type == NLMSG_ERROR) {
+                errno = -((struct nlmsgerr *)NLMSG_DATA(nlh))->error;
+                PyErr_SetFromErrno(PyExc_OSError);
+                goto error;
+            }
+            if (nlh->nlmsg_type != SOCK_DIAG_BY_FAMILY)
+                continue;
+            diag = (struct unix_diag_msg *)NLMSG_DATA(nlh);
+            name = "";
+            namelen = 0;
+            peer = 0;
+            attr = (struct rtattr *)(diag + 1);
+            attrlen = nlh->nlmsg_len - NLMSG_LENGTH(sizeof(*diag));
+            for (; RTA_OK(attr, attrlen); attr = RTA_NEXT(attr, attrlen)) {
+                if (attr->rta_type == UNIX_DIAG_NAME) {
+                    name = (char *)RTA_DATA(attr);
+                    namelen = RTA_PAYLOAD(attr);
+                    if (namelen > 0 && name[0] == '\0')
+                        name[0] = '@';  // abstract namespace
+                    else
+                        namelen = strnlen(name, namelen);
+                }
+                else if (attr->rta_type == UNIX_DIAG_PEER) {
+                    peer = *(unsigned int *)RTA_DATA(attr);
+                }
+            }
+            py_path = psutil_smaps_str(name, namelen);
+            if (py_path == NULL)
+                goto error;
+            py_tuple = Py_BuildValue(
+                "(Oikk)", py_path, (int)diag->udiag_type,
+                (unsigned long)diag->udiag_ino, (unsigned long)peer);
+            if (py_tuple == NULL)
+                goto error;
+            if (PyList_Append(py_retlist, py_tuple))
+                goto error;
+            Py_CLEAR(py_path);
+            Py_CLEAR(py_tuple);
+        }
+    }
+
+    close(sock);
+    free(buf);
+    return py_retlist;
+
+error:
+    if (sock != -1)
+        close(sock);
+    free(buf);
+    Py_XDECREF(py_path);
+    Py_XDECREF(py_tuple);
+    Py_XDECREF(py_retlist);
+    return NULL;
+}
+#endif
+
+
 /*
  * Define the psutil C module methods and initialize the module.
  */
@@ -569,6 +1810,30 @@ PsutilMethods[] = {
      "Return process CPU affinity as a Python long (the bitmask)."},
     {"proc_cpu_affinity_set", psutil_proc_cpu_affinity_set, METH_VARARGS,
      "Set process CPU affinity; expects a bitmask."},
+    {"proc_stat_bulk", psutil_proc_stat_bulk, METH_VARARGS,
+     "Read /proc/{pid}/stat for multiple PIDs in one shot."},
+    {"proc_uid_bulk", psutil_proc_uid_bulk, METH_VARARGS,
+     "Return the real UID of multiple processes in one shot."},
+    {"proc_starttime", psutil_proc_starttime, METH_VARARGS,
+     "Return process start time expressed in clock ticks after boot."},
+    {"parse_smaps", psutil_parse_smaps, METH_VARARGS,
+     "Parse the content of /proc/{pid}/smaps."},
+    {"proc_pagemap_pfns", psutil_proc_pagemap_pfns, METH_VARARGS,
+     "Return the PFNs of the present pages of a process."},
+    {"kpagecount", psutil_kpagecount, METH_VARARGS,
+     "Return how many times the given physical pages are mapped."},
+#ifdef PSUTIL_HAVE_INET_DIAG
+    {"net_inet_diag", psutil_net_inet_diag, METH_VARARGS,
+     "Dump TCP or UDP sockets via NETLINK_SOCK_DIAG."},
+#endif
+#ifdef PSUTIL_HAVE_UNIX_DIAG
+    {"net_unix_diag", psutil_net_unix_diag, METH_VARARGS,
+     "Dump UNIX sockets and their peers via NETLINK_SOCK_DIAG."},
+#endif
+#ifdef __NR_pidfd_open
+    {"proc_pidfd_open", psutil_proc_pidfd_open, METH_VARARGS,
+     "Return a file descriptor referring to the process."},
+#endif
 
     // --- system related functions
 
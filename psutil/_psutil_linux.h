@@ -12,6 +12,15 @@ static PyObject* psutil_proc_cpu_affinity_get(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_cpu_affinity_set(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_ioprio_get(PyObject* self, PyObject* args);
 static PyObject* psutil_proc_ioprio_get(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_stat_bulk(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_uid_bulk(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_starttime(PyObject* self, PyObject* args);
+static PyObject* psutil_parse_smaps(PyObject* self, PyObject* args);
+static PyObject* psutil_proc_pagemap_pfns(PyObject* self, PyObject* args);
+static PyObject* psutil_kpagecount(PyObject* self, PyObject* args);
+#ifdef __NR_pidfd_open
+static PyObject* psutil_proc_pidfd_open(PyObject* self, PyObject* args);
+#endif
 
 // system
 
@@ -19,3 +28,9 @@ static PyObject* psutil_disk_partitions(PyObject* self, PyObject* args);
 static PyObject* psutil_linux_sysinfo(PyObject* self, PyObject* args);
 static PyObject* psutil_users(PyObject* self, PyObject* args);
 static PyObject* psutil_net_if_stats(PyObject* self, PyObject* args);
+#ifdef PSUTIL_HAVE_INET_DIAG
+static PyObject* psutil_net_inet_diag(PyObject* self, PyObject* args);
+#endif
+#ifdef PSUTIL_HAVE_UNIX_DIAG
+static PyObject* psutil_net_unix_diag(PyObject* self, PyObject* args);
+#endif
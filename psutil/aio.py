@@ -0,0 +1,203 @@
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""asyncio support: coroutine versions of those psutil functions
+and methods which would otherwise block the event loop.
+Requires Python >= 3.6.
+
+Waiting for a process uses a pidfd registered with loop.add_reader()
+where available (Linux >= 5.3); otherwise, and for
+reading process info, the default loop executor is used.
+"""
+
+import asyncio
+import itertools
+import os
+
+import psutil
+
+
+__all__ = ["process_iter", "wait", "wait_procs", "cpu_percent",
+           "cpu_times_percent", "proc_cpu_percent"]
+
+# number of processes process_iter() collects per executor call
+_PROCESS_ITER_BATCH = 16
+
+if hasattr(asyncio, "get_running_loop"):
+    _get_running_loop = asyncio.get_running_loop
+else:
+    # Python 3.6
+    _get_running_loop = asyncio.get_event_loop
+
+
+# On Linux use the C implementation, which doesn't require Python 3.9
+_cext_pidfd_open = getattr(
+    getattr(psutil._psplatform, "cext", None), "proc_pidfd_open", None)
+_pidfd_supported = None
+
+
+def _pidfd_open(pid):
+    """Return a file descriptor referring to process 'pid' which
+    becomes readable when the process terminates, or None if this is
+    not supported.
+    """
+    if _cext_pidfd_open is not None:
+        opener = _cext_pidfd_open
+    elif hasattr(os, "pidfd_open"):
+        opener = os.pidfd_open
+    else:
+        return None
+    try:
+        return opener(pid)
+    except OSError:
+        # ENOSYS (old kernel), EPERM (seccomp), EMFILE or ESRCH
+        # (process is gone): let Process.wait() deal with it
+        return None
+
+
+def _has_pidfd():
+    """Return True if pidfds can be used on this system."""
+    global _pidfd_supported
+    if _pidfd_supported is None:
+        fd = _pidfd_open(os.getpid())
+        _pidfd_supported = fd is not None
+        if fd is not None:
+            os.close(fd)
+    return _pidfd_supported
+
+
+async def process_iter(attrs=None, ad_value=None):
+    """Asynchronous generator version of psutil.process_iter().
+    Process info is collected in the loop executor, a few processes
+    per call, so that processes are yielded as soon as they're ready.
+    """
+    loop = _get_running_loop()
+    it = psutil.process_iter(attrs=attrs, ad_value=ad_value)
+    while True:
+        procs = await loop.run_in_executor(
+            None, lambda: list(itertools.islice(it, _PROCESS_ITER_BATCH)))
+        if not procs:
+            break
+        for proc in procs:
+            yield proc
+
+
+async def wait(proc, timeout=None):
+    """Coroutine version of Process.wait(): wait for process
+    termination and, if process is a children of os.getpid(), also
+    return its exit code, else None.
+    If timeout (in seconds) is specified and process is still alive
+    raise psutil.TimeoutExpired.
+    """
+    if timeout is not None and not timeout >= 0:
+        raise ValueError("timeout must be a positive integer")
+    loop = _get_running_loop()
+    pidfd = _pidfd_open(proc.pid)
+    if not proc.is_running():
+        # The process is gone and its PID may have been reused (checked
+        # after opening the pidfd so that it refers to the same process).
+        if pidfd is not None:
+            os.close(pidfd)
+        return None
+    if pidfd is None:
+        return await loop.run_in_executor(None, proc.wait, timeout)
+    try:
+        fut = loop.create_future()
+        loop.add_reader(pidfd, lambda: fut.done() or fut.set_result(None))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            raise psutil.TimeoutExpired(timeout, proc.pid, proc._name)
+        finally:
+            loop.remove_reader(pidfd)
+    finally:
+        os.close(pidfd)
+    # The process is gone: reap it and collect its exit code in case
+    # it's our children. If it's not, its parent may not reap it any
+    # time soon, so don't wait for that (same as wait_procs()).
+    try:
+        return await loop.run_in_executor(None, proc.wait, 0)
+    except psutil.TimeoutExpired:
+        return None
+
+
+async def wait_procs(procs, timeout=None, callback=None):
+    """Coroutine version of psutil.wait_procs(): wait for a list of
+    Process instances to terminate and return a (gone, alive) tuple.
+    The gone ones will have a new 'returncode' attribute.
+    'callback' is a function which gets called every time a process
+    terminates.
+    If pidfds are not supported this runs psutil.wait_procs() in the
+    loop executor, in which case 'callback' is called from there.
+    """
+    if timeout is not None and not timeout >= 0:
+        msg = "timeout must be a positive integer, got %s" % timeout
+        raise ValueError(msg)
+    if callback is not None and not callable(callback):
+        raise TypeError("callback %r is not a callable" % callback)
+    procs = list(procs)
+    loop = _get_running_loop()
+    if not _has_pidfd():
+        # One blocking wait per process would exhaust the executor
+        # workers, making the overall timeout expire late.
+        return await loop.run_in_executor(
+            None, psutil.wait_procs, procs, timeout, callback)
+    gone = []
+
+    async def check_gone(proc):
+        try:
+            returncode = await wait(proc, timeout)
+        except psutil.TimeoutExpired:
+            pass
+        else:
+            if returncode is not None or not proc.is_running():
+                proc.returncode = returncode
+                gone.append(proc)
+                if callback is not None:
+                    callback(proc)
+
+    await asyncio.gather(*[check_gone(proc) for proc in procs])
+    alive = [proc for proc in procs if proc not in gone]
+    return (gone, alive)
+
+
+async def cpu_percent(interval=None, percpu=False):
+    """Coroutine version of psutil.cpu_percent(). If interval is > 0.0
+    sleeps asynchronously instead of blocking the event loop.
+    Unlike the blocking version the "last call" times used when
+    interval is None are not updated so that concurrent calls don't
+    interfere with each other.
+    """
+    if interval is None or not interval > 0.0:
+        return psutil.cpu_percent(interval=None, percpu=percpu)
+    t1 = psutil.cpu_times(percpu=percpu)
+    await asyncio.sleep(interval)
+    t2 = psutil.cpu_times(percpu=percpu)
+    if not percpu:
+        return psutil._cpu_busy_percent(t1, t2)
+    return [psutil._cpu_busy_percent(x, y) for x, y in zip(t1, t2)]
+
+
+async def cpu_times_percent(interval=None, percpu=False):
+    """Coroutine version of psutil.cpu_times_percent(), see
+    cpu_percent().
+    """
+    if interval is None or not interval > 0.0:
+        return psutil.cpu_times_percent(interval=None, percpu=percpu)
+    t1 = psutil.cpu_times(percpu=percpu)
+    await asyncio.sleep(interval)
+    t2 = psutil.cpu_times(percpu=percpu)
+    if not percpu:
+        return psutil._cpu_times_percent_calc(t1, t2)
+    return [psutil._cpu_times_percent_calc(x, y) for x, y in zip(t1, t2)]
+
+
+async def proc_cpu_percent(proc, interval=None):
+    """Coroutine version of Process.cpu_percent(). If interval is
+    > 0.0 sleeps asynchronously instead of blocking the event loop.
+    """
+    if interval is not None and interval > 0.0:
+        proc.cpu_percent(interval=None)
+        await asyncio.sleep(interval)
+    return proc.cpu_percent(interval=None)
@@ -415,7 +415,9 @@ def check_connection_ntuple(conn):
                     if err.errno != errno.EADDRNOTAVAIL:
                         raise
     elif conn.family == AF_UNIX:
-        assert not conn.raddr, repr(conn.raddr)
+        # on Linux unix_diag reports the path of the peer, if any
+        if not (LINUX and psutil._psplatform.HAS_UNIX_DIAG):
+            assert not conn.raddr, repr(conn.raddr)
         assert conn.status == psutil.CONN_NONE, conn.status
 
     if getattr(conn, 'fd', -1) != -1:
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Tests for psutil.aio module (asyncio support)."""
+
+import os
+import signal
+import sys
+import time
+
+import psutil
+from psutil import LINUX
+from psutil import POSIX
+from psutil.tests import get_test_subprocess
+from psutil.tests import mock
+from psutil.tests import reap_children
+from psutil.tests import run_test_module_by_name
+from psutil.tests import unittest
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    from psutil import aio
+else:
+    aio = None
+
+
+@unittest.skipIf(aio is None, "requires python >= 3.6")
+class TestAsyncio(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        reap_children()
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def collect(self, agen):
+        ret = []
+        while True:
+            try:
+                ret.append(self.run_coro(agen.__anext__()))
+            except StopAsyncIteration:
+                return ret
+
+    def test_process_iter(self):
+        procs = self.collect(aio.process_iter())
+        self.assertIn(os.getpid(), [p.pid for p in procs])
+        procs = self.collect(aio.process_iter(attrs=['pid', 'name']))
+        for p in procs:
+            self.assertEqual(sorted(p.info), ['name', 'pid'])
+
+    def test_process_iter_incremental(self):
+        # processes are yielded as soon as a batch is ready, before
+        # the underlying process_iter() is exhausted
+        consumed = []
+        orig_process_iter = psutil.process_iter
+
+        def process_iter(*args, **kwargs):
+            for proc in orig_process_iter(*args, **kwargs):
+                consumed.append(proc)
+                yield proc
+
+        with mock.patch("psutil.aio._PROCESS_ITER_BATCH", 2):
+            with mock.patch("psutil.process_iter", side_effect=process_iter):
+                agen = aio.process_iter()
+                self.run_coro(agen.__anext__())
+                self.assertEqual(len(consumed), 2)
+                procs = self.collect(agen)
+        self.assertEqual(len(procs) + 1, len(consumed))
+
+    def test_wait(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        self.assertRaises(psutil.TimeoutExpired,
+                          self.run_coro, aio.wait(p, timeout=0.01))
+        p.terminate()
+        code = self.run_coro(aio.wait(p, timeout=3))
+        if POSIX:
+            self.assertEqual(code, signal.SIGTERM)
+        self.assertFalse(p.is_running())
+        # already gone
+        self.assertIsNone(self.run_coro(aio.wait(p, timeout=3)))
+        self.assertRaises(ValueError, self.run_coro, aio.wait(p, timeout=-1))
+
+    def test_wait_no_pidfd(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with mock.patch("psutil.aio._pidfd_open", return_value=None) as m:
+            self.assertRaises(psutil.TimeoutExpired,
+                              self.run_coro, aio.wait(p, timeout=0.01))
+            p.terminate()
+            code = self.run_coro(aio.wait(p, timeout=3))
+            assert m.called
+        if POSIX:
+            self.assertEqual(code, signal.SIGTERM)
+
+    @unittest.skipUnless(LINUX, "LINUX only")
+    def test_pidfd_open_cext(self):
+        # pidfds don't require os.pidfd_open() (Python >= 3.9)
+        if aio._cext_pidfd_open is None:
+            raise unittest.SkipTest("proc_pidfd_open() not compiled in")
+        with mock.patch("psutil.aio.os") as m:
+            fd = aio._pidfd_open(os.getpid())
+            assert not m.pidfd_open.called
+        if fd is None:
+            raise unittest.SkipTest("pidfd_open() not supported")
+        os.close(fd)
+
+    def test_wait_pid_reused(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with mock.patch.object(p, "is_running", return_value=False):
+            t = time.time()
+            self.assertIsNone(self.run_coro(aio.wait(p, timeout=3)))
+            self.assertLess(time.time() - t, 1)
+        self.assertTrue(psutil.pid_exists(sproc.pid))
+
+    def test_wait_not_reaped(self):
+        # a process which is not our children is reported as gone as
+        # soon as it terminates, not when its parent reaps it
+        if not aio._has_pidfd():
+            raise unittest.SkipTest("pidfds not supported")
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        p.terminate()
+        with mock.patch.object(p, "wait",
+                               side_effect=psutil.TimeoutExpired(0)) as m:
+            self.assertIsNone(self.run_coro(aio.wait(p, timeout=3)))
+            m.assert_called_once_with(0)
+
+    def test_wait_does_not_block_loop(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        ticks = []
+        for x in range(5):
+            self.loop.call_later(0.01 * x, ticks.append, None)
+        self.loop.call_later(0.1, p.terminate)
+        self.run_coro(aio.wait(p, timeout=3))
+        self.assertEqual(len(ticks), 5)
+
+    def test_wait_procs(self):
+        l = []
+
+        def callback(p):
+            l.append(p.pid)
+
+        sproc1 = get_test_subprocess()
+        sproc2 = get_test_subprocess()
+        procs = [psutil.Process(x.pid) for x in (sproc1, sproc2)]
+        gone, alive = self.run_coro(
+            aio.wait_procs(procs, timeout=0.01, callback=callback))
+        self.assertEqual(gone, [])
+        self.assertEqual(len(alive), 2)
+        self.assertEqual(l, [])
+        procs[0].terminate()
+        gone, alive = self.run_coro(
+            aio.wait_procs(procs, timeout=0.5, callback=callback))
+        self.assertEqual(gone, [procs[0]])
+        self.assertEqual(alive, [procs[1]])
+        self.assertEqual(l, [sproc1.pid])
+        if POSIX:
+            self.assertEqual(gone[0].returncode, signal.SIGTERM)
+        self.assertRaises(ValueError, self.run_coro,
+                          aio.wait_procs(procs, timeout=-1))
+        self.assertRaises(TypeError, self.run_coro,
+                          aio.wait_procs(procs, callback=1))
+
+    def test_wait_procs_pid_reused(self):
+        sproc1 = get_test_subprocess()
+        sproc2 = get_test_subprocess()
+        procs = [psutil.Process(x.pid) for x in (sproc1, sproc2)]
+        with mock.patch.object(procs[0], "is_running", return_value=False):
+            gone, alive = self.run_coro(
+                aio.wait_procs(procs, timeout=0.1))
+        self.assertEqual(gone, [procs[0]])
+        self.assertEqual(alive, [procs[1]])
+        self.assertIsNone(procs[0].returncode)
+
+    def test_wait_procs_no_pidfd(self):
+        # without pidfds all processes are waited for by a single
+        # psutil.wait_procs() call in the executor
+        sproc1 = get_test_subprocess()
+        sproc2 = get_test_subprocess()
+        procs = [psutil.Process(x.pid) for x in (sproc1, sproc2)]
+        procs[0].terminate()
+        with mock.patch("psutil.aio._has_pidfd", return_value=False):
+            with mock.patch("psutil.wait_procs",
+                            side_effect=psutil.wait_procs) as m:
+                gone, alive = self.run_coro(
+                    aio.wait_procs(procs, timeout=0.5))
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(gone, [procs[0]])
+        self.assertEqual(alive, [procs[1]])
+
+    def test_cpu_percent(self):
+        ret = self.run_coro(aio.cpu_percent(interval=0.05))
+        self.assertGreaterEqual(ret, 0.0)
+        self.assertLessEqual(ret, 100.0)
+        ret = self.run_coro(aio.cpu_percent(interval=0.05, percpu=True))
+        self.assertEqual(len(ret), psutil.cpu_count())
+        ret = self.run_coro(aio.cpu_percent(interval=None))
+        self.assertGreaterEqual(ret, 0.0)
+        with mock.patch("psutil.time.sleep") as m:
+            self.run_coro(aio.cpu_percent(interval=0.01))
+            assert not m.called
+
+    def test_cpu_times_percent(self):
+        ret = self.run_coro(aio.cpu_times_percent(interval=0.05))
+        self.assertEqual(ret._fields, psutil.cpu_times()._fields)
+        for x in ret:
+            self.assertGreaterEqual(x, 0.0)
+            self.assertLessEqual(x, 100.0)
+        ret = self.run_coro(
+            aio.cpu_times_percent(interval=0.05, percpu=True))
+        self.assertEqual(len(ret), psutil.cpu_count())
+
+    def test_proc_cpu_percent(self):
+        p = psutil.Process()
+        with mock.patch("psutil.time.sleep") as m:
+            t = time.time()
+            ret = self.run_coro(aio.proc_cpu_percent(p, interval=0.05))
+            self.assertGreaterEqual(time.time() - t, 0.04)
+            assert not m.called
+        self.assertGreaterEqual(ret, 0.0)
+
+
+if __name__ == '__main__':
+    run_test_module_by_name(__file__)
@@ -6,13 +6,17 @@
 
 """Linux specific tests."""
 
+import array
 import contextlib
+import ctypes
 import errno
 import io
+import mmap
 import os
 import pprint
 import re
 import shutil
+import signal
 import socket
 import struct
 import tempfile
@@ -27,9 +31,11 @@ except ImportError:
 
 import psutil
 from psutil import LINUX
+from psutil._common import supports_ipv6
 from psutil._compat import PY3
 from psutil._compat import u
 from psutil.tests import call_until
+from psutil.tests import get_test_subprocess
 from psutil.tests import get_kernel_version
 from psutil.tests import importlib
 from psutil.tests import MEMORY_TOLERANCE
@@ -423,9 +429,226 @@ class TestSystemNetwork(unittest.TestCase):
         orig_open = open
         patch_point = 'builtins.open' if PY3 else '__builtin__.open'
         with mock.patch(patch_point, side_effect=open_mock) as m:
-            psutil.net_connections(kind='unix')
+            with mock.patch("psutil._pslinux.HAS_UNIX_DIAG", False):
+                psutil.net_connections(kind='unix')
             assert m.called
 
+    def test_net_connections_inet_diag(self):
+        if not psutil._pslinux.HAS_INET_DIAG:
+            raise unittest.SkipTest("inet_diag not supported")
+        try:
+            psutil._pslinux.cext.net_inet_diag(
+                socket.AF_INET, socket.IPPROTO_TCP, 0xffffffff)
+        except OSError as err:
+            raise unittest.SkipTest("inet_diag not available: %s" % err)
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(server.getsockname())
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(udp.close)
+        udp.bind(("127.0.0.1", 0))
+
+        def conns(kind):
+            return sorted(x for x in psutil.Process().connections(kind)
+                          if x.family != socket.AF_UNIX)
+
+        netlink = conns('inet')
+        with mock.patch("psutil._pslinux.HAS_INET_DIAG", False):
+            procfs = conns('inet')
+        self.assertEqual(netlink, procfs)
+        laddrs = [x.laddr for x in netlink]
+        self.assertIn(server.getsockname(), laddrs)
+        self.assertIn(client.getsockname(), laddrs)
+        self.assertIn(udp.getsockname(), laddrs)
+        # system-wide (the accepted end of the connection is not
+        # owned by any process yet)
+        self.assertEqual(
+            len([x for x in psutil.net_connections('inet4')
+                 if x.pid == os.getpid()]), 3)
+
+    def test_net_connections_inet_diag_states(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(udp.close)
+        udp.bind(("127.0.0.1", 0))
+        retrieve = psutil._pslinux._connections.retrieve
+        ret = retrieve('inet4', states=set([psutil.CONN_LISTEN]))
+        self.assertIn(server.getsockname(), [x.laddr for x in ret])
+        self.assertNotIn(udp.getsockname(), [x.laddr for x in ret])
+        for conn in ret:
+            self.assertEqual(conn.status, psutil.CONN_LISTEN)
+        ret = retrieve('inet4', states=set([psutil.CONN_NONE]))
+        self.assertIn(udp.getsockname(), [x.laddr for x in ret])
+        self.assertNotIn(server.getsockname(), [x.laddr for x in ret])
+        # same with the /proc/net/* parser
+        with mock.patch("psutil._pslinux.HAS_INET_DIAG", False):
+            ret = retrieve('inet4', states=set([psutil.CONN_LISTEN]))
+        self.assertIn(server.getsockname(), [x.laddr for x in ret])
+        for conn in ret:
+            self.assertEqual(conn.status, psutil.CONN_LISTEN)
+
+    def test_net_connections_inet_diag_bound_inactive(self):
+        # a bound but not listening TCP socket is not listed in
+        # /proc/net/tcp and must not be returned via netlink either
+        # (TCP_BOUND_INACTIVE state, Linux >= 6.5)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.bind(("127.0.0.1", 0))
+        p = psutil.Process()
+        ret = p.connections('tcp4')
+        self.assertNotIn(sock.getsockname(), [x.laddr for x in ret])
+        with mock.patch("psutil._pslinux.HAS_INET_DIAG", False):
+            self.assertEqual(sorted(p.connections('tcp4')), sorted(ret))
+        self.assertEqual(
+            psutil._pslinux.TCP_STATES_MASK & (1 << 13), 0)
+
+    def test_net_connections_inet_diag_unknown_state(self):
+        inode = "123456789"
+        ret = [(("127.0.0.1", 8080), (), 99, int(inode))]
+        conns = psutil._pslinux._connections
+        with mock.patch("psutil._pslinux.cext.net_inet_diag",
+                        return_value=ret, create=True):
+            ls = conns.process_inet_diag(
+                socket.AF_INET, socket.SOCK_STREAM, {inode: [(1, 3)]})
+        self.assertEqual(ls, [(3, socket.AF_INET, socket.SOCK_STREAM,
+                               ("127.0.0.1", 8080), (), psutil.CONN_NONE, 1)])
+
+    def test_net_connections_inet_diag_fallback(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        p = psutil.Process()
+        with mock.patch("psutil._pslinux.cext.net_inet_diag",
+                        side_effect=OSError(errno.EPROTONOSUPPORT, ""),
+                        create=True) as m:
+            with mock.patch("psutil._pslinux.HAS_INET_DIAG", True):
+                ret = p.connections('inet')
+            assert m.called
+        self.assertIn(server.getsockname(), [x.laddr for x in ret])
+        self.assertEqual(sorted(ret), sorted(p.connections('inet')))
+
+    def test_net_connections_decode_address(self):
+        decode = psutil._pslinux._connections.decode_address
+        psutil._pslinux._decode_ip.cache_clear()
+        for x in range(2):
+            self.assertEqual(decode("0100007F:1F90", socket.AF_INET),
+                             ("127.0.0.1", 8080))
+            self.assertEqual(decode("0500000A:0000", socket.AF_INET), ())
+            if supports_ipv6():
+                self.assertEqual(
+                    decode("0000000000000000FFFF00000100007F:9E49",
+                           socket.AF_INET6),
+                    ("::ffff:127.0.0.1", 40521))
+                self.assertEqual(
+                    decode("00000000000000000000000001000000:0016",
+                           socket.AF_INET6),
+                    ("::1", 22))
+        info = psutil._pslinux._decode_ip.cache_info()
+        self.assertEqual(info.hits, info.misses)
+
+    def test_net_connections_pushdown(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+        conns = psutil._pslinux._connections
+        for has_inet_diag in (True, False):
+            with mock.patch("psutil._pslinux.HAS_INET_DIAG", has_inet_diag):
+                with mock.patch.object(
+                        conns, "get_all_inodes",
+                        side_effect=conns.get_all_inodes) as m1:
+                    with mock.patch.object(
+                            conns, "decode_address",
+                            side_effect=conns.decode_address) as m2:
+                        ret = psutil.net_connections(
+                            'tcp', lport=port, resolve_pids=False)
+                        ret2 = psutil.net_connections('tcp', lport=port)
+            self.assertEqual(ret, [ret2[0]._replace(fd=-1, pid=None)])
+            self.assertEqual(ret2[0].pid, os.getpid())
+            self.assertEqual(m1.call_count, 1)
+            if not has_inet_diag:
+                # only the matching line was decoded, twice
+                self.assertEqual(m2.call_count, 4)
+
+    def test_net_connections_resolve_pids_no_dedup(self):
+        # identical sockets are not merged if PIDs are not resolved
+        socks = []
+        for x in range(2):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.addCleanup(sock.close)
+            socks.append(sock)
+        ret = psutil.net_connections('unix', resolve_pids=False)
+        self.assertGreaterEqual(
+            len([x for x in ret
+                 if x.laddr == "" and x.type == socket.SOCK_DGRAM]), 2)
+
+    def test_net_connections_unix_diag(self):
+        if not psutil._pslinux.HAS_UNIX_DIAG:
+            raise unittest.SkipTest("unix_diag not supported")
+        try:
+            psutil._pslinux.cext.net_unix_diag()
+        except OSError as err:
+            raise unittest.SkipTest("unix_diag not available: %s" % err)
+        safe_remove(TESTFN)
+        self.addCleanup(safe_remove, TESTFN)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(TESTFN)
+        server.listen(1)
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(TESTFN)
+        conn, _ = server.accept()
+        self.addCleanup(conn.close)
+
+        p = psutil.Process()
+        netlink = dict((x.fd, x) for x in p.connections('unix'))
+        with mock.patch("psutil._pslinux.HAS_UNIX_DIAG", False):
+            procfs = dict((x.fd, x) for x in p.connections('unix'))
+        self.assertEqual(sorted(netlink), sorted(procfs))
+        for fd in netlink:
+            self.assertEqual(netlink[fd]._replace(raddr=None), procfs[fd])
+        self.assertIsNone(netlink[server.fileno()].raddr)
+        self.assertEqual(netlink[client.fileno()].raddr, TESTFN)
+        self.assertEqual(netlink[conn.fileno()].laddr, TESTFN)
+        self.assertEqual(netlink[conn.fileno()].raddr, "")
+
+        # peers
+        peers = [x for x in psutil.net_unix_peers() if x.pid == os.getpid()]
+        self.assertNotIn(server.fileno(), [x.fd for x in peers])
+        peers = dict((x.fd, x) for x in peers)
+        self.assertEqual(peers[client.fileno()].peer_pid, os.getpid())
+        self.assertEqual(peers[client.fileno()].peer_fd, conn.fileno())
+        self.assertEqual(peers[client.fileno()].raddr, TESTFN)
+        self.assertEqual(peers[conn.fileno()].peer_fd, client.fileno())
+        self.assertEqual(peers[conn.fileno()].laddr, TESTFN)
+
+    def test_net_connections_unix_diag_fallback(self):
+        safe_remove(TESTFN)
+        self.addCleanup(safe_remove, TESTFN)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(sock.close)
+        sock.bind(TESTFN)
+        p = psutil.Process()
+        with mock.patch("psutil._pslinux.cext.net_unix_diag",
+                        side_effect=OSError(errno.EPROTONOSUPPORT, ""),
+                        create=True) as m:
+            with mock.patch("psutil._pslinux.HAS_UNIX_DIAG", True):
+                ret = p.connections('unix')
+            assert m.called
+        self.assertIn(TESTFN, [x.laddr for x in ret])
+        for conn in ret:
+            self.assertIsNone(conn.raddr)
+
 
 # =====================================================================
 # system disk
@@ -760,6 +983,245 @@ class TestMisc(unittest.TestCase):
             importlib.reload(psutil._pslinux)
             importlib.reload(psutil)
 
+    def test_proc_stat_bulk(self):
+        sproc = get_test_subprocess()
+        try:
+            ret = psutil._pslinux.proc_stat_bulk([os.getpid(), sproc.pid])
+            self.assertEqual(sorted(ret), sorted([os.getpid(), sproc.pid]))
+            p = psutil.Process(sproc.pid)
+            ppid, state, utime, stime, starttime, rss, num_threads, \
+                nice, processor = ret[sproc.pid]
+            self.assertEqual(ppid, os.getpid())
+            self.assertIn(state, "RSDTtWXZxKP")
+            self.assertAlmostEqual(
+                utime / psutil._pslinux.CLOCK_TICKS, p.cpu_times().user,
+                delta=0.1)
+            self.assertAlmostEqual(
+                stime / psutil._pslinux.CLOCK_TICKS, p.cpu_times().system,
+                delta=0.1)
+            self.assertEqual(
+                starttime / psutil._pslinux.CLOCK_TICKS + psutil.boot_time(),
+                p.create_time())
+            self.assertAlmostEqual(
+                rss * psutil._pslinux.PAGESIZE, p.memory_info().rss,
+                delta=MEMORY_TOLERANCE)
+            self.assertEqual(num_threads, p.num_threads())
+            self.assertEqual(nice, p.nice())
+            self.assertIn(processor, range(psutil.cpu_count()))
+        finally:
+            reap_children()
+
+    def test_proc_stat_bulk_gone_pids(self):
+        sproc = get_test_subprocess()
+        pid = sproc.pid
+        reap_children()
+        ret = psutil._pslinux.proc_stat_bulk([os.getpid(), pid])
+        self.assertEqual(list(ret), [os.getpid()])
+        self.assertEqual(psutil._pslinux.proc_stat_bulk([]), {})
+        # all PIDs
+        ret = psutil._pslinux.proc_stat_bulk()
+        self.assertIn(os.getpid(), ret)
+        self.assertIn(1, ret)
+
+    def test_proc_stat_bulk_procfs_path(self):
+        tdir = tempfile.mkdtemp()
+        try:
+            psutil.PROCFS_PATH = tdir
+            self.assertEqual(
+                psutil._pslinux.proc_stat_bulk([os.getpid()]), {})
+        finally:
+            psutil.PROCFS_PATH = "/proc"
+            os.rmdir(tdir)
+
+    def test_cpu_times_map(self):
+        p = psutil.Process()
+        user, system, starttime = psutil._pslinux.cpu_times_map(
+            [os.getpid()])[os.getpid()]
+        self.assertAlmostEqual(user, p.cpu_times().user, delta=0.1)
+        self.assertAlmostEqual(system, p.cpu_times().system, delta=0.1)
+        self.assertEqual(starttime, p._proc._starttime)
+        self.assertIn(1, psutil._pslinux.cpu_times_map())
+
+    def test_ppid_map(self):
+        ppid_map = psutil._pslinux.ppid_map()
+        self.assertEqual(ppid_map[os.getpid()], os.getppid())
+        for pid, ppid in ppid_map.items():
+            try:
+                self.assertEqual(ppid, psutil.Process(pid).ppid())
+            except psutil.NoSuchProcess:
+                pass
+
+    def test_process_iter_pid_reused(self):
+        # Make sure process_iter() detects PIDs which have been reused
+        # by relying on the raw start time.
+        procs = dict((p.pid, p) for p in psutil.process_iter())
+        mypid = os.getpid()
+        orig = psutil._pslinux.cext.proc_starttime
+
+        def starttime_mock(procfs_path, pid):
+            ret = orig(procfs_path, pid)
+            return ret + 1 if pid == mypid else ret
+
+        with mock.patch('psutil._pslinux.cext.proc_starttime',
+                        side_effect=starttime_mock) as m:
+            for p in psutil.process_iter():
+                if p.pid == mypid:
+                    self.assertIsNot(p, procs[mypid])
+            assert m.called
+
+    def test_proc_table(self):
+        table = psutil.proc_table()
+        self.assertEqual(
+            sorted(table),
+            sorted([x[0] for x in psutil._pslinux.PROC_TABLE_FIELDS]))
+        lengths = set([len(x) for x in table.values()])
+        self.assertEqual(len(lengths), 1)
+        self.assertEqual(list(table['pid']), sorted(table['pid']))
+        idx = list(table['pid']).index(os.getpid())
+        p = psutil.Process()
+        self.assertEqual(table['ppid'][idx], p.ppid())
+        self.assertEqual(table['status'][idx], p.status())
+        self.assertEqual(table['create_time'][idx], p.create_time())
+        self.assertAlmostEqual(
+            table['user_time'][idx], p.cpu_times().user, delta=0.1)
+        self.assertAlmostEqual(
+            table['system_time'][idx], p.cpu_times().system, delta=0.1)
+        self.assertAlmostEqual(
+            table['rss'][idx], p.memory_info().rss, delta=MEMORY_TOLERANCE)
+        self.assertEqual(table['num_threads'][idx], p.num_threads())
+        self.assertEqual(table['nice'][idx], p.nice())
+        self.assertEqual(table['uid'][idx], p.uids().real)
+        self.assertIn(table['cpu_num'][idx], range(psutil.cpu_count()))
+
+    def test_proc_table_fields(self):
+        table = psutil.proc_table(fields=['pid', 'rss'])
+        self.assertEqual(sorted(table), ['pid', 'rss'])
+        self.assertEqual(len(table['pid']), len(table['rss']))
+        self.assertEqual(psutil.proc_table(fields=[]), {})
+        self.assertRaises(ValueError, psutil.proc_table, fields=['foo'])
+
+    def test_proc_table_no_process_instances(self):
+        with mock.patch('psutil._pslinux.Process.__init__') as m:
+            psutil.proc_table()
+            assert not m.called
+
+    def test_proc_table_gone_process(self):
+        # a process disappearing while "uid" is being collected is
+        # skipped as a whole
+        with mock.patch('psutil._pslinux.cext.proc_uid_bulk',
+                        return_value={}) as m:
+            table = psutil.proc_table(fields=['pid', 'uid'])
+            assert m.called
+        self.assertEqual(table, {'pid': array.array('l'),
+                                 'uid': array.array('L')})
+
+    def test_proc_table_uid(self):
+        uids = psutil._pslinux.cext.proc_uid_bulk(
+            psutil._psplatform.get_procfs_path(), [os.getpid(), 0])
+        self.assertEqual(uids, {os.getpid(): os.getuid()})
+
+    def test_proc_table_procfs_path(self):
+        tdir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(tdir, 'stat'), 'w') as f:
+                f.write('btime 1000\n')
+            psutil.PROCFS_PATH = tdir
+            self.assertEqual(len(psutil.proc_table()['pid']), 0)
+        finally:
+            psutil.PROCFS_PATH = "/proc"
+            shutil.rmtree(tdir)
+
+    def test_proc_table_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            raise unittest.SkipTest("numpy not installed")
+        table = psutil.proc_table(fields=['pid', 'status'], as_numpy=True)
+        self.assertIsInstance(table['pid'], numpy.ndarray)
+        self.assertIn(os.getpid(), table['pid'])
+
+    @unittest.skipUnless(os.getuid() == 0, "root only")
+    def test_shared_memory_analysis(self):
+        self.addCleanup(safe_remove, TESTFN)
+        sproc1 = get_test_subprocess(wait=True)
+        safe_remove(TESTFN)
+        sproc2 = get_test_subprocess(wait=True)
+        self.addCleanup(reap_children)
+        pids = [sproc1.pid, sproc2.pid]
+        ret = psutil.shared_memory_analysis(pids)
+        rss = sum(psutil.Process(pid).memory_info().rss for pid in pids)
+        self.assertAlmostEqual(ret.rss, rss, delta=MEMORY_TOLERANCE)
+        self.assertLessEqual(ret.total, ret.rss)
+        self.assertEqual(ret.total % psutil._pslinux.PAGESIZE, 0)
+        # the same executable and libraries are mapped by both
+        self.assertGreater(ret.shared, 0)
+        self.assertGreater(ret.private, 0)
+        self.assertLessEqual(ret.private + ret.shared, ret.total)
+        # sampling
+        ret2 = psutil.shared_memory_analysis(pids, sample=4)
+        self.assertEqual(ret2.total % (psutil._pslinux.PAGESIZE * 4), 0)
+        self.assertAlmostEqual(ret2.rss, ret.rss, delta=ret.rss / 2)
+        self.assertRaises(ValueError, psutil.shared_memory_analysis, pids,
+                          sample=0)
+        # gone processes are skipped
+        p = psutil.Process(sproc2.pid)
+        p.kill()
+        p.wait()
+        ret = psutil.shared_memory_analysis(pids)
+        self.assertEqual(ret.shared, 0)
+        self.assertEqual(psutil.shared_memory_analysis([]),
+                         (0, 0, 0, 0, 0))
+
+    @unittest.skipUnless(os.getuid() == 0, "root only")
+    def test_shared_memory_analysis_mapped_twice(self):
+        # a page mapped twice by the same process is private
+        pagesize = psutil._pslinux.PAGESIZE
+        self.addCleanup(safe_remove, TESTFN)
+        with open(TESTFN, 'wb') as f:
+            f.write(b'x' * pagesize)
+        with open(TESTFN, 'r+b') as f:
+            m1 = mmap.mmap(f.fileno(), pagesize)
+            self.addCleanup(m1.close)
+            m2 = mmap.mmap(f.fileno(), pagesize)
+            self.addCleanup(m2.close)
+        # fault the page in both mappings
+        self.assertEqual(m1[0:1] + m2[0:1], b'xx')
+        maps = []
+        for m in (m1, m2):
+            addr = ctypes.addressof(ctypes.c_char.from_buffer(m))
+            maps.append(("%x-%x" % (addr, addr + pagesize), ))
+        with mock.patch("psutil._pslinux.Process.memory_maps_fast",
+                        return_value=maps):
+            ret = psutil.shared_memory_analysis([os.getpid()])
+        self.assertEqual(ret, (2 * pagesize, pagesize, pagesize, 0, 0))
+
+    def test_shared_memory_analysis_mapcount(self):
+        # kpagecount is compared with the mappings of the group
+        with mock.patch("psutil._pslinux.Process.pagemap_pfns",
+                        side_effect=[[10, 10, 11, 12], [12, 13]]), \
+                mock.patch("psutil._pslinux.cext.kpagecount",
+                           return_value=[2, 2, 2, 3]):
+            ret = psutil.shared_memory_analysis([1, 2])
+        pagesize = psutil._pslinux.PAGESIZE
+        # 10 is private; 11 is also mapped outside; 12 is shared by
+        # the group; 13 is shared by 2 and some other process
+        self.assertEqual(
+            ret, tuple(x * pagesize for x in (6, 4, 1, 1, 2)))
+
+    def test_shared_memory_analysis_access_denied(self):
+        # PFNs are zeroed if we lack CAP_SYS_ADMIN
+        with mock.patch("psutil._pslinux.cext.proc_pagemap_pfns",
+                        return_value=[0, 0]) as m:
+            self.assertRaises(psutil.AccessDenied,
+                              psutil.shared_memory_analysis, [os.getpid()])
+            assert m.called
+        with mock.patch("psutil._pslinux.cext.proc_pagemap_pfns",
+                        return_value=[1]), \
+                mock.patch("psutil._pslinux.cext.kpagecount",
+                           side_effect=OSError(errno.EACCES, "")):
+            self.assertRaises(psutil.AccessDenied,
+                              psutil.shared_memory_analysis, [os.getpid()])
+
 
 # =====================================================================
 # test process
@@ -799,6 +1261,160 @@ class TestProcess(unittest.TestCase):
             # test only rwx chars, ignore 's' and 'p'
             self.assertEqual(mode[:3], this.perms[:3])
 
+    def test_memory_maps_grouped(self):
+        p = psutil.Process()
+        d = {}
+        for m in p.memory_maps(grouped=False):
+            nums = m[3:]
+            if m.path in d:
+                d[m.path] = [x + y for x, y in zip(d[m.path], nums)]
+            else:
+                d[m.path] = list(nums)
+        grouped = p.memory_maps(grouped=True)
+        self.assertEqual(sorted(x.path for x in grouped), sorted(d))
+        for m in grouped:
+            # [heap] and [stack] may grow in the meantime
+            if not m.path.startswith('['):
+                self.assertEqual(list(m[1:]), d[m.path])
+
+    def test_memory_maps_iter(self):
+        p = psutil.Process()
+        maps = p.memory_maps(grouped=False)
+        ret = list(p.memory_maps_iter())
+        self.assertEqual([x.addr for x in ret], [x.addr for x in maps])
+        self.assertEqual(ret[0]._fields, maps[0]._fields)
+        # use a chunk size smaller than a single line
+        ret = list(psutil._pslinux.Process(os.getpid()).memory_maps_iter(
+            chunksize=7))
+        self.assertEqual([x[0] for x in ret], [x.addr for x in maps])
+        # process is gone
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        p.kill()
+        p.wait()
+        self.assertRaises(psutil.NoSuchProcess, list, p.memory_maps_iter())
+
+    def test_memory_maps_iter_exceptions(self):
+        p = psutil.Process()
+        # errors raised while iterating are translated as well
+        with mock.patch("psutil._pslinux.cext.parse_smaps",
+                        side_effect=OSError(errno.EPERM, "")) as m:
+            self.assertRaises(psutil.AccessDenied, p.memory_maps)
+            self.assertRaises(psutil.AccessDenied, list,
+                              p.memory_maps_iter())
+            assert m.called
+        with mock.patch("psutil._pslinux.cext.parse_smaps",
+                        side_effect=OSError(errno.ESRCH, "")):
+            self.assertRaises(psutil.NoSuchProcess, list,
+                              p.memory_maps_iter())
+        # the file is not opened until the generator is consumed and
+        # is closed when the generator is closed
+        with mock.patch("psutil._pslinux.open_binary",
+                        side_effect=psutil._pslinux.open_binary) as m:
+            it = p.memory_maps_iter()
+            assert not m.called
+            next(it)
+            assert m.called
+            num_fds = p.num_fds()
+            it.close()
+            self.assertEqual(p.num_fds(), num_fds - 1)
+
+    def test_cgroup(self):
+        def open_mock(name, *args, **kwargs):
+            if name.endswith('/cgroup'):
+                return io.StringIO(textwrap.dedent(content))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        # cgroup v2
+        content = u("""\
+            0::/user.slice/user-1000.slice/session-2.scope
+            """)
+        with mock.patch(patch_point, side_effect=open_mock):
+            self.assertEqual(
+                psutil._pslinux.Process(os.getpid()).cgroup(),
+                "/user.slice/user-1000.slice/session-2.scope")
+        # hybrid v1 / v2: prefer the memory controller
+        content = u("""\
+            9:name=systemd:/user.slice
+            4:memory,foo:/docker/abc
+            1:cpu:/
+            0::/user.slice
+            """)
+        with mock.patch(patch_point, side_effect=open_mock):
+            self.assertEqual(
+                psutil._pslinux.Process(os.getpid()).cgroup(),
+                "/docker/abc")
+        # real file
+        p = psutil._pslinux.Process(os.getpid())
+        self.assertIsInstance(p.cgroup(), str)
+        self.assertIn(p.cgroup(), psutil.memory_usage_by('cgroup'))
+
+    def test_memory_maps_fast(self):
+        p = psutil.Process()
+        maps = p.memory_maps(grouped=False)
+        fast = p.memory_maps(grouped=False, fast=True)
+        # mappings may change in the meantime so only compare the
+        # ones with the same address range
+        smaps = dict((x.addr, x) for x in maps)
+        common = [x for x in fast if x.addr in smaps]
+        self.assertGreater(len(common), len(fast) // 2)
+        for f in common:
+            m = smaps[f.addr]
+            self.assertEqual((f.perms, f.path, f.size),
+                             (m.perms, m.path, m.size))
+        with open('/proc/self/maps') as f:
+            first = f.readline().split()
+        self.assertEqual(fast[0].offset, int(first[2], 16))
+        self.assertEqual(fast[0].dev, first[3])
+        self.assertEqual(fast[0].inode, int(first[4]))
+        grouped = p.memory_maps(fast=True)
+        self.assertEqual(sorted(x.path for x in grouped),
+                         sorted(set(x.path for x in fast)))
+        self.assertEqual(
+            dict(grouped)[fast[0].path],
+            sum(x.size for x in fast if x.path == fast[0].path))
+
+    def test_parse_smaps(self):
+        data = textwrap.dedent("""\
+            00400000-0040b000 r-xp 00000000 fc:00 1234     /bin/cat
+            Size:                 44 kB
+            Rss:                  40 kB
+            Pss:                  20 kB
+            Private_Clean:         8 kB
+            VmFlags: rd ex mr mw me dw sd
+            0060a000-0060b000 rw-p 0000a000 fc:00 1234     /bin/cat
+            Rss:                   4 kB
+            Private_Dirty:         4 kB
+            01b2a000-01b4b000 rw-p 00000000 00:00 0
+            Rss:                  12 kB
+            Anonymous:            12 kB
+            7f0000000000-7f0000001000 r--p 00000000 fc:00 9  /tmp/a b (deleted)
+            Swap:                  1 kB
+            """).encode()
+        parse = psutil._pslinux.cext.parse_smaps
+        ret = parse(data, False)
+        self.assertEqual(len(ret), 4)
+        self.assertEqual(
+            ret[0],
+            ('00400000-0040b000', 'r-xp', '/bin/cat', 40 * 1024, 44 * 1024,
+             20 * 1024, 0, 0, 8 * 1024, 0, 0, 0, 0))
+        self.assertEqual(ret[2][2], '[anon]')
+        self.assertEqual(ret[2][11], 12 * 1024)
+        self.assertEqual(ret[3][2], '/tmp/a b')
+        self.assertEqual(ret[3][12], 1024)
+        ret = parse(data, True)
+        self.assertEqual([x[0] for x in ret],
+                         ['/bin/cat', '[anon]', '/tmp/a b'])
+        self.assertEqual(ret[0][1:4], (44 * 1024, 44 * 1024, 20 * 1024))
+        self.assertEqual(ret[0][6:8], (8 * 1024, 4 * 1024))
+        self.assertEqual(parse(b"", False), [])
+        self.assertRaises(ValueError, parse, b"Rss:  4 kB\n", False)
+        self.assertRaises(ValueError, parse, b"00400000-0040b000 r-xp\n",
+                          False)
+
     def test_memory_full_info(self):
         src = textwrap.dedent("""
             import time
@@ -820,6 +1436,89 @@ class TestProcess(unittest.TestCase):
         self.assertAlmostEqual(
             mem.swap, sum([x.swap for x in maps]), delta=4096)
 
+    @unittest.skipIf(not psutil._pslinux.HAS_SMAPS_ROLLUP,
+                     "smaps_rollup not supported")
+    def test_memory_full_info_smaps_rollup(self):
+        p = psutil.Process()
+        mem = p.memory_full_info()
+        with mock.patch("psutil._pslinux.HAS_SMAPS_ROLLUP", False):
+            mem2 = p.memory_full_info()
+        self.assertAlmostEqual(mem.uss, mem2.uss, delta=MEMORY_TOLERANCE)
+        self.assertAlmostEqual(mem.pss, mem2.pss, delta=MEMORY_TOLERANCE)
+        self.assertAlmostEqual(mem.swap, mem2.swap, delta=MEMORY_TOLERANCE)
+
+    @unittest.skipIf(not psutil._pslinux.HAS_SMAPS_ROLLUP,
+                     "smaps_rollup not supported")
+    def test_memory_full_info_smaps_rollup_mocked(self):
+        def open_mock(name, *args, **kwargs):
+            if name.endswith('/smaps_rollup'):
+                return io.BytesIO(textwrap.dedent("""\
+                    00400000-ff600000 ---p 00000000 00:00 0   [rollup]
+                    Rss:                1408 kB
+                    Pss:                 403 kB
+                    Pss_Dirty:           103 kB
+                    Pss_Anon:            100 kB
+                    Shared_Clean:       1268 kB
+                    Private_Clean:        40 kB
+                    Private_Dirty:       100 kB
+                    Private_Hugetlb:       2 kB
+                    Swap:                  5 kB
+                    SwapPss:               3 kB
+                    """).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock) as m:
+            mem = psutil.Process().memory_full_info()
+            assert m.called
+        self.assertEqual(mem.uss, 142 * 1024)
+        self.assertEqual(mem.pss, 403 * 1024)
+        self.assertEqual(mem.swap, 5 * 1024)
+
+    def test_memory_full_info_smaps_mocked(self):
+        # fallback on /proc/pid/smaps: Pss_* and SwapPss fields must
+        # not be summed up together with Pss and Swap
+        def open_mock(name, *args, **kwargs):
+            if name.endswith('/smaps'):
+                return io.BytesIO(textwrap.dedent("""\
+                    00400000-0040b000 r-xp 00000000 fc:00 262 /bin/cat
+                    Size:                 44 kB
+                    Rss:                  40 kB
+                    Pss:                  20 kB
+                    Pss_Dirty:             4 kB
+                    Pss_Anon:              4 kB
+                    Shared_Clean:         20 kB
+                    Private_Clean:        16 kB
+                    Private_Dirty:         4 kB
+                    Swap:                  2 kB
+                    SwapPss:               1 kB
+                    7fff0000-7fff2000 rw-p 00000000 00:00 0 [stack]
+                    Size:                  8 kB
+                    Rss:                   8 kB
+                    Pss:                   8 kB
+                    Pss_Dirty:             8 kB
+                    Pss_Anon:              8 kB
+                    Shared_Clean:          0 kB
+                    Private_Clean:         0 kB
+                    Private_Dirty:         8 kB
+                    Swap:                  3 kB
+                    SwapPss:               3 kB
+                    """).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch("psutil._pslinux.HAS_SMAPS_ROLLUP", False):
+            with mock.patch(patch_point, side_effect=open_mock) as m:
+                mem = psutil.Process().memory_full_info()
+                assert m.called
+        self.assertEqual(mem.uss, 28 * 1024)
+        self.assertEqual(mem.pss, 28 * 1024)
+        self.assertEqual(mem.swap, 5 * 1024)
+
     # On PYPY file descriptors are not closed fast enough.
     @unittest.skipIf(PYPY, "skipped on PYPY")
     def test_open_files_mode(self):
@@ -877,6 +1576,266 @@ class TestProcess(unittest.TestCase):
                 self.assertEqual(p.open_files(), [])
                 assert m.called
 
+    def test_oneshot(self):
+        # within oneshot() /proc/pid/stat and /proc/pid/status are
+        # supposed to be read only once
+        def count(m, fname):
+            return len([x for x in m.call_args_list
+                        if x[0][0].endswith('/%s' % fname)])
+
+        p = psutil.Process()
+        orig_open_binary = psutil._pslinux.open_binary
+        with mock.patch('psutil._pslinux.open_binary',
+                        side_effect=orig_open_binary) as m:
+            with p.oneshot():
+                p.name()
+                p.cpu_times()
+                p.terminal()
+                p.ppid()
+                p.uids()
+                p.gids()
+                p.status()
+                p.num_threads()
+                p.num_ctx_switches()
+            self.assertEqual(count(m, 'stat'), 1)
+            self.assertEqual(count(m, 'status'), 1)
+            # cache is cleared on exit
+            p.cpu_times()
+            p.ppid()
+            self.assertEqual(count(m, 'stat'), 2)
+            self.assertEqual(count(m, 'status'), 2)
+
+    def test_parse_status_file(self):
+        # all status-derived metrics are supposed to come from the
+        # same single-pass parse
+        p = psutil.Process()
+        fields = p._proc._parse_status_file()
+        self.assertEqual(int(fields[b'PPid']), os.getppid())
+        self.assertEqual(p.ppid(), os.getppid())
+        self.assertEqual(p.uids().real, os.getuid())
+        self.assertEqual(p.gids().real, os.getgid())
+        self.assertEqual(p.status(), psutil.STATUS_RUNNING)
+        self.assertEqual(p.num_threads(), int(fields[b'Threads']))
+
+    def test_status_fields(self):
+        p = psutil.Process()
+        ret = p.status_fields()
+        self.assertGreaterEqual(ret.peak_rss, p.memory_info().rss // 2)
+        self.assertGreaterEqual(ret.swap, 0)
+        self.assertGreaterEqual(ret.sigq, 0)
+        self.assertGreater(ret.sigq_limit, 0)
+        self.assertEqual(ret.cpus_allowed, p.cpu_affinity())
+
+    @unittest.skipUnless(psutil._pslinux.HAS_PROC_CHILDREN,
+                         "/proc/pid/task/tid/children not available")
+    def test_children_pids(self):
+        p = psutil.Process()
+        self.assertEqual(p._proc.children_pids(), [])
+        sproc = get_test_subprocess()
+        try:
+            self.assertEqual(p._proc.children_pids(), [sproc.pid])
+        finally:
+            reap_children()
+
+    def test_children_w_children_pids(self):
+        # children() relies on /proc/pid/task/tid/children when it's
+        # available, without scanning all processes
+        sproc = get_test_subprocess()
+        try:
+            p = psutil.Process()
+            with mock.patch('psutil._pslinux.Process.children_pids',
+                            create=True, return_value=[sproc.pid]) as m1:
+                with mock.patch('psutil.proc_tree') as m2:
+                    self.assertEqual([x.pid for x in p.children()],
+                                     [sproc.pid])
+                    assert m1.called
+                    assert not m2.called
+            # ...but not for recursive=True
+            with mock.patch('psutil._pslinux.Process.children_pids',
+                            create=True, return_value=[sproc.pid]) as m:
+                self.assertEqual([x.pid for x in p.children(recursive=True)],
+                                 [sproc.pid])
+                assert not m.called
+            # fall back on scanning all processes in case of AccessDenied
+            with mock.patch('psutil._pslinux.Process.children_pids',
+                            create=True,
+                            side_effect=psutil.AccessDenied(0, "")) as m:
+                self.assertEqual([x.pid for x in p.children()],
+                                 [sproc.pid])
+                assert m.called
+        finally:
+            reap_children()
+
+    def test_is_same_process(self):
+        p = psutil.Process()
+        self.assertTrue(p._proc.is_same_process())
+        self.assertEqual(
+            psutil._pslinux.cext.proc_starttime('/proc', os.getpid()),
+            int(p._proc._parse_stat_file()[20]))
+        # is_running() does not create a new Process instance
+        with mock.patch('psutil.Process._init') as m:
+            self.assertTrue(p.is_running())
+            assert not m.called
+        # PID reused
+        with mock.patch('psutil._pslinux.cext.proc_starttime',
+                        return_value=p._proc._starttime + 1) as m:
+            self.assertFalse(p._proc.is_same_process())
+            self.assertFalse(p.is_running())
+            assert m.called
+        # process gone
+        with mock.patch('psutil._pslinux.cext.proc_starttime',
+                        side_effect=OSError(errno.ENOENT, "")) as m:
+            self.assertRaises(psutil.NoSuchProcess, p._proc.is_same_process)
+            self.assertFalse(psutil.Process().is_running())
+            assert m.called
+
+    def test_wait_pidfd(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with mock.patch('psutil._pslinux._psposix.wait_pid',
+                        side_effect=psutil._psposix.wait_pid) as m:
+            self.assertRaises(psutil.TimeoutExpired, p.wait, 0.01)
+            self.assertRaises(psutil.TimeoutExpired, p.wait, 0)
+            # the sleep/backoff loop is not used while the process
+            # is alive
+            assert not m.called
+            p.terminate()
+            self.assertEqual(p.wait(timeout=3), signal.SIGTERM)
+            assert m.called
+        self.assertIsNone(p.wait())
+
+    def test_wait_pidfd_not_supported(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with mock.patch('psutil._pslinux.cext.proc_pidfd_open',
+                        create=True,
+                        side_effect=OSError(errno.ENOSYS, "")) as m1:
+            with mock.patch('psutil._pslinux._psposix.wait_pid',
+                            side_effect=psutil._psposix.wait_pid) as m2:
+                self.assertRaises(psutil.TimeoutExpired, p.wait, 0.01)
+                p.terminate()
+                self.assertEqual(p.wait(timeout=3), signal.SIGTERM)
+                assert m1.called
+                assert m2.called
+
+    def test_wait_procs_pidfd(self):
+        sproc1 = get_test_subprocess()
+        sproc2 = get_test_subprocess()
+        procs = [psutil.Process(x.pid) for x in (sproc1, sproc2)]
+        gone = []
+        with mock.patch('psutil._pslinux.wait_pids',
+                        side_effect=psutil._pslinux.wait_pids) as m:
+            g, a = psutil.wait_procs(procs, timeout=0.01)
+            self.assertEqual(g, [])
+            self.assertEqual(sorted(a, key=id), sorted(procs, key=id))
+            procs[1].terminate()
+            t = time.time()
+            g, a = psutil.wait_procs(procs, timeout=0.5, callback=gone.append)
+            # the overall timeout is honored
+            self.assertGreaterEqual(time.time() - t, 0.45)
+            self.assertEqual(g, [procs[1]])
+            self.assertEqual(a, [procs[0]])
+            self.assertEqual(gone, [procs[1]])
+            self.assertEqual(procs[1].returncode, signal.SIGTERM)
+            assert m.called
+        # already gone
+        g, a = psutil.wait_procs([procs[1]], timeout=0)
+        self.assertEqual(g, [procs[1]])
+        self.assertIsNone(procs[1].returncode)
+
+    def test_wait_procs_pidfd_not_supported(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with mock.patch('psutil._pslinux.cext.proc_pidfd_open',
+                        create=True,
+                        side_effect=OSError(errno.ENOSYS, "")) as m:
+            self.assertRaises(NotImplementedError,
+                              psutil._pslinux.wait_pids, [p.pid], 0, None)
+            p.terminate()
+            g, a = psutil.wait_procs([p], timeout=3)
+            self.assertEqual(g, [p])
+            self.assertEqual(p.returncode, signal.SIGTERM)
+            assert m.called
+
+    def test_wait_procs_pidfd_emfile(self):
+        # running out of fds falls back on polling
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        for errnum in (errno.EMFILE, errno.ENFILE):
+            with mock.patch('psutil._pslinux.cext.proc_pidfd_open',
+                            create=True,
+                            side_effect=OSError(errnum, "")) as m:
+                self.assertRaises(NotImplementedError,
+                                  psutil._pslinux.wait_pids, [p.pid], 0,
+                                  None)
+                g, a = psutil.wait_procs([p], timeout=0.01)
+                self.assertEqual(a, [p])
+                assert m.called
+        p.terminate()
+        with mock.patch('psutil._pslinux.cext.proc_pidfd_open', create=True,
+                        side_effect=OSError(errno.EMFILE, "")):
+            g, a = psutil.wait_procs([p], timeout=3)
+        self.assertEqual(g, [p])
+        self.assertEqual(p.returncode, signal.SIGTERM)
+
+    def test_wait_procs_pidfd_pid_reused(self):
+        # a process whose PID has been reused is gone straight away
+        # instead of waiting for the unrelated process
+        sproc = get_test_subprocess()
+        p1 = psutil.Process(sproc.pid)
+        p2 = psutil.Process(get_test_subprocess().pid)
+        gone = []
+        with mock.patch('psutil._pslinux.wait_pids',
+                        side_effect=psutil._pslinux.wait_pids) as m:
+            with mock.patch.object(p1, 'is_running', return_value=False):
+                g, a = psutil.wait_procs([p1, p2], timeout=0.5,
+                                         callback=gone.append)
+            assert m.called
+        self.assertEqual(g, [p1])
+        self.assertEqual(a, [p2])
+        self.assertEqual(gone, [p1])
+        self.assertIsNone(p1.returncode)
+        # all PIDs reused: nothing to wait for
+        with mock.patch.object(p2, 'is_running', return_value=False):
+            t = time.time()
+            g, a = psutil.wait_procs([p2], timeout=3)
+            self.assertLess(time.time() - t, 1)
+        self.assertEqual((g, a), ([p2], []))
+        self.assertTrue(psutil.pid_exists(sproc.pid))
+
+    def test_parse_status_file_mocked(self):
+        fake_file = io.BytesIO(textwrap.dedent("""\
+            Name:\tfoo bar
+            State:\tZ (zombie)
+            PPid:\t123
+            Uid:\t1000\t1001\t1002\t1003
+            Gid:\t1004\t1005\t1006\t1007
+            VmHWM:\t    1024 kB
+            VmSwap:\t       8 kB
+            Threads:\t4
+            SigQ:\t3/15566
+            Cpus_allowed_list:\t0-2,5,7-8
+            voluntary_ctxt_switches:\t10
+            nonvoluntary_ctxt_switches:\t20
+            """).encode())
+        with mock.patch('psutil._pslinux.open', return_value=fake_file,
+                        create=True) as m:
+            p = psutil._pslinux.Process(os.getpid())
+            p.oneshot_enter()
+            try:
+                self.assertEqual(p.ppid(), 123)
+                self.assertEqual(p.uids(), (1000, 1001, 1002))
+                self.assertEqual(p.gids(), (1004, 1005, 1006))
+                self.assertEqual(p.status(), psutil.STATUS_ZOMBIE)
+                self.assertEqual(p.num_threads(), 4)
+                self.assertEqual(p.num_ctx_switches(), (10, 20))
+                self.assertEqual(
+                    p.status_fields(),
+                    (1024 * 1024, 8 * 1024, 3, 15566, [0, 1, 2, 5, 7, 8]))
+            finally:
+                p.oneshot_exit()
+            self.assertEqual(m.call_count, 1)
+
     # --- mocked tests
 
     def test_terminal_mocked(self):
@@ -976,6 +1935,33 @@ class TestProcess(unittest.TestCase):
         with mock.patch(patch_point, side_effect=open_mock):
             self.assertRaises(psutil.AccessDenied, psutil.Process().threads)
 
+    def test_threads_full(self):
+        p = psutil.Process()
+        threads = p.threads()
+        full = p.threads_full()
+        self.assertEqual([x.id for x in full], [x.id for x in threads])
+        main = full[0]
+        self.assertEqual(main.id, os.getpid())
+        self.assertEqual(main[:3], tuple(threads[0]))
+        self.assertEqual(main.name, p.name()[:15])
+        self.assertEqual(main.status, psutil.STATUS_RUNNING)
+        self.assertEqual(main.nice, p.nice())
+        self.assertIn(main.cpu_num, range(psutil.cpu_count()))
+
+    def test_threads_full_mocked(self):
+        # a thread disappearing in the meantime is skipped
+        def open_mock(name, *args, **kwargs):
+            if name.startswith('/proc/%s/task' % os.getpid()):
+                raise IOError(errno.ENOENT, "")
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock) as m:
+            self.assertEqual(psutil.Process().threads_full(), [])
+            assert m.called
+
     # not sure why (doesn't fail locally)
     # https://travis-ci.org/giampaolo/psutil/jobs/108629915
     @unittest.skipIf(TRAVIS, "fails on travis")
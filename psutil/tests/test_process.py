@@ -576,6 +576,62 @@ class TestProcess(unittest.TestCase):
         self.assertAlmostEqual(p.cpu_times().system,
                                p.threads()[0].system_time, delta=0.1)
 
+    def test_threads_cpu_percent(self):
+        p = psutil.Process()
+        if OPENBSD:
+            try:
+                p.threads()
+            except psutil.AccessDenied:
+                raise unittest.SkipTest(
+                    "on OpenBSD this requires root access")
+        ret = p.threads_cpu_percent()
+        self.assertEqual(sorted(ret), sorted(x.id for x in p.threads()))
+        for percent in ret.values():
+            self.assertEqual(percent, 0.0)
+        thread = ThreadTask()
+        thread.start()
+        try:
+            ret = p.threads_cpu_percent()
+            self.assertEqual(sorted(ret), sorted(x.id for x in p.threads()))
+            ret = p.threads_cpu_percent(interval=0.05)
+        finally:
+            thread.stop()
+        num_cpus = psutil.cpu_count() or 1
+        for percent in ret.values():
+            self.assertIsInstance(percent, float)
+            self.assertGreaterEqual(percent, 0.0)
+            self.assertLessEqual(percent, 100.0 * num_cpus)
+
+    def test_threads_cpu_percent_new_thread(self):
+        # a thread started between two calls is reported as 0.0
+        # instead of having its whole lifetime CPU time accounted
+        # to the last interval
+        p = psutil.Process()
+        if OPENBSD:
+            try:
+                p.threads()
+            except psutil.AccessDenied:
+                raise unittest.SkipTest(
+                    "on OpenBSD this requires root access")
+        old_tids = set(p.threads_cpu_percent())
+        thread = ThreadTask()
+        thread.start()
+        try:
+            ret = p.threads_cpu_percent()
+        finally:
+            thread.stop()
+        new_tids = set(ret) - old_tids
+        self.assertEqual(len(new_tids), 1)
+        self.assertEqual(ret[new_tids.pop()], 0.0)
+        # same, with a thread which accumulated a lot of CPU time
+        pthread = psutil._common.pthread
+        p = psutil.Process()
+        with mock.patch("psutil._psplatform.Process.threads", side_effect=[
+                [pthread(1, 1.0, 1.0)],
+                [pthread(1, 1.0, 1.0), pthread(2, 1000.0, 1000.0)]]):
+            p.threads_cpu_percent()
+            self.assertEqual(p.threads_cpu_percent(), {1: 0.0, 2: 0.0})
+
     def test_memory_info(self):
         p = psutil.Process()
 
@@ -1156,6 +1212,18 @@ class TestProcess(unittest.TestCase):
             self.assertEqual(children[0].pid, sproc.pid)
             self.assertEqual(children[0].ppid(), os.getpid())
 
+    @unittest.skipUnless(LINUX or WINDOWS, "LINUX or WINDOWS only")
+    def test_children_uses_ppid_map(self):
+        # On Windows and Linux children() relies on the one-shot
+        # ppid map instead of iterating over all processes.
+        sproc = get_test_subprocess()
+        p = psutil.Process()
+        with mock.patch('psutil.process_iter') as m:
+            self.assertEqual([x.pid for x in p.children()], [sproc.pid])
+            self.assertEqual(
+                [x.pid for x in p.children(recursive=True)], [sproc.pid])
+            assert not m.called
+
     def test_children_recursive(self):
         # here we create a subprocess which creates another one as in:
         # A (parent) -> B (child) -> C (grandchild)
@@ -1229,6 +1297,20 @@ class TestProcess(unittest.TestCase):
             with self.assertRaises(NotImplementedError):
                 p.as_dict(attrs=["name"])
 
+    def test_oneshot(self):
+        p = psutil.Process()
+        with p.oneshot():
+            self.assertEqual(p.name(), p.name())
+            self.assertEqual(p.cpu_times(), p.cpu_times())
+            self.assertEqual(p.ppid(), p.ppid())
+            # nested calls are supposed to be NOOPs
+            with p.oneshot():
+                p.as_dict()
+            self.assertEqual(p.cpu_times(), p.cpu_times())
+        # make sure the cache gets cleared on exit
+        self.assertFalse(hasattr(p._proc, '_cache'))
+        self.assertEqual(p.ppid(), os.getppid())
+
     def test_halfway_terminated_process(self):
         # Test that NoSuchProcess exception gets raised in case the
         # process dies after we create the Process object.
@@ -1247,7 +1329,8 @@ class TestProcess(unittest.TestCase):
         # self.assertFalse(p.pid in psutil.pids(), msg="retcode = %s" %
         #   retcode)
 
-        excluded_names = ['pid', 'is_running', 'wait', 'create_time']
+        excluded_names = ['pid', 'is_running', 'wait', 'create_time',
+                          'oneshot']
         if LINUX and not RLIMIT_SUPPORT:
             excluded_names.append('rlimit')
         for name in dir(p):
@@ -1273,6 +1356,9 @@ class TestProcess(unittest.TestCase):
                     ret = meth([0])
                 elif name == 'send_signal':
                     ret = meth(signal.SIGTERM)
+                elif name == 'memory_maps_iter':
+                    # errors are raised while iterating
+                    ret = list(meth())
                 else:
                     ret = meth()
             except psutil.ZombieProcess:
@@ -1532,7 +1618,7 @@ class TestFetchAllProcesses(unittest.TestCase):
         excluded_names = set([
             'send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
             'as_dict', 'cpu_percent', 'parent', 'children', 'pid',
-            'memory_info_ex',
+            'memory_info_ex', 'oneshot',
         ])
         if LINUX and not RLIMIT_SUPPORT:
             excluded_names.add('rlimit')
@@ -1678,6 +1764,19 @@ class TestFetchAllProcesses(unittest.TestCase):
             self.assertTrue(t.user_time >= 0)
             self.assertTrue(t.system_time >= 0)
 
+    def threads_full(self, ret, proc):
+        self.threads(ret, proc)
+        for t in ret:
+            self.assertIsInstance(t.name, (str, unicode))
+            self.assertIsInstance(t.status, str)
+            self.assertGreaterEqual(t.cpu_num, 0)
+
+    def threads_cpu_percent(self, ret, proc):
+        self.assertIsInstance(ret, dict)
+        for tid, percent in ret.items():
+            self.assertGreaterEqual(tid, 0)
+            self.assertGreaterEqual(percent, 0.0)
+
     def cpu_times(self, ret, proc):
         self.assertTrue(ret.user >= 0)
         self.assertTrue(ret.system >= 0)
@@ -1770,6 +1869,14 @@ class TestFetchAllProcesses(unittest.TestCase):
                     self.assertIsInstance(value, (int, long))
                     assert value >= 0, value
 
+    def memory_maps_iter(self, ret, proc):
+        # errors are raised while iterating
+        try:
+            ret = list(ret)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return
+        self.memory_maps(ret, proc)
+
     def num_handles(self, ret, proc):
         if WINDOWS:
             self.assertGreaterEqual(ret, 0)
@@ -1788,6 +1895,14 @@ class TestFetchAllProcesses(unittest.TestCase):
         self.assertGreaterEqual(ret.voluntary, 0)
         self.assertGreaterEqual(ret.involuntary, 0)
 
+    def status_fields(self, ret, proc):
+        self.assertGreaterEqual(ret.peak_rss, 0)
+        self.assertGreaterEqual(ret.swap, 0)
+        self.assertGreaterEqual(ret.sigq, 0)
+        self.assertGreaterEqual(ret.sigq_limit, 0)
+        for cpu in ret.cpus_allowed:
+            self.assertGreaterEqual(cpu, 0)
+
     def rlimit(self, ret, proc):
         self.assertEqual(len(ret), 2)
         self.assertGreaterEqual(ret[0], -1)
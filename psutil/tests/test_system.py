@@ -34,6 +34,7 @@ from psutil.tests import APPVEYOR
 from psutil.tests import check_net_address
 from psutil.tests import DEVNULL
 from psutil.tests import enum
+from psutil.tests import GLOBAL_TIMEOUT
 from psutil.tests import get_test_subprocess
 from psutil.tests import mock
 from psutil.tests import reap_children
@@ -71,13 +72,300 @@ class TestSystemAPIs(unittest.TestCase):
         p.wait()
         self.assertNotIn(sproc.pid, [x.pid for x in psutil.process_iter()])
 
-        with mock.patch('psutil.Process',
-                        side_effect=psutil.NoSuchProcess(os.getpid())):
-            self.assertEqual(list(psutil.process_iter()), [])
-        with mock.patch('psutil.Process',
-                        side_effect=psutil.AccessDenied(os.getpid())):
-            with self.assertRaises(psutil.AccessDenied):
-                list(psutil.process_iter())
+        # The identity of cached processes is verified either by
+        # creating a new Process instance or, on Linux, by the
+        # platform is_same_process() method: mock both.
+        exc = psutil.NoSuchProcess(os.getpid())
+        with mock.patch('psutil.Process', side_effect=exc):
+            with mock.patch('psutil._psplatform.Process.is_same_process',
+                            side_effect=exc, create=True):
+                self.assertEqual(list(psutil.process_iter()), [])
+        exc = psutil.AccessDenied(os.getpid())
+        with mock.patch('psutil.Process', side_effect=exc):
+            with mock.patch('psutil._psplatform.Process.is_same_process',
+                            side_effect=exc, create=True):
+                with self.assertRaises(psutil.AccessDenied):
+                    list(psutil.process_iter())
+
+    def test_process_iter_w_attrs(self):
+        for p in psutil.process_iter(attrs=['pid']):
+            self.assertEqual(list(p.info.keys()), ['pid'])
+        with self.assertRaises(AttributeError):
+            list(psutil.process_iter(attrs=['foo']))
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.AccessDenied(0, "")) as m:
+            for p in psutil.process_iter(attrs=["pid", "cpu_times"]):
+                self.assertIsNone(p.info['cpu_times'])
+                self.assertGreaterEqual(p.info['pid'], 0)
+            assert m.called
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.AccessDenied(0, "")) as m:
+            flag = object()
+            for p in psutil.process_iter(
+                    attrs=["pid", "cpu_times"], ad_value=flag):
+                self.assertIs(p.info['cpu_times'], flag)
+                self.assertGreaterEqual(p.info['pid'], 0)
+            assert m.called
+        # processes disappearing while prefetching are skipped
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.NoSuchProcess(0, "")) as m:
+            self.assertEqual(
+                list(psutil.process_iter(attrs=["cpu_times"])), [])
+            assert m.called
+
+    def test_scan(self):
+        pids = set(psutil.pids())
+        procs = list(psutil.scan(attrs=['pid', 'name'], workers=3))
+        for p in procs:
+            self.assertEqual(sorted(p.info), ['name', 'pid'])
+            self.assertEqual(p.info['pid'], p.pid)
+        self.assertIn(os.getpid(), [p.pid for p in procs])
+        self.assertLessEqual(len(procs), len(pids) + 10)
+        # ordered
+        procs = list(psutil.scan(attrs=['pid'], ordered=True))
+        pids = [p.pid for p in procs]
+        self.assertEqual(pids, sorted(pids))
+        # Process instances are cached as in process_iter()
+        self.assertIn(psutil.Process(), psutil.process_iter())
+        self.assertIs(
+            [p for p in psutil.scan(attrs=[]) if p.pid == os.getpid()][0],
+            [p for p in psutil.process_iter() if p.pid == os.getpid()][0])
+        self.assertRaises(ValueError, list, psutil.scan([], workers=0))
+        with self.assertRaises(AttributeError):
+            list(psutil.scan(attrs=['foo']))
+
+    def test_scan_exceptions(self):
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.AccessDenied(0, "")) as m:
+            flag = object()
+            for p in psutil.scan(["pid", "cpu_times"], ad_value=flag):
+                self.assertIs(p.info['cpu_times'], flag)
+            assert m.called
+        # processes disappearing while collecting info are skipped
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.NoSuchProcess(0, "")) as m:
+            self.assertEqual(list(psutil.scan(["cpu_times"])), [])
+            assert m.called
+        # ...other exceptions are propagated
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=ValueError("foo")) as m:
+            self.assertRaises(ValueError, list, psutil.scan(["cpu_times"]))
+            assert m.called
+
+    def test_memory_usage_by(self):
+        me = psutil.Process()
+        for key in ('username', 'name', 'cmdline'):
+            ret = psutil.memory_usage_by(key)
+            if key == 'cmdline':
+                value = " ".join(me.cmdline())
+            else:
+                value = getattr(me, key)()
+            self.assertIn(value, ret)
+            self.assertGreater(ret[value].uss, 0)
+            self.assertGreaterEqual(ret[value].num_procs, 1)
+            for usage in ret.values():
+                self.assertEqual(usage._fields,
+                                 ('uss', 'pss', 'swap', 'num_procs'))
+                for x in usage:
+                    self.assertGreaterEqual(x, 0)
+        self.assertRaises(ValueError, psutil.memory_usage_by, 'foo')
+        self.assertRaises(ValueError, psutil.memory_usage_by, workers=0)
+        if not LINUX:
+            self.assertRaises(NotImplementedError, psutil.memory_usage_by,
+                              'cgroup')
+
+    def test_memory_usage_by_process_info(self):
+        # the Process instances cached by process_iter() are left
+        # untouched
+        for proc in psutil.process_iter(attrs=['name']):
+            if proc.pid == os.getpid():
+                break
+        info = proc.info
+        psutil.memory_usage_by('name')
+        self.assertEqual(proc.info, info)
+        for proc in psutil.process_iter():
+            if proc.pid == os.getpid():
+                self.assertEqual(proc.info, info)
+
+    def test_memory_usage_by_access_denied(self):
+        with mock.patch("psutil.Process.memory_full_info",
+                        side_effect=psutil.AccessDenied(0, "")) as m:
+            self.assertEqual(psutil.memory_usage_by(), {})
+            assert m.called
+
+    def test_cpu_percent_many(self):
+        sproc = get_test_subprocess()
+        procs = [psutil.Process(), psutil.Process(sproc.pid)]
+        with mock.patch("psutil.time.sleep",
+                        side_effect=time.sleep) as m:
+            ret = psutil.cpu_percent_many(procs, interval=0.1)
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(sorted(ret), sorted([os.getpid(), sproc.pid]))
+        for pid, percent in ret.items():
+            self.assertIsInstance(percent, float)
+            self.assertGreaterEqual(percent, 0.0)
+            self.assertLessEqual(percent, 100.0 * (psutil.cpu_count() or 1))
+        self.assertRaises(ValueError, psutil.cpu_percent_many, procs, 0)
+        self.assertRaises(ValueError, psutil.cpu_percent_many, procs, None)
+        self.assertEqual(psutil.cpu_percent_many([], interval=0.01), {})
+
+    def test_cpu_percent_many_gone(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        p.kill()
+        p.wait()
+        self.assertEqual(psutil.cpu_percent_many([p], interval=0.01), {})
+
+    def test_cpu_percent_many_pid_reused(self):
+        # the PID was reused by another process between the two reads
+        pid = os.getpid()
+        if hasattr(psutil._psplatform, 'cpu_times_map'):
+            target = "psutil._psplatform.cpu_times_map"
+            side_effect = [{pid: (1.0, 1.0, 100)}, {pid: (1.0, 1.0, 200)}]
+        else:
+            target = "psutil.Process.is_running"
+            side_effect = [True, False]
+        with mock.patch(target, side_effect=side_effect) as m:
+            self.assertEqual(
+                psutil.cpu_percent_many([psutil.Process()], interval=0.01),
+                {})
+            self.assertEqual(m.call_count, 2)
+
+    @unittest.skipUnless(hasattr(psutil._psplatform, 'cpu_times_map'),
+                         "not supported")
+    def test_cpu_percent_many_pid_reused_before(self):
+        # the PID was reused by another process before the call
+        p = psutil.Process()
+        starttime = p._proc._starttime + 1
+        ret = {p.pid: (1.0, 1.0, starttime)}
+        with mock.patch("psutil._psplatform.cpu_times_map",
+                        return_value=ret) as m:
+            self.assertEqual(psutil.cpu_percent_many([p], interval=0.01), {})
+            self.assertEqual(m.call_count, 2)
+        # same start time: the process is still the same
+        ret = {p.pid: (1.0, 1.0, p._proc._starttime)}
+        with mock.patch("psutil._psplatform.cpu_times_map",
+                        return_value=ret):
+            self.assertEqual(psutil.cpu_percent_many([p], interval=0.01),
+                             {p.pid: 0.0})
+
+    def test_cpu_sampler(self):
+        pid = os.getpid()
+        s = psutil.CPUSampler(pids=[pid], interval=0.1, history=1)
+        self.assertEqual(s.interval, 0.1)
+        self.assertEqual(s.history, 1)
+        self.assertRaises(psutil.NoSuchProcess, s.cpu_percent, pid)
+        s.sample()
+        self.assertEqual(s.pids(), [pid])
+        self.assertEqual(s.cpu_percent(pid), 0.0)
+        stop_at = time.time() + 0.2
+        while time.time() < stop_at:
+            pass
+        s.sample()
+        self.assertGreater(s.cpu_percent(pid), 0.0)
+        self.assertGreater(s.cpu_percent(pid, window=1), 0.0)
+        # ring buffer size is fixed
+        for x in range(20):
+            s.sample()
+        self.assertEqual(len(s._samples[pid]), 11)
+        self.assertRaises(ValueError, s.cpu_percent, pid, window=2)
+        self.assertRaises(ValueError, s.cpu_percent, pid, window=0)
+        self.assertRaises(ValueError, psutil.CPUSampler, interval=0)
+        self.assertRaises(ValueError, psutil.CPUSampler, interval=2,
+                          history=1)
+
+    def test_cpu_sampler_pid_reused(self):
+        s = psutil.CPUSampler(interval=0.1)
+        with mock.patch.object(s, '_read', return_value={1: (1, 1, 10)}):
+            s.sample()
+            s.sample()
+        self.assertEqual(len(s._samples[1]), 2)
+        # PID reused
+        with mock.patch.object(s, '_read', return_value={1: (0, 0, 20)}):
+            s.sample()
+        self.assertEqual(len(s._samples[1]), 1)
+        self.assertEqual(s.cpu_percent(1), 0.0)
+        # process gone
+        with mock.patch.object(s, '_read', return_value={}):
+            s.sample()
+        self.assertRaises(psutil.NoSuchProcess, s.cpu_percent, 1)
+        self.assertEqual(s.pids(), [])
+
+    def test_cpu_sampler_thread(self):
+        with psutil.CPUSampler(interval=0.01) as s:
+            self.assertRaises(ValueError, s.start)
+            stop_at = time.time() + GLOBAL_TIMEOUT
+            while time.time() < stop_at:
+                try:
+                    if len(s._samples[os.getpid()]) > 2:
+                        break
+                except KeyError:
+                    pass
+                time.sleep(0.01)
+            self.assertIn(os.getpid(), s.pids())
+            self.assertIn(1, s.pids())
+            self.assertGreaterEqual(s.cpu_percent(os.getpid()), 0.0)
+        self.assertIsNone(s._thread)
+
+    def test_cpu_sampler_thread_error(self):
+        # an error in the background thread doesn't stop sampling and
+        # is re-raised once by the next cpu_percent() call
+        pid = os.getpid()
+        s = psutil.CPUSampler(pids=[pid], interval=0.01)
+        orig_read = s._read
+        side_effect = [OSError(errno.EIO, "fake")]
+
+        def read():
+            if side_effect:
+                raise side_effect.pop()
+            return orig_read()
+
+        with mock.patch.object(s, '_read', side_effect=read) as m:
+            with s:
+                stop_at = time.time() + GLOBAL_TIMEOUT
+                while time.time() < stop_at:
+                    with s._lock:
+                        if len(s._samples.get(pid, ())) > 2:
+                            break
+                    time.sleep(0.01)
+                self.assertGreater(m.call_count, 3)
+                self.assertRaises(OSError, s.cpu_percent, pid)
+                self.assertGreaterEqual(s.cpu_percent(pid), 0.0)
+                self.assertTrue(s._thread.is_alive())
+        # stop() re-raises errors not reported yet
+        with mock.patch.object(s, '_read', side_effect=OSError):
+            s.start()
+            stop_at = time.time() + GLOBAL_TIMEOUT
+            while s._exc is None and time.time() < stop_at:
+                time.sleep(0.01)
+            self.assertRaises(OSError, s.stop)
+        self.assertIsNone(s._thread)
+        # can be restarted
+        s.start()
+        s.stop()
+
+    def test_ppid_map(self):
+        ppid_map = psutil.ppid_map()
+        self.assertEqual(ppid_map[os.getpid()], os.getppid())
+        for pid, ppid in ppid_map.items():
+            self.assertIsInstance(pid, (int, long))
+            self.assertIsInstance(ppid, (int, long))
+            try:
+                self.assertEqual(ppid, psutil.Process(pid).ppid())
+            except psutil.NoSuchProcess:
+                pass
+
+    def test_proc_tree(self):
+        sproc = get_test_subprocess()
+        try:
+            tree = psutil.proc_tree()
+            self.assertEqual(tree[os.getpid()], [sproc.pid])
+            self.assertIn(os.getpid(), tree[os.getppid()])
+            for ppid, children in tree.items():
+                self.assertEqual(children, sorted(children))
+                self.assertNotIn(ppid, children)
+        finally:
+            reap_children()
 
     def test_wait_procs(self):
         def callback(p):
@@ -517,6 +805,39 @@ class TestSystemAPIs(unittest.TestCase):
             self.assertEqual(len(cons), len(set(cons)))
             check(cons, families, types_)
 
+    @skip_on_access_denied()
+    def test_net_connections_filters(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        with contextlib.closing(server):
+            server.bind(('127.0.0.1', 0))
+            server.listen(1)
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            with contextlib.closing(client):
+                client.connect(server.getsockname())
+                port = server.getsockname()[1]
+
+                cons = psutil.net_connections('tcp4', lport=port)
+                self.assertIn(psutil.CONN_LISTEN, [x.status for x in cons])
+                for conn in cons:
+                    self.assertEqual(conn.laddr[1], port)
+                cons = psutil.net_connections(
+                    'tcp4', rport=port, status=psutil.CONN_ESTABLISHED)
+                self.assertEqual([x.laddr for x in cons],
+                                 [client.getsockname()])
+                cons = psutil.net_connections(
+                    'inet', lport=port,
+                    status=[psutil.CONN_LISTEN, psutil.CONN_SYN_SENT])
+                self.assertEqual([x.laddr for x in cons],
+                                 [server.getsockname()])
+                self.assertEqual(
+                    psutil.net_connections('unix', lport=port), [])
+                cons = psutil.net_connections(
+                    'tcp4', lport=port, status=psutil.CONN_LISTEN,
+                    resolve_pids=False)
+                self.assertEqual(len(cons), 1)
+                self.assertEqual(cons[0].fd, -1)
+                self.assertIsNone(cons[0].pid)
+
     def test_net_io_counters(self):
         def check_ntuple(nt):
             self.assertEqual(nt[0], nt.bytes_sent)
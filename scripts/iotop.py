@@ -97,13 +97,11 @@ def poll(interval):
     sorted by IO activity and total disks I/O activity.
     """
     # first get a list of all processes and disk io counters
-    procs = [p for p in psutil.process_iter()]
-    for p in procs[:]:
-        try:
-            p._before = p.io_counters()
-        except psutil.Error:
-            procs.remove(p)
-            continue
+    procs = []
+    for p in psutil.process_iter(attrs=['io_counters']):
+        if p.info['io_counters'] is not None:
+            p._before = p.info['io_counters']
+            procs.append(p)
     disks_before = psutil.disk_io_counters()
 
     # sleep some time
@@ -43,7 +43,11 @@ def main():
     templ = "%-16s %10s  %-7s %s"
     print(templ % ("Address", "RSS", "Mode", "Mapping"))
     total_rss = 0
-    for m in p.memory_maps(grouped=False):
+    if hasattr(p, "memory_maps_iter"):
+        maps = p.memory_maps_iter()
+    else:
+        maps = p.memory_maps(grouped=False)
+    for m in maps:
         total_rss += m.rss
         print(templ % (
             m.addr.split('-')[0].zfill(16),
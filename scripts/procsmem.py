@@ -60,23 +60,22 @@ def convert_bytes(n):
 def main():
     ad_pids = []
     procs = []
-    for p in psutil.process_iter():
-        try:
-            mem = p.memory_full_info()
-            info = p.as_dict(attrs=["cmdline", "username"])
-        except psutil.AccessDenied:
+    # memory_full_info() is slow (on Linux it reads /proc/pid/smaps)
+    # hence we collect process info in parallel
+    for p in psutil.scan(
+            attrs=["memory_full_info", "cmdline", "username"]):
+        mem = p.info["memory_full_info"]
+        if mem is None:
             ad_pids.append(p.pid)
-        except psutil.NoSuchProcess:
-            pass
-        else:
-            p._uss = mem.uss
-            p._rss = mem.rss
-            if not p._uss:
-                continue
-            p._pss = getattr(mem, "pss", "")
-            p._swap = getattr(mem, "swap", "")
-            p._info = info
-            procs.append(p)
+            continue
+        p._uss = mem.uss
+        p._rss = mem.rss
+        if not p._uss:
+            continue
+        p._pss = getattr(mem, "pss", "")
+        p._swap = getattr(mem, "swap", "")
+        p._info = p.info
+        procs.append(p)
 
     procs.sort(key=lambda p: p._uss)
     templ = "%-7s %-7s %-30s %7s %7s %7s %7s"
@@ -29,7 +29,6 @@ $ python scripts/pstree.py
 """
 
 from __future__ import print_function
-import collections
 import sys
 
 import psutil
@@ -53,17 +52,9 @@ def print_tree(parent, tree, indent=''):
 
 
 def main():
-    # construct a dict where 'values' are all the processes
-    # having 'key' as their parent
-    tree = collections.defaultdict(list)
-    for p in psutil.process_iter():
-        try:
-            tree[p.ppid()].append(p.pid)
-        except (psutil.NoSuchProcess, psutil.ZombieProcess):
-            pass
-    # on systems supporting PID 0, PID 0's parent is usually 0
-    if 0 in tree and 0 in tree[0]:
-        tree[0].remove(0)
+    # a dict where 'values' are all the processes having 'key'
+    # as their parent
+    tree = psutil.proc_tree()
     print_tree(min(tree), tree)
 
 
@@ -46,6 +46,8 @@ except ImportError:
     sys.exit('platform not supported')
 
 import psutil
+if hasattr(psutil, 'proc_table'):
+    import pwd
 
 
 # --- curses stuff
@@ -102,26 +104,92 @@ def poll(interval):
     time.sleep(interval)
     procs = []
     procs_status = {}
-    for p in psutil.process_iter():
+    for p in psutil.process_iter(attrs=['username', 'nice', 'memory_info',
+                                        'memory_percent', 'cpu_percent',
+                                        'cpu_times', 'name', 'status']):
         try:
-            p.dict = p.as_dict(['username', 'nice', 'memory_info',
-                                'memory_percent', 'cpu_percent',
-                                'cpu_times', 'name', 'status'])
+            procs_status[p.info['status']] += 1
+        except KeyError:
+            procs_status[p.info['status']] = 1
+        procs.append((p.pid, p.info))
+
+    # return processes sorted by CPU percent usage
+    processes = sorted(procs, key=lambda x: x[1]['cpu_percent'],
+                       reverse=True)
+    return (processes, procs_status)
+
+
+# (pid, create_time) -> cumulative CPU time as of the previous poll
+last_cpu_times = {}
+last_poll_time = None
+usernames = {}
+
+
+def poll_table(interval):
+    """Same as poll() but based on psutil.proc_table(), which reads
+    the info of all processes in one shot without creating Process
+    instances. Fields proc_table() does not provide (name and virtual
+    memory) are fetched later and only for the processes which fit on
+    screen, see fetch_info().
+    """
+    global last_cpu_times, last_poll_time
+    time.sleep(interval)
+    table = psutil.proc_table(['pid', 'status', 'user_time', 'system_time',
+                               'create_time', 'rss', 'nice', 'uid'])
+    now = time.time()
+    elapsed = now - last_poll_time if last_poll_time is not None else 0
+    total_mem = psutil.virtual_memory().total
+    procs = []
+    procs_status = {}
+    cpu_times = {}
+    for pid, status, utime, stime, ctime, rss, nice, uid in zip(
+            table['pid'], table['status'], table['user_time'],
+            table['system_time'], table['create_time'], table['rss'],
+            table['nice'], table['uid']):
+        try:
+            procs_status[status] += 1
+        except KeyError:
+            procs_status[status] = 1
+        key = (pid, ctime)
+        cpu_times[key] = utime + stime
+        try:
+            delta = cpu_times[key] - last_cpu_times[key]
+        except KeyError:
+            cpu_percent = 0.0
+        else:
+            cpu_percent = round(delta / elapsed * 100, 1) if elapsed else 0.0
+        if uid not in usernames:
             try:
-                procs_status[p.dict['status']] += 1
+                usernames[uid] = pwd.getpwuid(uid).pw_name
             except KeyError:
-                procs_status[p.dict['status']] = 1
-        except psutil.NoSuchProcess:
-            pass
-        else:
-            procs.append(p)
+                usernames[uid] = str(uid)
+        info = dict(username=usernames[uid], nice=nice,
+                    memory_percent=rss / float(total_mem) * 100,
+                    cpu_percent=cpu_percent, cpu_times=(utime, stime),
+                    status=status, rss=rss)
+        procs.append((pid, info))
+    last_cpu_times = cpu_times
+    last_poll_time = now
 
     # return processes sorted by CPU percent usage
-    processes = sorted(procs, key=lambda p: p.dict['cpu_percent'],
+    processes = sorted(procs, key=lambda x: x[1]['cpu_percent'],
                        reverse=True)
     return (processes, procs_status)
 
 
+def fetch_info(pid, info):
+    """Fill in name and memory_info of a process returned by
+    poll_table().
+    """
+    try:
+        p = psutil.Process(pid)
+        info['name'] = p.name()
+        info['memory_info'] = p.memory_info()
+    except psutil.Error:
+        info['name'] = None
+        info['memory_info'] = None
+
+
 def print_header(procs_status, num_procs):
     """Print system-related info, above the process list."""
 
@@ -183,35 +251,38 @@ def refresh_window(procs, procs_status):
     print_header(procs_status, len(procs))
     print_line("")
     print_line(header, highlight=True)
-    for p in procs:
+    for pid, info in procs:
+        if 'name' not in info:
+            fetch_info(pid, info)
         # TIME+ column shows process CPU cumulative time and it
         # is expressed as: "mm:ss.ms"
-        if p.dict['cpu_times'] is not None:
-            ctime = timedelta(seconds=sum(p.dict['cpu_times']))
+        if info['cpu_times'] is not None:
+            ctime = timedelta(seconds=sum(info['cpu_times']))
             ctime = "%s:%s.%s" % (ctime.seconds // 60 % 60,
                                   str((ctime.seconds % 60)).zfill(2),
                                   str(ctime.microseconds)[:2])
         else:
             ctime = ''
-        if p.dict['memory_percent'] is not None:
-            p.dict['memory_percent'] = round(p.dict['memory_percent'], 1)
+        if info['memory_percent'] is not None:
+            info['memory_percent'] = round(info['memory_percent'], 1)
         else:
-            p.dict['memory_percent'] = ''
-        if p.dict['cpu_percent'] is None:
-            p.dict['cpu_percent'] = ''
-        if p.dict['username']:
-            username = p.dict['username'][:8]
+            info['memory_percent'] = ''
+        if info['cpu_percent'] is None:
+            info['cpu_percent'] = ''
+        if info['username']:
+            username = info['username'][:8]
         else:
             username = ""
-        line = templ % (p.pid,
+        line = templ % (pid,
                         username,
-                        p.dict['nice'],
-                        bytes2human(getattr(p.dict['memory_info'], 'vms', 0)),
-                        bytes2human(getattr(p.dict['memory_info'], 'rss', 0)),
-                        p.dict['cpu_percent'],
-                        p.dict['memory_percent'],
+                        info['nice'],
+                        bytes2human(getattr(info['memory_info'], 'vms', 0)),
+                        bytes2human(getattr(info['memory_info'], 'rss',
+                                            info.get('rss', 0))),
+                        info['cpu_percent'],
+                        info['memory_percent'],
                         ctime,
-                        p.dict['name'] or '',
+                        info['name'] or '',
                         )
         try:
             print_line(line)
@@ -224,7 +295,10 @@ def main():
     try:
         interval = 0
         while True:
-            args = poll(interval)
+            if hasattr(psutil, 'proc_table'):
+                args = poll_table(interval)
+            else:
+                args = poll(interval)
             refresh_window(*args)
             interval = 1
     except (KeyboardInterrupt, SystemExit):
@@ -9,17 +9,19 @@ running processes and system utilization (CPU, memory, disks, network)
 in Python.
 """
 
-import atexit
 import contextlib
 import io
 import os
+import shutil
 import sys
 import tempfile
 import platform
 try:
     from setuptools import setup, Extension
+    from setuptools.command.build_py import build_py
 except ImportError:
     from distutils.core import setup, Extension
+    from distutils.command.build_py import build_py
 
 HERE = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(HERE, "psutil"))
@@ -63,6 +65,18 @@ def silenced_output(stream_name):
         setattr(sys, stream_name, orig)
 
 
+class BuildPy(build_py):
+    """Skip psutil/aio.py on Python < 3.6 as it uses async / await
+    syntax, which can't be byte-compiled there.
+    """
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 6):
+            modules = [x for x in modules if x[:2] != ('psutil', 'aio')]
+        return modules
+
+
 VERSION = get_version()
 VERSION_MACRO = ('PSUTIL_VERSION', int(VERSION.replace('.', '')))
 
@@ -165,36 +179,56 @@ elif _common.NETBSD:
     extensions = [ext, posix_extension]
 # Linux
 elif _common.LINUX:
-    def get_ethtool_macro():
-        # see: https://github.com/giampaolo/psutil/issues/659
+    def compiles(source):
+        """Return True if the given C source code can be compiled."""
         from distutils.unixccompiler import UnixCCompiler
         from distutils.errors import CompileError
 
-        with tempfile.NamedTemporaryFile(
-                suffix='.c', delete=False, mode="wt") as f:
-            f.write("#include <linux/ethtool.h>")
-
-        @atexit.register
-        def on_exit():
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, 'probe.c')
+            with open(fname, 'wt') as f:
+                f.write(source)
+            compiler = UnixCCompiler()
             try:
-                os.remove(f.name)
-            except OSError:
-                pass
+                with silenced_output('stderr'):
+                    with silenced_output('stdout'):
+                        # object files go to tmpdir rather than into
+                        # a directory relative to cwd
+                        compiler.compile([fname], output_dir=tmpdir)
+            except CompileError:
+                return False
+            else:
+                return True
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
-        compiler = UnixCCompiler()
-        try:
-            with silenced_output('stderr'):
-                with silenced_output('stdout'):
-                    compiler.compile([f.name])
-        except CompileError:
-            return ("PSUTIL_ETHTOOL_MISSING_TYPES", 1)
-        else:
+    def get_ethtool_macro():
+        # see: https://github.com/giampaolo/psutil/issues/659
+        if compiles("#include <linux/ethtool.h>"):
             return None
+        return ("PSUTIL_ETHTOOL_MISSING_TYPES", 1)
+
+    def get_sock_diag_macros():
+        # NETLINK_SOCK_DIAG headers (Linux >= 3.3); if they're missing
+        # net_connections() just parses /proc/net/* files
+        macros = []
+        base = "#include <sys/socket.h>\n#include <linux/netlink.h>\n" \
+               "#include <linux/sock_diag.h>\n"
+        if compiles(base + "#include <linux/inet_diag.h>\n"
+                    "struct inet_diag_req_v2 req;\n"):
+            macros.append(("PSUTIL_HAVE_INET_DIAG", 1))
+        if compiles(base + "#include <linux/unix_diag.h>\n"
+                    "#include <linux/rtnetlink.h>\n"
+                    "struct unix_diag_req req;\n"):
+            macros.append(("PSUTIL_HAVE_UNIX_DIAG", 1))
+        return macros
 
     ETHTOOL_MACRO = get_ethtool_macro()
     macros = [VERSION_MACRO]
     if ETHTOOL_MACRO is not None:
         macros.append(ETHTOOL_MACRO)
+    macros.extend(get_sock_diag_macros())
     ext = Extension(
         'psutil._psutil_linux',
         sources=['psutil/_psutil_linux.c'],
@@ -230,6 +264,7 @@ def main():
         platforms='Platform Independent',
         license='BSD',
         packages=['psutil', 'psutil.tests'],
+        cmdclass={'build_py': BuildPy},
         # see: python setup.py register --list-classifiers
         classifiers=[
             'Development Status :: 5 - Production/Stable',